@@ -0,0 +1,65 @@
+import hashlib
+import os
+import time
+
+from armazenamento import caminho_dados
+
+# =========================================================
+#  ARMAZENAMENTO DE ANEXOS POR HASH DO CONTEÚDO
+# =========================================================
+# O mesmo PDF enviado por vários vendedores (ou várias campanhas) fica
+# gravado uma única vez em dados/anexos/<sha256>. A fila de campanhas
+# guarda só o hash, nome e tipo. Quando uma campanha termina (ou é
+# cancelada), os arquivos que nenhuma campanha em andamento usa são
+# apagados; a carência protege quem acabou de gravar e ainda vai enfileirar.
+
+PASTA_ANEXOS = caminho_dados("anexos")
+CARENCIA = int(os.getenv("ANEXOS_CARENCIA_SEG", "3600"))
+
+
+def _caminho(hash_conteudo):
+    return os.path.join(PASTA_ANEXOS, hash_conteudo)
+
+
+def guardar(conteudo):
+    """Grava o conteúdo (se ainda não existir) e devolve o hash."""
+    hash_conteudo = hashlib.sha256(conteudo).hexdigest()
+    destino = _caminho(hash_conteudo)
+    if os.path.exists(destino):
+        # Reaproveitado por uma campanha nova: renova a carência da limpeza
+        try:
+            os.utime(destino)
+            return hash_conteudo
+        except OSError:
+            pass
+    os.makedirs(PASTA_ANEXOS, exist_ok=True)
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    with open(temporario, "wb") as f:
+        f.write(conteudo)
+    os.replace(temporario, destino)
+    return hash_conteudo
+
+
+def ler(hash_conteudo):
+    with open(_caminho(hash_conteudo), "rb") as f:
+        return f.read()
+
+
+def remover_sem_uso(em_uso):
+    """Apaga os anexos (e temporários perdidos) fora de `em_uso` e mais velhos que a carência. Retorna quantos."""
+    if not os.path.isdir(PASTA_ANEXOS):
+        return 0
+    limite = time.time() - CARENCIA
+    removidos = 0
+    for nome in os.listdir(PASTA_ANEXOS):
+        if nome in em_uso:
+            continue
+        caminho = os.path.join(PASTA_ANEXOS, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+                removidos += 1
+        except OSError:
+            # Outro processo apagou ou regravou no meio da varredura
+            pass
+    return removidos
@@ -1,22 +1,30 @@
+# Medição de inicialização (perfil_inicio.py): precisa vir antes dos imports
+from perfil_inicio import PerfilExecucao
+perfil = PerfilExecucao()
+
 import streamlit as st
-import pandas as pd
-import requests
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email.mime.image import MIMEImage
-from email import encoders
 from datetime import datetime, date
 import time
 import os
-import random
 import urllib.parse
 import warnings
 import urllib3
 import json
-from groq import Groq
 import io
+import hashlib
+from cache import cache_clientes, cache_tokens, CacheReferencia, TTL_TOKEN
+import cota
+from directus import directus
+from diario_edicoes import DiarioEdicoes, montar_lote
+import fila_campanhas
+import metricas
+import remetentes
+import supressao
+from ia import ia_disponivel, erro_configuracao_groq, gerar_sugestoes_elo_brindes, gerar_email_ia, aquecer_sugestoes, sugestoes_em_cache
+perfil.etapa("imports")
+
+# Métricas das chamadas externas (metricas.py): uma vez por processo
+metricas.iniciar("app", os.getenv("METRICAS_PORTA"))
 
 # --- 1. CONFIGURAÇÕES INICIAIS ---
 st.set_page_config(page_title="ELOFLOW", layout="wide", page_icon="🦅")
@@ -83,17 +91,17 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- 3. VARIÁVEIS DE AMBIENTE ---
-DIRECTUS_URL = os.getenv("DIRECTUS_URL", "https://elo-flow-eloflowdirectus-a9lluh-7f4d22-152-53-165-62.traefik.me")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "") 
+perfil.etapa("config_css")
 
-# Configuração do Cliente Groq
-groq_client = None
-if GROQ_API_KEY:
-    try:
-        groq_client = Groq(api_key=GROQ_API_KEY)
-    except Exception as e:
-        st.error(f"Erro ao configurar Groq: {e}")
+# --- 3. CLIENTE GROQ (criado no primeiro uso, uma vez por processo, em ia.py) ---
+if erro_configuracao_groq():
+    st.error(f"Erro ao configurar Groq: {erro_configuracao_groq()}")
+
+def concluir_perfil(tela):
+    # Só a primeira execução de cada tela na sessão entra no relatório
+    telas = st.session_state.setdefault('perfil_telas', set())
+    perfil.concluir(tela, primeira_da_sessao=tela not in telas)
+    telas.add(tela)
 
 # =========================================================
 #  FUNÇÕES AUXILIARES E DE NEGÓCIO
@@ -103,67 +111,29 @@ def limpar_telefone(phone):
     if pd.isna(phone): return None
     return "".join(filter(str.isdigit, str(phone)))
 
-def gerar_sugestoes_elo_brindes(area_atuacao):
-    if not groq_client:
-        return ["🎁 Kit Boas Vindas Personalizado", "🎁 Caneta Metal Premium", "🎁 Caderno Moleskine com Logo"], "Sugestão Padrão (Sem IA)"
-    
-    try:
-        prompt = f"""
-        Você é um consultor especialista da Elo Brindes (www.elobrindes.com.br).
-        O cliente atua na área: '{area_atuacao}'.
-        Sugira 3 brindes corporativos personalizados do catálogo da Elo Brindes que façam sentido para este ramo.
-        Responda EXATAMENTE no formato: Produto A|Produto B|Produto C
-        Não use introduções, apenas os nomes dos produtos.
-        """
-        
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-        )
-        
-        texto = chat_completion.choices[0].message.content.strip()
-        
-        if "|" in texto:
-            produtos = texto.split("|")
-            produtos_fmt = [f"📦 {p.strip().replace('📦', '')}" for p in produtos[:3]]
-            return produtos_fmt, f"Sugestão IA (Baseada em {area_atuacao})"
-        else:
-            return [f"📦 {texto}"], "Sugestão IA"
-    except Exception:
-        return ["🎁 Garrafa Térmica Personalizada", "🎁 Mochila Executiva", "🎁 Kit Tecnológico (Powerbank)"], "Sugestão Geral (Erro IA)"
-
 # =========================================================
 #  FUNÇÕES DE BACKEND
 # =========================================================
 
 def validar_token_existente(token):
     """Verifica se um token salvo ainda é válido"""
-    base_url = DIRECTUS_URL.rstrip('/')
-    try:
-        r = requests.get(
-            f"{base_url}/users/me", 
-            headers={"Authorization": f"Bearer {token}"}, 
-            timeout=5, 
-            verify=False
-        )
-        if r.status_code == 200:
-            return r.json()['data']
-    except: pass
-    return None
+    def consultar():
+        try:
+            return directus.usuario_atual(token, timeout=5)
+        except: pass
+        return None
+    # F5 abre uma sessão nova: a validação fica em cache no processo (só as positivas)
+    return cache_tokens.obter(hashlib.sha256(token.encode()).hexdigest(), consultar, ttl=TTL_TOKEN, ttl_vazio=0)
+
+def esquecer_token(token):
+    cache_tokens.invalidar(hashlib.sha256(token.encode()).hexdigest())
 
 def login_directus_debug(email, password):
-    base_url = DIRECTUS_URL.rstrip('/')
     try:
-        response = requests.post(
-            f"{base_url}/auth/login", 
+        response = directus.post(
+            "/auth/login", 
             json={"email": email, "password": password}, 
-            timeout=15, 
-            verify=False 
+            timeout=15
         )
     except Exception as e:
         st.error(f"❌ Erro de Conexão: {e}")
@@ -176,14 +146,9 @@ def login_directus_debug(email, password):
     if response.status_code == 200:
         token = response.json()['data']['access_token']
         try:
-            user_resp = requests.get(
-                f"{base_url}/users/me", 
-                headers={"Authorization": f"Bearer {token}"}, 
-                timeout=10, 
-                verify=False
-            )
-            if user_resp.status_code == 200:
-                return token, user_resp.json()['data']
+            user_data = directus.usuario_atual(token)
+            if user_data:
+                return token, user_data
         except: pass
         return token, {} 
     
@@ -191,15 +156,8 @@ def login_directus_debug(email, password):
     return None, None
 
 def alterar_senha_directus(token, nova_senha):
-    base_url = DIRECTUS_URL.rstrip('/')
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     try:
-        r = requests.patch(
-            f"{base_url}/users/me",
-            json={"password": nova_senha},
-            headers=headers,
-            verify=False
-        )
+        r = directus.patch("/users/me", token, json={"password": nova_senha})
         if r.status_code == 200:
             return True, "Senha alterada com sucesso."
         else:
@@ -207,110 +165,130 @@ def alterar_senha_directus(token, nova_senha):
     except Exception as e:
         return False, str(e)
 
-def carregar_clientes(token):
-    base_url = DIRECTUS_URL.rstrip('/')
-    headers = {"Authorization": f"Bearer {token}"}
-    
-    # CAMPOS COMPLETOS
-    fields_full = "id,pj_id,razao_social,nome_fantasia,status_carteira,area_atuacao,data_ultima_compra,telefone_1,email_1,obs_gerais,cnpj,tentativa_1,tentativa_2,tentativa_3,status_prospect,email_2,representante_nome,representante_email"
-    fields_safe = "id,pj_id,razao_social,nome_fantasia,status_carteira,area_atuacao,data_ultima_compra,telefone_1,email_1,obs_gerais,cnpj,status_prospect,email_2,representante_nome,representante_email"
-    
-    df = pd.DataFrame()
-    colunas_faltantes = False
+def carregar_clientes(token, user):
+    # Cache do processo: reruns e outras abas do mesmo usuário não baixam tudo de novo.
+    # Sem id (o /users/me falhou) a chave é o hash do token: nunca uma chave comum a todos
+    if user.get('id'):
+        chave = (user.get('id'), user.get('role'))
+    else:
+        chave = ('token', hashlib.sha256(token.encode()).hexdigest())
+    aviso_carga = st.empty()
 
-    try:
-        url = f"{base_url}/items/clientes?limit=-1&fields={fields_full}"
-        r = requests.get(url, headers=headers, timeout=10, verify=False)
-        
-        if r.status_code == 200:
-            df = pd.DataFrame(r.json()['data'])
-        else:
-            colunas_faltantes = True
-            url_safe = f"{base_url}/items/clientes?limit=-1&fields={fields_safe}"
-            r_safe = requests.get(url_safe, headers=headers, timeout=10, verify=False)
-            if r_safe.status_code == 200:
-                df = pd.DataFrame(r_safe.json()['data'])
-                df['tentativa_1'] = None
-                df['tentativa_2'] = None
-                df['tentativa_3'] = None
-
-        if not df.empty:
-            df['data_temp'] = pd.to_datetime(df['data_ultima_compra'], errors='coerce')
-            df['Ultima_Compra'] = df['data_temp'].dt.strftime('%d/%m/%Y').fillna("-")
-            hoje = pd.Timestamp.now()
-            df['dias_sem_compra'] = (hoje - df['data_temp']).dt.days.fillna(9999).astype(int)
-            
-            if 'status_prospect' not in df.columns:
-                df['status_prospect'] = None
-            
-            # Garantir colunas novas
-            for col_nova in ['email_2', 'representante_nome', 'representante_email']:
-                if col_nova not in df.columns:
-                    df[col_nova] = None
-            
-            def definir_cat(row):
-                if 'status_carteira' in row and row['status_carteira']: return row['status_carteira']
-                dias = row['dias_sem_compra']
-                if dias > 365: return "Crítico"
-                if dias > 180: return "Inativo"
-                return "Ativo"
-            
-            df['Categoria_Cliente'] = df.apply(definir_cat, axis=1)
-            df['GAP (dias)'] = df['dias_sem_compra']
-            
-            for col in ['tentativa_1', 'tentativa_2', 'tentativa_3']:
-                df[col] = df[col].fillna("")
+    def mostrar_progresso(carregados, total, df_primeira):
+        # Só acontece na carga "fria": mostra a primeira página enquanto o resto chega
+        with aviso_carga.container():
+            st.progress(min(carregados / max(total, 1), 1.0), text=f"🦅 Carregando carteira: {carregados}/{total} clientes...")
+            if df_primeira is not None and carregados < total:
+                cols_previa = [c for c in ['pj_id', 'razao_social', 'area_atuacao', 'email_1'] if c in df_primeira.columns]
+                st.dataframe(df_primeira[cols_previa], height=200, use_container_width=True, hide_index=True)
 
-            if colunas_faltantes:
-                st.toast("⚠️ Aviso: Colunas de 'Tentativa' não encontradas no Directus.", icon="⚠️")
-                
-            return df
-            
+    try:
+        resultado = cache_clientes.obter(
+            chave,
+            lambda: baixar_clientes(token, ao_progresso=mostrar_progresso),
+            recarregar=lambda: baixar_clientes(token),
+            versao=fila_campanhas.versao_carteira(),
+        )
     except Exception as e:
         st.error(f"Erro ao carregar dados: {e}")
-        
-    return pd.DataFrame()
+        return pd.DataFrame(), IndiceClientes(pd.DataFrame())
+    finally:
+        aviso_carga.empty()
+
+    if resultado is None:
+        return pd.DataFrame(), IndiceClientes(pd.DataFrame())
+
+    df, indice, colunas_faltantes = resultado
+    if colunas_faltantes:
+        st.toast("⚠️ Aviso: Colunas de 'Tentativa' não encontradas no Directus.", icon="⚠️")
+    return df, indice
+
+def invalidar_carteiras_com(ids_clientes):
+    # Só as carteiras em cache (de qualquer usuário) que contêm os clientes editados
+    ids_clientes = list(ids_clientes)
+    cache_clientes.invalidar_onde(lambda resultado: any(i in resultado[1] for i in ids_clientes))
 
 def atualizar_cliente_directus(token, id_cliente, dados_atualizados):
-    base_url = DIRECTUS_URL.rstrip('/')
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
     try:
-        r = requests.patch(
-            f"{base_url}/items/clientes/{id_cliente}",
-            json=dados_atualizados,
-            headers=headers,
-            verify=False
-        )
-        return r.status_code == 200
+        r = directus.atualizar_item(token, "clientes", id_cliente, dados_atualizados)
+        if r.status_code == 200:
+            invalidar_carteiras_com([id_cliente])
+            return True
+        return False
+    except:
+        return False
+
+def atualizar_clientes_lote(token, payloads):
+    """Grava vários clientes num único PATCH /items/clientes. payloads: {id: {campo: valor}}"""
+    try:
+        r = directus.atualizar_itens(token, "clientes", montar_lote(payloads))
+        if r.status_code in (200, 204):
+            invalidar_carteiras_com(payloads.keys())
+            return True
+        return False
     except:
         return False
 
 def carregar_campanha_ativa(token):
     try:
-        base_url = DIRECTUS_URL.rstrip('/')
-        r = requests.get(
-            f"{base_url}/items/campanhas_vendas?filter[ativa][_eq]=true&limit=1", 
-            headers={"Authorization": f"Bearer {token}"}, 
-            verify=False
-        )
-        if r.status_code == 200 and r.json()['data']:
-            return r.json()['data'][0]
+        data = directus.listar_itens(token, "campanhas_vendas", params={"filter[ativa][_eq]": "true", "limit": 1})
+        if data:
+            return data[0]
     except: pass
     return None
 
+# --- DADOS DE REFERÊNCIA DA SESSÃO ---
+# Config SMTP e campanha ativa mudam raramente: ficam na sessão com TTL e
+# os reruns não vão ao Directus. None (sem registro ou falha) dura pouco.
+TTL_SMTP, TTL_SMTP_VAZIO = 600, 30
+TTL_CAMPANHA, TTL_CAMPANHA_VAZIO = 300, 60
+
+def cache_sessao():
+    if 'cache_referencia' not in st.session_state:
+        st.session_state['cache_referencia'] = CacheReferencia()
+    return st.session_state['cache_referencia']
+
+def obter_config_smtp(token, user_email):
+    return cache_sessao().obter(('smtp', user_email), lambda: config_smtp_crud(token, user_email), TTL_SMTP, TTL_SMTP_VAZIO)
+
+def obter_campanha_ativa(token):
+    return cache_sessao().obter('campanha_ativa', lambda: carregar_campanha_ativa(token), TTL_CAMPANHA, TTL_CAMPANHA_VAZIO)
+
+def obter_contas_equipe(token):
+    return cache_sessao().obter('smtp_equipe', lambda: remetentes.contas_equipe(token), TTL_SMTP, TTL_SMTP_VAZIO)
+
+def checkbox_rodizio(chave):
+    """Opção de dividir a campanha entre as contas SMTP autorizadas (remetentes.py)."""
+    if not remetentes.rodizio_habilitado():
+        return False
+    return st.checkbox(
+        "🔀 Dividir o envio entre as contas SMTP da equipe",
+        value=False,
+        key=chave,
+        help="Cada conta autorizada envia uma parte, com intervalo e limite diário próprios. Se o provedor segurar uma conta, a próxima assume."
+    )
+
+def exigir_token_servico():
+    """Sem token de serviço o worker não acessa o Directus: avisa e bloqueia o disparo. Retorna se a fila está disponível."""
+    if fila_campanhas.fila_disponivel():
+        return True
+    st.error("⛔ Disparos desativados: o administrador precisa configurar DIRECTUS_SERVICE_TOKEN no servidor.")
+    return False
+
+def conf_envio(token, conf_smtp, usar_equipe):
+    """Contas da campanha (só a do vendedor ou o pool da equipe), pelo vendedor_email: a senha fica no Directus."""
+    contas = (obter_contas_equipe(token) or []) if usar_equipe else []
+    return remetentes.vendedores_do_pool(remetentes.montar_pool(conf_smtp, contas))
+
 def config_smtp_crud(token, user_email, payload=None):
-    base_url = DIRECTUS_URL.rstrip('/')
-    headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-    
-    # URL BASE e URL COM FILTRO PELO E-MAIL DO VENDEDOR
+    # FILTRO PELO E-MAIL DO VENDEDOR
     # Isso evita sobrescrever a config de outro usuário
-    url_base = f"{base_url}/items/config_smtp"
-    url_filter = f"{url_base}?filter[vendedor_email][_eq]={user_email}"
+    params_filtro = {"filter[vendedor_email][_eq]": user_email}
 
     if payload:
         # 1. Tenta achar se já existe config para este vendedor
         try:
-            check = requests.get(url_filter, headers=headers, verify=False)
+            check = directus.get("/items/config_smtp", token, params=params_filtro)
         except Exception as e:
             st.error(f"❌ Erro de conexão com Directus: {e}")
             return False
@@ -324,7 +302,7 @@ def config_smtp_crud(token, user_email, payload=None):
         if len(data) > 0:
             # ATUALIZAR (PATCH) no ID específico
             id_item = data[0]['id']
-            r = requests.patch(f"{url_base}/{id_item}", json=payload, headers=headers, verify=False)
+            r = directus.atualizar_item(token, "config_smtp", id_item, payload)
             if r.status_code == 200:
                 return True
             else:
@@ -333,7 +311,7 @@ def config_smtp_crud(token, user_email, payload=None):
         else:
             # CRIAR (POST) vinculando ao email
             payload['vendedor_email'] = user_email
-            r = requests.post(url_base, json=payload, headers=headers, verify=False)
+            r = directus.criar_item(token, "config_smtp", payload)
             if r.status_code == 200:
                 return True
             else:
@@ -342,192 +320,12 @@ def config_smtp_crud(token, user_email, payload=None):
     else:
         # LEITURA
         try:
-            r = requests.get(url_filter, headers=headers, verify=False)
-            if r.status_code == 200 and r.json().get('data'): 
-                return r.json()['data'][0]
+            data = directus.listar_itens(token, "config_smtp", params=params_filtro)
+            if data: 
+                return data[0]
         except: pass
         return None
 
-def enviar_email_smtp(token, destinatario, assunto, mensagem_html, conf_smtp, arquivo_anexo=None):
-    if not conf_smtp: return False, "SMTP não configurado"
-    try:
-        # Verifica se é para usar imagem INLINE (no corpo)
-        usar_imagem_inline = False
-        if arquivo_anexo is not None and "{{IMAGEM}}" in mensagem_html:
-            file_type = arquivo_anexo.type
-            if "image" in file_type:
-                usar_imagem_inline = True
-        
-        # Cria o Container Principal
-        if usar_imagem_inline:
-            msg = MIMEMultipart('related') # Related é necessário para imagens inline
-        else:
-            msg = MIMEMultipart() # Mixed (padrão)
-
-        msg['From'] = conf_smtp['smtp_user']
-        msg['To'] = destinatario
-        msg['Subject'] = assunto
-        
-        # Tratamento do Corpo HTML
-        if "<div" in mensagem_html or "<html" in mensagem_html or "<span" in mensagem_html or "<table" in mensagem_html or "<a href" in mensagem_html:
-            corpo_completo = mensagem_html
-        else:
-            corpo_completo = mensagem_html.replace("\n", "<br>")
-            
-        if conf_smtp.get('assinatura_html') and "</body>" not in corpo_completo:
-            corpo_completo += f"<br><br>{conf_smtp['assinatura_html']}"
-        
-        # Se for imagem inline, substitui a tag pelo CID
-        if usar_imagem_inline:
-            corpo_completo = corpo_completo.replace("{{IMAGEM}}", '<br><img src="cid:imagem_corpo" style="max-width:100%; height:auto;"><br>')
-            
-            # Parte Alternativa (Texto/HTML)
-            msg_alternative = MIMEMultipart('alternative')
-            msg.attach(msg_alternative)
-            msg_alternative.attach(MIMEText(corpo_completo, 'html'))
-            
-            # Anexa a Imagem com o Content-ID
-            img_data = arquivo_anexo.getvalue()
-            image = MIMEImage(img_data)
-            image.add_header('Content-ID', '<imagem_corpo>')
-            image.add_header('Content-Disposition', 'inline', filename=arquivo_anexo.name)
-            msg.attach(image)
-            
-        else:
-            # Fluxo Normal (Anexo ou Sem Anexo)
-            msg.attach(MIMEText(corpo_completo, 'html'))
-            
-            # Se tiver arquivo e NÃO for inline (ex: PDF ou imagem sem tag), anexa normal
-            if arquivo_anexo is not None:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(arquivo_anexo.getvalue()) 
-                encoders.encode_base64(part) 
-                part.add_header('Content-Disposition', f'attachment; filename="{arquivo_anexo.name}"')
-                msg.attach(part)
-        
-        # Envio
-        server = smtplib.SMTP(conf_smtp['smtp_host'], conf_smtp['smtp_port'])
-        server.starttls()
-        server.login(conf_smtp['smtp_user'], conf_smtp['smtp_pass_app'])
-        server.sendmail(conf_smtp['smtp_user'], destinatario, msg.as_string())
-        server.quit()
-        return True, "Enviado"
-    except Exception as e:
-        return False, str(e)
-
-def registrar_log(token, pj_id, assunto, corpo, status):
-    try:
-        base_url = DIRECTUS_URL.rstrip('/')
-        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-        # CORREÇÃO: Usar formato de data simples para compatibilidade com Directus
-        data_formatada = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Se for envio externo, pj_id pode vir como string "EXTERNO" ou nulo, o Directus pode reclamar
-        # se o campo for relacional. Tentamos converter, se falhar, envia null se permitido ou 0.
-        
-        payload = {
-            "cliente_pj_id": pj_id if str(pj_id).isdigit() else None, 
-            "assunto_gerado": assunto, 
-            "corpo_email": corpo, 
-            "status_envio": status, 
-            "data_envio": data_formatada
-        }
-        
-        # Se pj_id for None (externo), talvez precise registrar o nome do lead no corpo ou em outro campo
-        if payload['cliente_pj_id'] is None:
-            # Adicionamos uma flag no corpo/assunto para saber que foi externo
-            payload['assunto_gerado'] = f"[EXTERNO] {assunto}"
-        
-        requests.post(f"{base_url}/items/historico_envios", json=payload, headers=headers, verify=False)
-    except: pass
-
-def contar_envios_hoje_directus(token):
-    """
-    Conta quantos registros existem na tabela 'historico_envios' com a data de hoje.
-    Usado para garantir a cota de segurança e evitar spam.
-    """
-    try:
-        base_url = DIRECTUS_URL.rstrip('/')
-        hoje_str = datetime.now().strftime("%Y-%m-%d")
-        
-        # CORREÇÃO CRÍTICA: Usar _gte (Maior ou Igual) para garantir que a contagem funcione
-        # mesmo se o Directus estiver interpretando como data ou string, pegando tudo de hoje em diante.
-        url = f"{base_url}/items/historico_envios?filter[data_envio][_gte]={hoje_str}&aggregate[count]=*"
-        
-        r = requests.get(url, headers={"Authorization": f"Bearer {token}"}, verify=False)
-        
-        if r.status_code == 200:
-            data = r.json()['data']
-            # O Directus retorna agregação como uma lista de objetos
-            if isinstance(data, list) and len(data) > 0:
-                return int(data[0].get('count', 0))
-            return 0
-    except Exception as e:
-        return 0
-    return 0
-
-def gerar_email_ia(nome_destinatario, ramo, data_compra, campanha, usuario_nome, usuario_cargo):
-    if not groq_client: return "Erro IA", "Sem Chave API configurada"
-    camp_nome = campanha.get('nome_campanha', 'Retomada') if campanha else 'Contato'
-    
-    # PROMPT ATUALIZADO PARA HUMANO + 3 BRINDES + LINKS
-    prompt = f"""
-    Aja como {usuario_nome}, da Elo Brindes.
-    Escreva um e-mail curto e direto para {nome_destinatario} (Setor: {ramo}).
-    
-    Contexto: Cliente inativo desde {data_compra}.
-    Objetivo: Mostrar novidades e levar para o site.
-
-    REGRAS DE TOM DE VOZ (HUMANO):
-    1. Seja casual, mas profissional. Evite "Prezado(a)" ou linguagem muito formal. Use "Olá".
-    2. Seja breve. Ninguém lê e-mails longos.
-    3. Nada de robótico. Escreva como se estivesse falando com um colega.
-
-    CONTEÚDO OBRIGATÓRIO:
-    1. Diga que estava revisando a carteira e lembrou deles.
-    2. Sugira 3 categorias de brindes ESPECÍFICAS para o setor de {ramo}. 
-    3. Para cada sugestão, tente inventar um link de busca simples no formato: (www.elobrindes.com.br/?s=produto)
-    4. Encerre com um CTA leve: "Dá uma olhada no site ou me chama aqui se precisar de algo."
-    
-    SAÍDA ESPERADA:
-    Assunto: Ideias para a {ramo}|||Olá {nome_destinatario}, tudo bem?
-
-    Estava aqui revisando alguns parceiros antigos e lembrei de vocês. Faz um tempo que não nos falamos!
-
-    Separei algumas novidades que têm saído muito para o setor de {ramo}:
-
-    - [Sugestão 1] (Link: www.elobrindes.com.br/?s=sugestao1)
-    - [Sugestão 2] (Link: www.elobrindes.com.br/?s=sugestao2)
-    - [Sugestão 3] (Link: www.elobrindes.com.br/?s=sugestao3)
-
-    Se precisar de cotação ou quiser ver mais opções, é só me chamar.
-
-    Abraço,
-    """
-    try:
-        chat_completion = groq_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model="llama-3.3-70b-versatile",
-        )
-        
-        txt = chat_completion.choices[0].message.content.strip()
-        
-        assunto = "Contato Elo Brindes"
-        corpo = txt
-        
-        if "|||" in txt:
-            partes = txt.split("|||", 1)
-            assunto = partes[0].replace("Assunto:", "").strip()
-            corpo = partes[1].strip()
-            
-        return assunto, corpo
-    except Exception as e: return "Erro", str(e)
-
 # =========================================================
 #  INTERFACE (STREAMLIT)
 # =========================================================
@@ -550,6 +348,8 @@ if 'token' not in st.session_state:
 if 'token' in st.session_state:
     st.query_params["token"] = st.session_state['token']
 
+perfil.etapa("sessao")
+
 if 'token' not in st.session_state:
     c1, c2, c3 = st.columns([1,2,1])
     with c2:
@@ -563,8 +363,17 @@ if 'token' not in st.session_state:
                 st.session_state['user'] = user
                 st.query_params["token"] = token
                 st.rerun()
+    perfil.etapa("tela_login")
+    concluir_perfil("login")
     st.stop()
 
+# Pandas/numpy só depois do login: a tela de entrada não precisa deles
+import pandas as pd
+from clientes import baixar_clientes, COLUNAS_INTERNAS, IndiceClientes
+from leads import ler_leads_em_cache, hash_arquivo, normalizar_bloco, ArquivoLeadsInvalido
+from emails import enderecos_validos
+perfil.etapa("imports_pos_login")
+
 token = st.session_state['token']
 user = st.session_state['user']
 
@@ -579,6 +388,7 @@ with st.sidebar:
     st.write(f"👤 **{nome_usuario}**")
     st.caption(f"💼 {cargo_usuario}")
     if st.button("Sair"):
+        esquecer_token(token)
         st.session_state.clear()
         st.query_params.clear() 
         st.rerun()
@@ -602,6 +412,8 @@ with st.sidebar:
             else:
                 ok_pw, msg_pw = alterar_senha_directus(token, nova_pw1)
                 if ok_pw:
+                    esquecer_token(token)
+                    cache_sessao().invalidar_tudo()
                     st.success("✅ Senha alterada! Faça login novamente.")
                     time.sleep(2)
                     st.session_state.clear()
@@ -633,7 +445,7 @@ with st.sidebar:
     
     with st.expander("⚙️ Configurar E-mail (SMTP)"):
         st.info("Necessário para o DISPARO EM MASSA.")
-        conf = config_smtp_crud(token, user_email)
+        conf = obter_config_smtp(token, user_email)
         
         h = st.text_input("Host", value=conf['smtp_host'] if conf else "smtp.gmail.com")
         p = st.number_input("Porta", value=conf['smtp_port'] if conf else 587)
@@ -657,19 +469,52 @@ with st.sidebar:
                 }
                 salvou = config_smtp_crud(token, user_email, payload)
                 if salvou:
+                    cache_sessao().invalidar(('smtp', user_email))
                     st.success("✅ Salvo com sucesso! Recarregando...")
                     time.sleep(1.5)
                     st.rerun()
 
+perfil.etapa("sidebar")
+
 # --- CORPO PRINCIPAL ---
 
 st.title(f"Visão Geral - {nome_usuario}")
 
 # --- PREPARAÇÃO DE DADOS GERAIS ---
-cota_maxima = 100
-# Esta função foi corrigida para usar _gte (greater than) e garantir que a contagem persista
-envios_hoje = contar_envios_hoje_directus(token)
-campanha = carregar_campanha_ativa(token)
+# Cota compartilhada entre sessões e worker (cota.py): leitura local, reconciliação com o Directus em segundo plano
+cota_maxima = cota.COTA_DIARIA
+cota.reconciliar_em_fundo(token)
+envios_hoje = cota.usados_hoje()
+campanha = obter_campanha_ativa(token)
+
+# --- CAMPANHAS EM SEGUNDO PLANO ---
+fila_campanhas.garantir_worker()
+
+@st.fragment(run_every=5)
+def painel_campanhas():
+    # Só este trecho roda a cada 5s: acompanha o worker sem rerodar a página inteira
+    campanhas = fila_campanhas.listar_campanhas(user_email)
+    if not campanhas:
+        return
+    
+    rotulos = {'pendente': '⏳ Na fila', 'executando': '📤 Enviando', 'concluida': '✅ Concluída', 'cancelada': '⛔ Cancelada', 'erro': '❌ Erro', 'cota_esgotada': '🚫 Cota diária esgotada', 'aguardando_cota': '⏸️ Cota do dia esgotada — continua amanhã'}
+    with st.expander("📬 Minhas Campanhas", expanded=any(c['status'] in ('pendente', 'executando') for c in campanhas)):
+        for c in campanhas:
+            total = c['total'] or 0
+            processados = c['processados'] or 0
+            col_c1, col_c2 = st.columns([4, 1])
+            with col_c1:
+                st.progress(
+                    processados / total if total else 0.0,
+                    text=f"#{c['id']} {rotulos.get(c['status'], c['status'])} — {c['assunto']} · {processados}/{total} destinatários · {c['enviados']} e-mails enviados · {c['erros']} erros"
+                )
+            with col_c2:
+                if c['status'] in ('pendente', 'executando', 'aguardando_cota'):
+                    if st.button("Cancelar", key=f"cancelar_camp_{c['id']}", use_container_width=True):
+                        fila_campanhas.cancelar_campanha(c['id'], user_email)
+                        st.rerun(scope="fragment")
+
+painel_campanhas()
 
 # --- SISTEMA DE ABAS ---
 tab_carteira, tab_externo = st.tabs(["📂 Carteira de Clientes", "👽 Prospecção Externa (Upload)"])
@@ -678,14 +523,18 @@ tab_carteira, tab_externo = st.tabs(["📂 Carteira de Clientes", "👽 Prospec
 #  ABA 1: CARTEIRA DE CLIENTES (LÓGICA EXISTENTE)
 # =========================================================
 with tab_carteira:
-    df = carregar_clientes(token)
+    # indice_clientes: busca por id em O(1); os widgets guardam ids, não rótulos
+    df, indice_clientes = carregar_clientes(token, user)
 
     if df.empty:
         st.warning("⚠️ Sua carteira está vazia ou falha ao carregar.")
     else:
+        # Pré-aquece em segundo plano as sugestões de IA das áreas da carteira
+        aquecer_sugestoes(df['area_atuacao'].dropna().astype(str).unique())
+        
         k1, k2, k3 = st.columns(3)
         k1.markdown(f"<div class='metric-card'><h3>Total Clientes</h3><h1>{len(df)}</h1></div>", unsafe_allow_html=True)
-        inativos = len(df[df['Categoria_Cliente'].astype(str).str.contains('Inativo|Frio|Crítico', case=False)])
+        inativos = indice_clientes.oportunidades
         k2.markdown(f"<div class='metric-card'><h3>Oportunidades (Inativos/Crít.)</h3><h1 style='color:#E31937'>{inativos}</h1></div>", unsafe_allow_html=True)
         k3.markdown(f"<div class='metric-card'><h3>Campanha</h3><h4>{campanha['nome_campanha'] if campanha else 'Nenhuma'}</h4></div>", unsafe_allow_html=True)
 
@@ -693,7 +542,7 @@ with tab_carteira:
         st.markdown("### 🔍 Filtros Globais")
         c_f1, c_f2 = st.columns(2)
         with c_f1:
-            opcoes_status = sorted(list(df['Categoria_Cliente'].unique()))
+            opcoes_status = indice_clientes.opcoes_status
             todos_status = st.checkbox("Todos os Status", value=True)
             if todos_status:
                 filtro_status = st.multiselect("Filtrar por Status (Carteira):", options=opcoes_status, default=opcoes_status)
@@ -701,29 +550,27 @@ with tab_carteira:
                 filtro_status = st.multiselect("Filtrar por Status (Carteira):", options=opcoes_status)
 
         with c_f2:
-            opcoes_area = sorted([str(x) for x in df['area_atuacao'].unique() if x is not None])
+            opcoes_area = indice_clientes.opcoes_area
             todas_areas = st.checkbox("Todas as Áreas", value=True)
             if todas_areas:
                 filtro_area = st.multiselect("Filtrar por Área de Atuação:", options=opcoes_area, default=opcoes_area)
             else:
                 filtro_area = st.multiselect("Filtrar por Área de Atuação:", options=opcoes_area)
 
-        df_filtrado = df.copy()
-        if filtro_status:
-            df_filtrado = df_filtrado[df_filtrado['Categoria_Cliente'].isin(filtro_status)]
-        if filtro_area:
-            df_filtrado = df_filtrado[df_filtrado['area_atuacao'].astype(str).isin(filtro_area)]
-
-        if not df_filtrado.empty:
-            df_filtrado['label_select'] = df_filtrado['razao_social'] + " (" + df_filtrado['Ultima_Compra'] + ")"
+        # Memorizado por (versão da carteira, status, áreas): compartilhado, não alterar
+        df_filtrado = indice_clientes.filtrar(filtro_status, filtro_area)
+        ids_filtrados = df_filtrado['id'].tolist()
 
         # --- GATILHO DE SELEÇÃO PELA TABELA ---
-        if "editor_dados" in st.session_state:
-            changes = st.session_state["editor_dados"]["edited_rows"]
+        # edited_rows é posicional: 'editor_ids' guarda os ids da página que a grade mostrou
+        chave_editor = st.session_state.get('editor_chave')
+        if chave_editor and chave_editor in st.session_state:
+            changes = st.session_state[chave_editor]["edited_rows"]
+            ids_editor = st.session_state.get('editor_ids', [])
             for idx, val in changes.items():
                 if val.get("Ação") is True:
                     try:
-                        cliente_alvo = df_filtrado.iloc[int(idx)]['label_select']
+                        cliente_alvo = ids_editor[int(idx)]
                         if st.session_state.get("sb_principal") != cliente_alvo:
                             st.session_state["sb_principal"] = cliente_alvo
                     except Exception: pass
@@ -732,18 +579,14 @@ with tab_carteira:
 
         # --- BLOCO: DISPARO EM MASSA SEGURO ---
         with st.expander("📢 Disparo em Massa (Modo Sniper 🎯)", expanded=False):
-            st.markdown("⚠️ **Regras de Segurança:** O sistema envia 1 e-mail a cada **15~45 segundos** para evitar bloqueios do Google.")
+            st.markdown(f"⚠️ **Regras de Segurança:** O intervalo entre e-mails se ajusta às respostas do servidor: começa em cerca de **30 segundos**, diminui até o mínimo de **{remetentes.PISO_RITMO or 15} segundos** enquanto os envios são aceitos e aumenta, com pausa, se o provedor segurar a conta. Assim evitamos bloqueios do Google.")
             
             # Placeholder para cota visual
             cota_container_1 = st.empty()
             
             def render_cota_1(enviados_sessao=0):
-                # Recalcula com base no global
-                # Correção: somar o que já tinha no banco + o que enviou agora se não tiver atualizado ainda
-                # Mas como salvamos no banco a cada envio, contar_envios_hoje_directus já deve pegar
-                # Para garantir a responsividade visual imediata:
-                total_real = envios_hoje + enviados_sessao
-                # Se o banco atualizar rápido, envios_hoje aumentaria no rerun, mas aqui na sessão somamos manual
+                # O contador da cota é compartilhado e barato de ler: sempre o valor atual
+                total_real = cota.usados_hoje() + enviados_sessao
                 
                 saldo_real = cota_maxima - total_real
                 with cota_container_1.container():
@@ -765,13 +608,8 @@ with tab_carteira:
             with col_m1:
                 st.subheader("1. Selecione os Clientes")
                 
-                mask_email = (
-                    df_filtrado['email_1'].str.contains('@', na=False) | 
-                    df_filtrado['email_2'].str.contains('@', na=False) | 
-                    df_filtrado['representante_email'].str.contains('@', na=False)
-                )
-                df_com_email = df_filtrado[mask_email].copy()
-                lista_clientes_validos = df_com_email['label_select'].tolist()
+                df_com_email = df_filtrado[df_filtrado['tem_email']]
+                lista_clientes_validos = df_com_email['id'].tolist()
                 
                 container_botoes = st.container()
                 col_b1, col_b2 = container_botoes.columns(2)
@@ -782,7 +620,7 @@ with tab_carteira:
                         if pendentes.empty:
                             candidatos = lista_clientes_validos
                         else:
-                            candidatos = pendentes['label_select'].tolist()
+                            candidatos = pendentes['id'].tolist()
                     else:
                         candidatos = lista_clientes_validos
                         
@@ -791,9 +629,15 @@ with tab_carteira:
                 if col_b2.button("Limpar Seleção"):
                     st.session_state['selected_bulk'] = []
                     
+                # Seleção feita com outros filtros não pode derrubar o widget
+                if 'selected_bulk' in st.session_state:
+                    ids_validos = set(lista_clientes_validos)
+                    st.session_state['selected_bulk'] = [i for i in st.session_state['selected_bulk'] if i in ids_validos]
+                
                 selecionados_bulk = st.multiselect(
                     "Clientes Destinatários:", 
                     options=lista_clientes_validos,
+                    format_func=indice_clientes.rotulo,
                     key='selected_bulk'
                 )
                 
@@ -816,82 +660,66 @@ with tab_carteira:
                 
                 arquivo_para_anexo = st.file_uploader("Anexar Imagem ou PDF", type=['png', 'jpg', 'jpeg', 'pdf'])
                 
-                botao_disabled = (saldo_atual <= 0) or (qtd_selecionada == 0) or (qtd_selecionada > saldo_atual) or (qtd_selecionada > 20)
+                personalizar_ia = st.checkbox(
+                    "✨ Personalizar cada e-mail com IA",
+                    value=False,
+                    disabled=not ia_disponivel(),
+                    help="A IA escreve um texto para cada cliente enquanto o sistema aguarda o intervalo entre envios. Se ela falhar ou demorar, vai a mensagem acima."
+                )
+                rodizio_carteira = checkbox_rodizio("rodizio_carteira")
+                
+                fila_ok = exigir_token_servico()
+                botao_disabled = (saldo_atual <= 0) or (qtd_selecionada == 0) or (qtd_selecionada > saldo_atual) or (qtd_selecionada > 20) or not fila_ok
                 
                 if st.button("🚀 INICIAR DISPARO SEGURO", type="primary", use_container_width=True, disabled=botao_disabled):
-                    conf_smtp = config_smtp_crud(token, user_email)
+                    conf_smtp = obter_config_smtp(token, user_email)
                     
                     if not conf_smtp or not conf_smtp.get('smtp_pass_app'):
                         st.error("🚨 Configure o SMTP na barra lateral primeiro!")
                     else:
-                        st.write("---")
-                        status_box = st.status("🦅 Iniciando sequência de envio...", expanded=True)
-                        bar = st.progress(0)
-                        
-                        enviados = 0
-                        erros = 0
-                        log_erros = []
-                        total_empresas = len(selecionados_bulk)
-                        
-                        for i, nome_cliente in enumerate(selecionados_bulk):
-                            if i > 0:
-                                tempo_espera = random.randint(15, 45)
-                                status_box.update(label=f"⏳ Aguardando {tempo_espera}s para parecer humano...", state="running")
-                                time.sleep(tempo_espera)
-                            
-                            cli_row = df_com_email[df_com_email['label_select'] == nome_cliente].iloc[0]
+                        # Monta os destinatários e entrega a campanha ao worker (fila_campanhas)
+                        destinatarios_campanha = []
+                        for id_cliente in selecionados_bulk:
+                            cli_row = indice_clientes.linha(id_cliente)
+                            if cli_row is None:
+                                continue
                             
                             nome_base = str(cli_row['razao_social'])
                             if cli_row.get('representante_nome') and str(cli_row.get('representante_nome')).lower() not in ['none', '', 'nan']:
                                 nome_base = str(cli_row['representante_nome'])
                             primeiro_nome_formatado = nome_base.split()[0].title() if nome_base else ""
                             
-                            msg_final = corpo_padrao.replace("{cliente}", primeiro_nome_formatado)
-                            
+                            # Só endereços válidos (emails.py); o mesmo e-mail em dois campos vai uma vez
                             destinatarios = []
-                            if cli_row['representante_email'] and "@" in str(cli_row['representante_email']):
-                                destinatarios.append({'email': cli_row['representante_email'], 'tipo': 'Representante'})
-                            if cli_row['email_1'] and "@" in str(cli_row['email_1']):
-                                destinatarios.append({'email': cli_row['email_1'], 'tipo': 'Principal'})
-                            if cli_row['email_2'] and "@" in str(cli_row['email_2']):
-                                destinatarios.append({'email': cli_row['email_2'], 'tipo': 'Secundário'})
-
-                            status_box.write(f"📤 Enviando para **{cli_row['razao_social']}**...")
-                            
-                            email_enviado_para_cliente = False
-                            
-                            for dest in destinatarios:
-                                sucesso, msg_log = enviar_email_smtp(token, dest['email'], assunto_padrao, msg_final, conf_smtp, arquivo_anexo=arquivo_para_anexo)
-                                
-                                status_envio_db = "Enviado" if sucesso else f"Erro: {msg_log}"
-                                registrar_log(token, cli_row['pj_id'], assunto_padrao, f"Para: {dest['email']}", status_envio_db)
-
-                                if sucesso:
-                                    email_enviado_para_cliente = True
-                                    enviados += 1
-                                    render_cota_1(enviados)
-                                else:
-                                    erros += 1
-                                    log_erros.append(f"{cli_row['razao_social']} ({dest['email']}): {msg_log}")
+                            for campo, tipo in [('representante_email', 'Representante'), ('email_1', 'Principal'), ('email_2', 'Secundário')]:
+                                for email_valido in enderecos_validos(cli_row[campo]):
+                                    if email_valido not in [d['email'] for d in destinatarios]:
+                                        destinatarios.append({'email': email_valido, 'tipo': tipo})
                             
-                            if email_enviado_para_cliente:
-                                dados_update = {"status_prospect": "Contato Feito"}
-                                if not cli_row['tentativa_1']:
-                                    dados_update["tentativa_1"] = datetime.now().strftime("%d/%m - Email em Massa")
-                                atualizar_cliente_directus(token, cli_row['id'], dados_update)
-                            
-                            bar.progress((i + 1) / total_empresas)
-                        
-                        status_box.update(label="✅ Finalizado!", state="complete", expanded=False)
+                            destinatarios_campanha.append({
+                                'nome': cli_row['razao_social'],
+                                'cliente_id': cli_row['id'],
+                                'pj_id': cli_row['pj_id'],
+                                'variaveis': {"{cliente}": primeiro_nome_formatado},
+                                'emails': destinatarios,
+                                'atualizar_tentativa': not cli_row['tentativa_1'],
+                                'dados_ia': {'nome': primeiro_nome_formatado, 'ramo': str(cli_row['area_atuacao']), 'data_compra': cli_row['Ultima_Compra']},
+                            })
                         
-                        if enviados > 0:
-                            st.success(f"Processo finalizado! {enviados} e-mails enviados.")
-                            st.balloons()
-                            time.sleep(3)
-                            st.rerun()
+                        contexto_ia = None
+                        if personalizar_ia:
+                            contexto_ia = {
+                                'campanha': {'nome_campanha': campanha['nome_campanha']} if campanha else None,
+                                'usuario_nome': nome_usuario,
+                                'usuario_cargo': cargo_usuario,
+                            }
                         
-                        if erros > 0:
-                            st.error(f"Ocorreram {erros} erros. Verifique o console.")
+                        id_campanha = fila_campanhas.criar_campanha(
+                            'carteira', user_email, conf_envio(token, conf_smtp, rodizio_carteira), assunto_padrao, corpo_padrao,
+                            destinatarios_campanha, anexo=arquivo_para_anexo, intervalo=(15, 45), contexto_ia=contexto_ia
+                        )
+                        fila_campanhas.garantir_worker(intervalo=0)
+                        st.success(f"✅ Campanha #{id_campanha} na fila! Acompanhe o progresso em 'Minhas Campanhas' — pode fechar a aba.")
 
         st.divider()
 
@@ -900,21 +728,21 @@ with tab_carteira:
         with col_left:
             st.subheader("🚀 Modo de Ataque (Vendas)")
             if not df_filtrado.empty:
-                opcoes = sorted(df_filtrado['label_select'].tolist())
+                opcoes = indice_clientes.ordenar_por_rotulo(ids_filtrados)
                 
-                if "sb_principal" not in st.session_state:
-                    st.session_state["sb_principal"] = "Selecione..."
-                if st.session_state["sb_principal"] not in (["Selecione..."] + opcoes):
-                    st.session_state["sb_principal"] = "Selecione..."
+                # None = "Selecione..."; o valor guardado é o id do cliente
+                if st.session_state.get("sb_principal") not in set(opcoes):
+                    st.session_state["sb_principal"] = None
 
                 selecionado = st.selectbox(
                     "Busque Cliente (Filtrado):", 
-                    ["Selecione..."] + opcoes, 
+                    [None] + opcoes, 
+                    format_func=lambda i: "Selecione..." if i is None else indice_clientes.rotulo(i),
                     key="sb_principal" 
                 )
 
-                if selecionado and selecionado != "Selecione...":
-                    cli = df_filtrado[df_filtrado['label_select'] == selecionado].iloc[0]
+                if selecionado is not None:
+                    cli = indice_clientes.linha(selecionado)
                     dias = cli['dias_sem_compra']
                     area_cli = str(cli['area_atuacao'])
                     tel_raw = str(cli['telefone_1'])
@@ -940,7 +768,15 @@ with tab_carteira:
                     else:
                         email_para_ia = email_cli
 
-                    with st.spinner("🦅 Consultando catálogo Elo Brindes..."):
+                    # Sugestões vêm do cache pré-aquecido; o card não espera a IA
+                    em_cache = sugestoes_em_cache(area_cli) if ia_disponivel() else None
+                    if em_cache:
+                        sugestoes, motivo_sugestao = em_cache
+                    elif ia_disponivel():
+                        aquecer_sugestoes([area_cli])
+                        sugestoes = ["🎁 Kit Boas Vindas Personalizado", "🎁 Caneta Metal Premium", "🎁 Caderno Moleskine com Logo"]
+                        motivo_sugestao = "Sugestão Padrão (IA preparando sugestão para esta área, reabra em instantes)"
+                    else:
                         sugestoes, motivo_sugestao = gerar_sugestoes_elo_brindes(area_cli)
                         
                     html_sugestoes = "".join([f"<div class='sku-item'>{s}</div>" for s in sugestoes])
@@ -986,7 +822,7 @@ with tab_carteira:
                             st.link_button("📧 Gmail", link_gmail, use_container_width=True)
                     with b3:
                         if st.button("✨ IA Magica", use_container_width=True):
-                            if not groq_client: 
+                            if not ia_disponivel(): 
                                 st.error("Sem Chave IA")
                             else:
                                 with st.spinner(f"🤖 Escrevendo e-mail para {nome_para_ia}..."):
@@ -1022,25 +858,23 @@ with tab_carteira:
 
         with col_right:
             st.subheader("📝 Modo Atualização")
-            def checar_pendencia(row):
-                t = limpar_telefone(row['telefone_1'])
-                e = str(row['email_1'])
-                if not t or len(t) < 8: return True
-                if not e or '@' not in e or 'nan' in e: return True
-                return False
             
             if not df_filtrado.empty:
-                df_filtrado['pendente'] = df_filtrado.apply(checar_pendencia, axis=1)
-                df_pend = df_filtrado[df_filtrado['pendente'] == True].copy()
+                # 'pendente' já vem calculado em preparar_clientes
+                df_pend = df_filtrado[df_filtrado['pendente']]
                 
                 if df_pend.empty:
                     st.success("✅ Nenhum cadastro pendente nos filtros selecionados!")
                 else:
-                    df_pend['lbl'] = df_pend['razao_social'] + " (Pendente)"
-                    sel_up = st.selectbox("Atualizar:", ["Selecione..."] + sorted(df_pend['lbl'].tolist()))
+                    razao_pend = dict(zip(df_pend['id'].tolist(), df_pend['razao_social'].tolist()))
+                    sel_up = st.selectbox(
+                        "Atualizar:",
+                        [None] + sorted(razao_pend, key=lambda i: (str(razao_pend[i]), str(i))),
+                        format_func=lambda i: "Selecione..." if i is None else f"{razao_pend[i]} (Pendente)"
+                    )
                     
-                    if sel_up and sel_up != "Selecione...":
-                        cli_up = df_pend[df_pend['lbl'] == sel_up].iloc[0]
+                    if sel_up is not None:
+                        cli_up = indice_clientes.linha(sel_up)
                         st.markdown(f"""
                         <div class="foco-card" style="border-left: 6px solid #FFD700;">
                             <h3 style='color:#FFD700'>⚠️ Dados Faltantes</h3>
@@ -1070,7 +904,7 @@ with tab_carteira:
         st.divider()
         st.subheader("📋 Lista Geral (Editável - Auto Save)")
 
-        todas_colunas = list(df.columns)
+        todas_colunas = [c for c in df.columns if c not in COLUNAS_INTERNAS]
 
         CONFIG_FILE = "grid_config.json"
         cols_default = [c for c in ['pj_id', 'razao_social', 'status_prospect', 'email_2', 'representante_nome', 'Categoria_Cliente', 'area_atuacao', 'Ultima_Compra', 'telefone_1'] if c in todas_colunas]
@@ -1112,44 +946,80 @@ with tab_carteira:
                 "Ação": st.column_config.CheckboxColumn("➡️ Abrir", help="Clique para abrir os dados deste cliente lá em cima", default=False)
             }
 
-            df_filtrado.insert(0, "Ação", False)
+            # --- PAGINAÇÃO: só a página visível vai para o navegador ---
+            total_linhas = len(df_filtrado)
+            c_g1, c_g2, c_g3, c_g4 = st.columns([2, 1, 1, 1])
+            with c_g1:
+                opcoes_ordem = [c for c in colunas_selecionadas if c in df_filtrado.columns] or ['razao_social']
+                coluna_ordem = st.selectbox("Ordenar por:", opcoes_ordem, key="grade_ordem")
+            with c_g2:
+                crescente = st.selectbox("Ordem:", ["⬆️ Crescente", "⬇️ Decrescente"], key="grade_sentido") == "⬆️ Crescente"
+            with c_g3:
+                tamanho_pagina = st.selectbox("Linhas por página:", [50, 100, 250, 500, 1000], index=1, key="grade_tamanho")
+            total_paginas = max((total_linhas + tamanho_pagina - 1) // tamanho_pagina, 1)
+            if st.session_state.get("grade_pagina", 1) > total_paginas:
+                st.session_state["grade_pagina"] = total_paginas
+            with c_g4:
+                pagina = int(st.number_input("Página:", min_value=1, max_value=total_paginas, step=1, key="grade_pagina"))
+
+            inicio = (pagina - 1) * tamanho_pagina
+            posicoes = indice_clientes.ordenar(filtro_status, filtro_area, coluna_ordem, crescente)[inicio:inicio + tamanho_pagina]
+            st.caption(f"Mostrando {inicio + 1 if total_linhas else 0}–{inicio + len(posicoes)} de {total_linhas} clientes · página {pagina}/{total_paginas}")
+
+            # Só as colunas exibidas: o df_filtrado é compartilhado e não pode ganhar a coluna "Ação"
+            df_grade = df_filtrado.iloc[posicoes][colunas_selecionadas + ['id']]
+            df_grade.insert(0, "Ação", False)
+            ids_pagina = df_grade['id'].tolist()
+
+            # Outra janela (dados recarregados, filtro, ordem ou página): grade nova, sem edited_rows de outras linhas
+            janela = (indice_clientes.versao, tuple(sorted(map(str, filtro_status))), tuple(sorted(filtro_area)), coluna_ordem, crescente, tamanho_pagina, pagina)
+            if st.session_state.get('editor_janela') != janela:
+                st.session_state['editor_janela'] = janela
+                st.session_state['editor_seq'] = st.session_state.get('editor_seq', 0) + 1
+            chave_editor = f"editor_dados_{st.session_state['editor_seq']}"
+            st.session_state['editor_chave'] = chave_editor
+            st.session_state['editor_ids'] = ids_pagina
 
             edicoes = st.data_editor(
-                df_filtrado[["Ação"] + colunas_selecionadas + ['id']], 
-                key="editor_dados",
+                df_grade, 
+                key=chave_editor,
                 hide_index=True,
                 column_config=config_cols,
                 use_container_width=True,
                 num_rows="fixed"
             )
 
-            if "editor_dados" in st.session_state and st.session_state["editor_dados"]["edited_rows"]:
-                alteracoes = st.session_state["editor_dados"]["edited_rows"]
-                tem_edicao_real = False
-                for idx, mudanca in alteracoes.items():
-                    if any(k != "Ação" for k in mudanca.keys()):
-                        tem_edicao_real = True
-                        break
+            if chave_editor in st.session_state and st.session_state[chave_editor]["edited_rows"]:
+                alteracoes = st.session_state[chave_editor]["edited_rows"]
                 
-                if tem_edicao_real:
-                    sucessos = 0
-                    erros = 0
-                    for i, mudancas in alteracoes.items():
-                        dados_limpos = {k: v for k, v in mudancas.items() if k not in ['GAP (dias)', 'Ultima_Compra', 'Categoria_Cliente', 'label_select', 'data_temp', 'dias_sem_compra', 'pendente', 'Ação']}
-                        if dados_limpos:
-                            try:
-                                id_cliente = df_filtrado.iloc[i]['id']
-                                if atualizar_cliente_directus(token, id_cliente, dados_limpos):
-                                    sucessos += 1
-                                else:
-                                    erros += 1
-                            except Exception as e:
-                                erros += 1
-                    
-                    if sucessos > 0:
-                        st.toast(f"✅ {sucessos} alterações salvas automaticamente!", icon="💾")
+                # O edited_rows sobrevive ao rerun: o diário filtra o que já foi gravado nesta grade
+                diario = st.session_state.get('diario_edicoes')
+                if diario is None or diario.chave_editor != chave_editor:
+                    diario = st.session_state['diario_edicoes'] = DiarioEdicoes(chave_editor)
+                
+                edicoes = []
+                for i, mudancas in alteracoes.items():
+                    dados_limpos = {k: v for k, v in mudancas.items() if k not in ['GAP (dias)', 'Ultima_Compra', 'Categoria_Cliente', 'label_select', 'data_temp', 'dias_sem_compra', 'pendente', 'Ação']}
+                    if not dados_limpos:
+                        continue
+                    try:
+                        id_cliente = ids_pagina[int(i)]
+                    except Exception:
+                        continue
+                    edicoes.extend((id_cliente, k, v) for k, v in dados_limpos.items())
+                
+                payloads = diario.pendentes(edicoes)
+                if payloads:
+                    if atualizar_clientes_lote(token, payloads):
+                        diario.marcar_gravados(payloads)
+                        celulas = sum(len(campos) for campos in payloads.values())
+                        st.toast(f"✅ {celulas} alterações em {len(payloads)} clientes salvas automaticamente!", icon="💾")
                         time.sleep(1) 
                         st.rerun()
+                    else:
+                        st.error("Erro ao salvar alterações. Elas serão reenviadas na próxima interação.")
+
+perfil.etapa("aba_carteira")
 
 # =========================================================
 #  ABA 2: PROSPECÇÃO EXTERNA (NOVO)
@@ -1162,9 +1032,7 @@ with tab_externo:
     cota_container_2 = st.empty()
     
     def render_cota_2(enviados_sessao=0):
-        # Aqui usamos o valor atualizado do banco + o da sessão atual desta aba
-        # Como o banco deve atualizar rápido no log, e envios_hoje é estático, precisamos somar.
-        total_real = envios_hoje + enviados_sessao
+        total_real = cota.usados_hoje() + enviados_sessao
         saldo_real = cota_maxima - total_real
         with cota_container_2.container():
             col_cota1, col_cota2 = st.columns([3, 1])
@@ -1188,64 +1056,81 @@ with tab_externo:
         tab_up_file, tab_up_txt = st.tabs(["📁 Upload Arquivo", "✍️ Colar Manual"])
         
         df_externo = pd.DataFrame()
+        PREVIA_LEADS = 500
         
         with tab_up_file:
             uploaded_file = st.file_uploader("Upload Excel (.xlsx) ou CSV", type=['xlsx', 'csv'])
             if uploaded_file:
+                # Leitura em blocos (leads.py): memória limitada mesmo em listas enormes
+                aviso_leitura = st.empty()
+                def progresso_leads(lidas, validos):
+                    aviso_leitura.caption(f"📥 Lendo arquivo: {lidas} linhas, {validos} e-mails válidos...")
                 try:
-                    if uploaded_file.name.endswith('.csv'):
-                        df_externo = pd.read_csv(uploaded_file)
-                    else:
-                        df_externo = pd.read_excel(uploaded_file)
-                    
-                    # Normaliza colunas
-                    cols_lower = {c: c.lower().strip() for c in df_externo.columns}
-                    df_externo.rename(columns=cols_lower, inplace=True)
-                    
-                    # Tenta achar colunas chaves
-                    col_email = next((c for c in df_externo.columns if 'email' in c or 'e-mail' in c), None)
-                    col_nome = next((c for c in df_externo.columns if 'nome' in c or 'name' in c), None)
-                    col_empresa = next((c for c in df_externo.columns if 'empresa' in c or 'company' in c or 'razao' in c), None)
-                    
-                    if col_email:
-                        df_externo = df_externo.rename(columns={col_email: 'Email'})
-                        if col_nome: df_externo = df_externo.rename(columns={col_nome: 'Nome'})
-                        if col_empresa: df_externo = df_externo.rename(columns={col_empresa: 'Empresa'})
-                        
-                        # Garante colunas mínimas
-                        if 'Nome' not in df_externo.columns: df_externo['Nome'] = 'Parceiro'
-                        if 'Empresa' not in df_externo.columns: df_externo['Empresa'] = ''
-                        
-                        df_externo = df_externo[['Nome', 'Email', 'Empresa']].dropna(subset=['Email'])
-                        df_externo = df_externo[df_externo['Email'].astype(str).str.contains('@')]
-                    else:
-                        st.error("❌ Não encontrei uma coluna de E-mail no arquivo.")
-                        df_externo = pd.DataFrame()
-                        
+                    # Lido uma vez por conteúdo (cache por hash); o hash só é recalculado quando o upload muda
+                    id_upload = (getattr(uploaded_file, 'file_id', None) or uploaded_file.name, uploaded_file.size)
+                    if st.session_state.get('leads_upload', (None, None))[0] != id_upload:
+                        st.session_state['leads_upload'] = (id_upload, hash_arquivo(uploaded_file))
+                    df_externo, relatorio_leads, _ = ler_leads_em_cache(
+                        uploaded_file, uploaded_file.name, ao_progresso=progresso_leads,
+                        hash_conteudo=st.session_state['leads_upload'][1]
+                    )
+                    aviso_leitura.caption(
+                        f"📥 {relatorio_leads.get('linhas', 0)} linhas lidas, {len(df_externo)} e-mails válidos · "
+                        f"{relatorio_leads.get('rejeitados', 0)} inválidos descartados · "
+                        f"{relatorio_leads.get('corrigidos', 0)} domínios corrigidos · "
+                        f"{relatorio_leads.get('divididos', 0)} extras de células com vários e-mails"
+                    )
+                except ArquivoLeadsInvalido as e:
+                    aviso_leitura.empty()
+                    st.error(f"❌ {e}")
+                    df_externo = pd.DataFrame()
                 except Exception as e:
+                    aviso_leitura.empty()
                     st.error(f"Erro ao ler arquivo: {e}")
+                    df_externo = pd.DataFrame()
 
         with tab_up_txt:
             txt_emails = st.text_area("Cole a lista (Formato: email, nome, empresa)", height=150, help="Um por linha. Ex:\njoao@teste.com, João, Padaria Silva\nmaria@teste.com, Maria,")
             if txt_emails:
-                lines = txt_emails.split('\n')
-                data_manual = []
-                for ln in lines:
-                    parts = ln.split(',')
-                    if len(parts) >= 1 and '@' in parts[0]:
-                        email = parts[0].strip()
-                        nome = parts[1].strip() if len(parts) > 1 else "Parceiro"
-                        empresa = parts[2].strip() if len(parts) > 2 else ""
-                        data_manual.append({'Email': email, 'Nome': nome, 'Empresa': empresa})
-                if data_manual:
-                    df_externo = pd.DataFrame(data_manual)
+                lines = [ln for ln in txt_emails.split('\n') if ln.strip()]
+                parts = [ln.split(',') for ln in lines]
+                # Mesma validação do upload (emails.py)
+                df_manual, relatorio_manual = normalizar_bloco(
+                    [p[0] for p in parts],
+                    [p[1] if len(p) > 1 else None for p in parts],
+                    [p[2] if len(p) > 2 else None for p in parts],
+                )
+                if relatorio_manual['rejeitados']:
+                    st.caption(f"⚠️ {relatorio_manual['rejeitados']} linhas sem e-mail válido foram ignoradas.")
+                if not df_manual.empty:
+                    df_externo = df_manual
         
+        # Supressão (supressao.py): repetidos, clientes da carteira, envio recente e descadastro
+        supressao.sincronizar_em_fundo(token)
+        if not df_externo.empty:
+            df_externo, removidos = supressao.filtrar_leads(df_externo, indice_clientes)
+            if sum(removidos.values()):
+                detalhes = " · ".join(f"{n} {supressao.MOTIVOS[m]}" for m, n in removidos.items() if n)
+                st.warning(f"🚫 {sum(removidos.values())} contatos removidos da lista: {detalhes}.")
+
         if not df_externo.empty:
             st.info(f"📋 {len(df_externo)} contatos carregados.")
-            st.dataframe(df_externo, height=200, use_container_width=True)
+            # Prévia limitada: listas grandes não vão inteiras para o navegador
+            st.dataframe(df_externo.head(PREVIA_LEADS), height=200, use_container_width=True)
+            if len(df_externo) > PREVIA_LEADS:
+                st.caption(f"Mostrando os primeiros {PREVIA_LEADS} contatos.")
         else:
             st.info("Aguardando dados...")
 
+        with st.expander(f"🚫 Descadastros ({supressao.indice.total_optout()})", expanded=False):
+            txt_optout = st.text_area("E-mails que pediram para não receber mais (um por linha):", height=100, key="txt_optout")
+            if st.button("Adicionar aos descadastros", use_container_width=True):
+                adicionados = supressao.adicionar_optout(txt_optout.splitlines())
+                if adicionados:
+                    st.success(f"✅ {adicionados} e-mails não receberão mais campanhas.")
+                else:
+                    st.warning("Nenhum e-mail válido informado.")
+
     with c_ext2:
         st.markdown("#### 2. Configurar Disparo")
         
@@ -1255,49 +1140,34 @@ with tab_externo:
         anexo_ext = st.file_uploader("Anexo (Imagem/PDF)", type=['png', 'jpg', 'pdf'], key="anexo_ext")
         
         st.caption("Variáveis disponíveis: {nome}, {empresa}, {{IMAGEM}}")
+        rodizio_externo = checkbox_rodizio("rodizio_externo")
         
         saldo_atual_2 = cota_maxima - envios_hoje
         qtd_ext = len(df_externo)
         
-        btn_ext_disabled = (qtd_ext == 0) or (saldo_atual_2 <= 0) or (qtd_ext > saldo_atual_2)
+        fila_ok_ext = exigir_token_servico()
+        btn_ext_disabled = (qtd_ext == 0) or (saldo_atual_2 <= 0) or (qtd_ext > saldo_atual_2) or not fila_ok_ext
         
         if st.button("🚀 ENVIAR CAMPANHA EXTERNA", type="primary", use_container_width=True, disabled=btn_ext_disabled):
-            conf_smtp = config_smtp_crud(token, user_email)
+            conf_smtp = obter_config_smtp(token, user_email)
             if not conf_smtp:
                 st.error("Configure SMTP primeiro.")
             else:
-                status_box_2 = st.status("Iniciando Prospecção Fria...", expanded=True)
-                bar_2 = st.progress(0)
-                env_2 = 0
-                err_2 = 0
-                
-                for i, row in df_externo.iterrows():
-                    if i > 0:
-                        ts = random.randint(20, 50) # Delay um pouco maior para frios
-                        status_box_2.update(label=f"⏳ Delay de segurança: {ts}s...", state="running")
-                        time.sleep(ts)
-                    
-                    nome_format = str(row['Nome']).title()
-                    empresa_format = str(row['Empresa']).title()
-                    
-                    msg_final_ext = corpo_ext.replace("{nome}", nome_format).replace("{empresa}", empresa_format)
-                    
-                    status_box_2.write(f"Enviando para {row['Email']}...")
-                    
-                    ok, log_msg = enviar_email_smtp(token, row['Email'], assunto_ext, msg_final_ext, conf_smtp, anexo_ext)
-                    
-                    # LOG NO DIRECTUS (PJ_ID = None ou 0 para indicar externo)
-                    status_log = "Enviado [EXTERNO]" if ok else f"Erro [EXTERNO]: {log_msg}"
-                    registrar_log(token, "0", assunto_ext, f"Lead: {row['Email']}", status_log)
-                    
-                    if ok:
-                        env_2 += 1
-                        render_cota_2(env_2)
-                    else:
-                        err_2 += 1
-                        
-                    bar_2.progress((i+1)/len(df_externo))
+                destinatarios_ext = []
+                for _, row in df_externo.iterrows():
+                    destinatarios_ext.append({
+                        'nome': row['Email'],
+                        'variaveis': {"{nome}": str(row['Nome']).title(), "{empresa}": str(row['Empresa']).title()},
+                        'emails': [{'email': str(row['Email']), 'tipo': 'Lead'}],
+                    })
                 
-                status_box_2.update(label="✅ Campanha Finalizada!", state="complete")
-                st.success(f"Feito! {env_2} enviados, {err_2} erros.")
-                st.balloons()
+                # Delay um pouco maior para frios
+                id_campanha = fila_campanhas.criar_campanha(
+                    'externa', user_email, conf_envio(token, conf_smtp, rodizio_externo), assunto_ext, corpo_ext,
+                    destinatarios_ext, anexo=anexo_ext, intervalo=(20, 50)
+                )
+                fila_campanhas.garantir_worker(intervalo=0)
+                st.success(f"✅ Campanha #{id_campanha} na fila! Acompanhe o progresso em 'Minhas Campanhas' — pode fechar a aba.")
+
+perfil.etapa("aba_externo")
+concluir_perfil("app")
@@ -0,0 +1,10 @@
+import os
+
+# Pasta local para os arquivos do servidor (fila de campanhas, caches em disco...).
+# No Docker, monte um volume aqui para sobreviver a restart do container.
+DADOS_DIR = os.getenv("ELOFLOW_DADOS_DIR", "dados")
+
+
+def caminho_dados(nome):
+    os.makedirs(DADOS_DIR, exist_ok=True)
+    return os.path.join(DADOS_DIR, nome)
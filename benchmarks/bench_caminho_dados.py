@@ -0,0 +1,237 @@
+"""
+Benchmark do caminho de dados do app contra um Directus local (directus_falso.py).
+
+Para cada tamanho gera carteira e histórico sintéticos (dados_sinteticos.py) e mede:
+  carregar_clientes  download paginado + enriquecimento + índice (clientes.baixar_clientes)
+  enriquecimento     clientes.preparar_clientes sobre a carteira crua
+  indice             montagem do IndiceClientes
+  filtros_globais    todas as combinações de status/área, sem memo, + ordenação
+  importacao_leads   leads.ler_leads de um CSV com o mesmo número de linhas
+  supressao          supressao.filtrar_leads da lista importada
+  contagem_envios    cota.contar_envios_hoje_directus (filtro + aggregate)
+  mime               MensagemCampanha + montar para até LIMITE_MIME destinatários
+
+O resultado vai para um JSON (benchmarks/resultados/ por padrão). Com --comparar,
+mostra a variação contra um resultado anterior e sai com código 1 se alguma
+etapa piorar além da tolerância.
+
+Uso: python benchmarks/bench_caminho_dados.py [--tamanhos 1000 10000 100000 500000]
+         [--repeticoes 3] [--saida arquivo.json] [--comparar anterior.json] [--tolerancia 0.2]
+"""
+import argparse
+import atexit
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Nada do benchmark pode cair na pasta dados/ de verdade
+if "ELOFLOW_DADOS_DIR" not in os.environ:
+    os.environ["ELOFLOW_DADOS_DIR"] = tempfile.mkdtemp(prefix="eloflow-bench-")
+    atexit.register(shutil.rmtree, os.environ["ELOFLOW_DADOS_DIR"], True)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import cota  # noqa: E402
+import leads  # noqa: E402
+import supressao  # noqa: E402
+from clientes import IndiceClientes, baixar_clientes, preparar_clientes  # noqa: E402
+from dados_sinteticos import gerar_clientes, gerar_historico, gerar_leads_csv  # noqa: E402
+from directus import directus  # noqa: E402
+from directus_falso import DirectusFalso  # noqa: E402
+from envio import Anexo  # noqa: E402
+from mensagens import MensagemCampanha  # noqa: E402
+
+TAMANHOS_PADRAO = [1000, 10000, 100000, 500000]
+LIMITE_MIME = 10000
+TOKEN = "token-bench"
+PASTA_RESULTADOS = os.path.join(RAIZ, "benchmarks", "resultados")
+
+CONF_SMTP = {"smtp_user": "vendas@elobrindes.com.br", "assinatura_html": "<p>Equipe Elo Brindes</p>"}
+CORPO_MODELO = "Olá {cliente},\n\nSeparei novidades para o seu setor.\n\n{{IMAGEM}}\n\nAbraço!"
+
+
+def cronometrar(fn, repeticoes, preparar=None):
+    """Executa fn() `repeticoes` vezes (preparar() fora do tempo). Retorna (tempos, último resultado)."""
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        argumento = preparar() if preparar else None
+        inicio = time.perf_counter()
+        resultado = fn(argumento) if preparar else fn()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos, resultado
+
+
+def resumo_tempos(tempos, itens):
+    melhor = min(tempos)
+    return {
+        "melhor_s": round(melhor, 6),
+        "mediana_s": round(statistics.median(tempos), 6),
+        "tempos_s": [round(t, 6) for t in tempos],
+        "itens": itens,
+        "itens_por_s": round(itens / melhor, 1) if melhor > 0 else None,
+    }
+
+
+def medir_tamanho(n, repeticoes):
+    print(f"\n== {n} linhas ==", flush=True)
+    inicio = time.perf_counter()
+    clientes = gerar_clientes(n)
+    historico = gerar_historico(n, clientes, agora=datetime.now())
+    csv_leads = gerar_leads_csv(n)
+    print(f"  dados sintéticos gerados em {time.perf_counter() - inicio:.1f}s", flush=True)
+
+    etapas = {}
+
+    def registrar(nome, tempos, itens):
+        etapas[nome] = resumo_tempos(tempos, itens)
+        print(f"  {nome:<18} {etapas[nome]['melhor_s']:>9.3f}s  (mediana {etapas[nome]['mediana_s']:.3f}s)", flush=True)
+
+    with DirectusFalso({"clientes": clientes, "historico_envios": historico}) as servidor:
+        url_original = directus.base_url
+        directus.base_url = servidor.url
+        try:
+            tempos, resultado = cronometrar(lambda: baixar_clientes(TOKEN), repeticoes)
+            if resultado is None:
+                raise SystemExit("O Directus falso recusou a carteira")
+            df, indice, _ = resultado
+            registrar("carregar_clientes", tempos, n)
+
+            tempos, contagem = cronometrar(lambda: cota.contar_envios_hoje_directus(TOKEN), repeticoes)
+            registrar("contagem_envios", tempos, len(historico))
+        finally:
+            directus.base_url = url_original
+
+    # dtype object mantém os None como vêm do JSON do Directus
+    crua = pd.DataFrame(clientes).astype(object)
+    tempos, _ = cronometrar(preparar_clientes, repeticoes, preparar=crua.copy)
+    registrar("enriquecimento", tempos, n)
+
+    tempos, _ = cronometrar(lambda: IndiceClientes(df), repeticoes)
+    registrar("indice", tempos, n)
+
+    combinacoes = [([], [])] + [([s], []) for s in indice.opcoes_status] + [([], [a]) for a in indice.opcoes_area[:5]]
+
+    def filtrar_tudo(indice_novo):
+        for status, areas in combinacoes:
+            indice_novo.filtrar(status, areas)
+        indice_novo.ordenar([], [], 'Ultima_Compra', False)
+
+    # Índice novo a cada repetição (fora do tempo) para não medir o memo
+    tempos, _ = cronometrar(filtrar_tudo, repeticoes, preparar=lambda: IndiceClientes(df))
+    registrar("filtros_globais", tempos, n * len(combinacoes))
+
+    tempos, (df_leads, relatorio) = cronometrar(lambda: leads.ler_leads(io.BytesIO(csv_leads), "leads.csv"), repeticoes)
+    registrar("importacao_leads", tempos, n)
+
+    def filtrar_supressao(lista):
+        return supressao.filtrar_leads(lista, indice)
+
+    # Cópia a cada repetição: filtrar_leads memoriza por objeto
+    tempos, _ = cronometrar(filtrar_supressao, repeticoes, preparar=df_leads.copy)
+    registrar("supressao", tempos, len(df_leads))
+
+    n_mime = min(n, LIMITE_MIME)
+    # Cabeçalho PNG + bytes aleatórios: o MIMEImage só olha a assinatura
+    anexo = Anexo("banner.png", "image/png", conteudo=b"\x89PNG\r\n\x1a\n" + np.random.default_rng(1).bytes(200 * 1024))
+
+    def montar_mensagens():
+        mensagem = MensagemCampanha("Novidades Elo Brindes", CORPO_MODELO, CONF_SMTP, anexo)
+        for i in range(n_mime):
+            mensagem.montar([f"contato{i}@empresa.com.br"], CORPO_MODELO.replace("{cliente}", f"Cliente {i}"))
+
+    tempos, _ = cronometrar(montar_mensagens, repeticoes)
+    registrar("mime", tempos, n_mime)
+
+    return {
+        "linhas": n,
+        "etapas": etapas,
+        "conferencia": {
+            "clientes": len(df),
+            "envios_hoje": contagem,
+            "leads_validos": len(df_leads),
+            "relatorio_leads": relatorio,
+        },
+    }
+
+
+def metadados():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "quando": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def comparar(atual, caminho_anterior, tolerancia):
+    """Imprime a variação por etapa; retorna a lista de (tamanho, etapa, variação) acima da tolerância."""
+    with open(caminho_anterior, encoding="utf-8") as f:
+        anterior = {r["linhas"]: r["etapas"] for r in json.load(f)["resultados"]}
+    piores = []
+    print(f"\nComparação com {caminho_anterior} (melhor tempo):")
+    for resultado in atual["resultados"]:
+        etapas_antes = anterior.get(resultado["linhas"])
+        if not etapas_antes:
+            continue
+        for nome, dados in resultado["etapas"].items():
+            antes = etapas_antes.get(nome)
+            if not antes or not antes["melhor_s"]:
+                continue
+            variacao = dados["melhor_s"] / antes["melhor_s"] - 1
+            marca = "  <-- piorou" if variacao > tolerancia else ""
+            print(f"  {resultado['linhas']:>7} {nome:<18} {antes['melhor_s']:>9.3f}s -> {dados['melhor_s']:>9.3f}s  {variacao:+7.1%}{marca}")
+            if variacao > tolerancia:
+                piores.append((resultado["linhas"], nome, variacao))
+    return piores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do caminho de dados do ELOFLOW.")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=TAMANHOS_PADRAO)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--saida", help="arquivo JSON de resultado (padrão: benchmarks/resultados/bench-<data>.json)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="piora aceitável por etapa (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    resultado = {"metadados": metadados(), "repeticoes": args.repeticoes, "resultados": []}
+    for n in args.tamanhos:
+        # Tamanhos grandes com menos repetições: a geração e o download já dominam o tempo
+        repeticoes = args.repeticoes if n < 100000 else max(1, min(args.repeticoes, 2))
+        resultado["resultados"].append(medir_tamanho(n, repeticoes))
+
+    saida = args.saida or os.path.join(PASTA_RESULTADOS, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"\nResultado gravado em {saida}")
+
+    if args.comparar:
+        piores = comparar(resultado, args.comparar, args.tolerancia)
+        if piores:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Compara o enriquecimento antigo (df.apply linha a linha) com clientes.preparar_clientes.
+
+Uso: python benchmarks/bench_enriquecimento.py [linhas ...]
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clientes import preparar_clientes  # noqa: E402
+
+
+# --- Versões antigas (como estavam no app.py) ---
+
+def limpar_telefone(phone):
+    if pd.isna(phone): return None
+    return "".join(filter(str.isdigit, str(phone)))
+
+
+def preparar_antigo(df):
+    df['data_temp'] = pd.to_datetime(df['data_ultima_compra'], errors='coerce')
+    df['Ultima_Compra'] = df['data_temp'].dt.strftime('%d/%m/%Y').fillna("-")
+    hoje = pd.Timestamp.now()
+    df['dias_sem_compra'] = (hoje - df['data_temp']).dt.days.fillna(9999).astype(int)
+
+    def definir_cat(row):
+        if 'status_carteira' in row and row['status_carteira']: return row['status_carteira']
+        dias = row['dias_sem_compra']
+        if dias > 365: return "Crítico"
+        if dias > 180: return "Inativo"
+        return "Ativo"
+
+    df['Categoria_Cliente'] = df.apply(definir_cat, axis=1)
+    df['GAP (dias)'] = df['dias_sem_compra']
+    for col in ['tentativa_1', 'tentativa_2', 'tentativa_3']:
+        df[col] = df[col].fillna("")
+
+    df['label_select'] = df['razao_social'] + " (" + df['Ultima_Compra'] + ")"
+    df['tem_email'] = (
+        df['email_1'].str.contains('@', na=False) |
+        df['email_2'].str.contains('@', na=False) |
+        df['representante_email'].str.contains('@', na=False)
+    )
+
+    def checar_pendencia(row):
+        t = limpar_telefone(row['telefone_1'])
+        e = str(row['email_1'])
+        if not t or len(t) < 8: return True
+        if not e or '@' not in e or 'nan' in e: return True
+        return False
+
+    df['pendente'] = df.apply(checar_pendencia, axis=1)
+    return df
+
+
+def gerar_carteira(n, seed=42):
+    rnd = random.Random(seed)
+    status = [None, None, None, "", "Ativo", "Inativo", "Frio"]
+    def email(): return rnd.choice([None, "", "sem email", f"contato{rnd.randint(1, 10**6)}@empresa.com.br"])
+    def telefone(): return rnd.choice([None, "", "(11) 9999-12", f"(11) 9{rnd.randint(1000, 9999)}-{rnd.randint(1000, 9999)}"])
+    def data(): return rnd.choice([None, f"20{rnd.randint(18, 25)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}"])
+    # dtype object mantém os None como vêm do JSON do Directus
+    def col(valores): return pd.Series(list(valores), dtype=object)
+    return pd.DataFrame({
+        'id': range(1, n + 1),
+        'razao_social': col(f"Empresa {i} LTDA" for i in range(n)),
+        'status_carteira': col(rnd.choice(status) for _ in range(n)),
+        'data_ultima_compra': col(data() for _ in range(n)),
+        'telefone_1': col(telefone() for _ in range(n)),
+        'email_1': col(email() for _ in range(n)),
+        'email_2': col(email() for _ in range(n)),
+        'representante_email': col(email() for _ in range(n)),
+        'status_prospect': col([None] * n),
+        'representante_nome': col([None] * n),
+        'tentativa_1': col([None] * n), 'tentativa_2': col([None] * n), 'tentativa_3': col([None] * n),
+    })
+
+
+def cronometrar(fn, base, repeticoes=3):
+    melhor = float('inf')
+    resultado = None
+    for _ in range(repeticoes):
+        df = base.copy()
+        inicio = time.perf_counter()
+        resultado = fn(df)
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def main(tamanhos):
+    colunas = ['Categoria_Cliente', 'GAP (dias)', 'label_select', 'tem_email', 'pendente']
+    print(f"{'linhas':>8} {'antigo (s)':>11} {'vetorizado (s)':>15} {'ganho':>7}")
+    for n in tamanhos:
+        base = gerar_carteira(n)
+        t_antigo, antigo = cronometrar(preparar_antigo, base)
+        t_novo, novo = cronometrar(preparar_clientes, base)
+        for col in colunas:
+            a = antigo[col].astype(object).where(antigo[col].notna(), None)
+            b = novo[col].astype(object).where(novo[col].notna(), None)
+            if not np.array_equal(a.to_numpy(), b.to_numpy()):
+                raise SystemExit(f"Divergência na coluna {col} com {n} linhas")
+        print(f"{n:>8} {t_antigo:>11.3f} {t_novo:>15.3f} {t_antigo / t_novo:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 50000])
@@ -0,0 +1,120 @@
+"""
+Carteira, histórico de envios e listas de leads sintéticos para os benchmarks.
+
+Os valores imitam o que vem do Directus: campos vazios como None ou "",
+e-mails com erro de digitação, vários e-mails na mesma célula, telefones
+formatados de jeitos diferentes. Mesma semente = mesmos dados.
+"""
+import io
+import random
+from datetime import datetime, timedelta
+
+STATUS = [None, None, None, "", "Ativo", "Inativo", "Frio"]
+AREAS = [
+    "Indústria Farmacêutica", "Construção Civil", "Tecnologia", "Agronegócio", "Varejo",
+    "Educação", "Saúde", "Logística", "Financeiro", "Alimentos e Bebidas", "Automotivo", None,
+]
+PROSPECT = [None, None, "Contatado", "Em negociação", "Sem interesse"]
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João", "Larissa", "Marcos"]
+SOBRENOMES = ["Silva", "Souza", "Oliveira", "Santos", "Pereira", "Lima", "Costa", "Almeida", "Ferreira", "Rocha"]
+RAMOS = ["Comércio", "Serviços", "Indústria", "Distribuidora", "Soluções", "Tecnologia"]
+DOMINIOS = ["gmail.com", "hotmail.com", "outlook.com", "yahoo.com.br", "uol.com.br", "empresa.com.br"]
+DOMINIOS_ERRADOS = ["gmial.com", "hotmail.con", "outlok.com", "yahoo.combr"]
+
+
+def _email(rnd, usuario):
+    sorteio = rnd.random()
+    if sorteio < 0.10:
+        return None
+    if sorteio < 0.15:
+        return rnd.choice(["", "sem email", "nan", "-"])
+    dominio = rnd.choice(DOMINIOS_ERRADOS) if sorteio < 0.20 else rnd.choice(DOMINIOS)
+    email = f"{usuario}@{dominio}"
+    if sorteio > 0.97:
+        email = f"{email}; financeiro.{usuario}@{rnd.choice(DOMINIOS)}"
+    elif sorteio > 0.94:
+        email = f" {email.upper()} "
+    return email
+
+
+def _telefone(rnd):
+    sorteio = rnd.random()
+    if sorteio < 0.10:
+        return None
+    if sorteio < 0.15:
+        return rnd.choice(["", "(11) 9999-12"])
+    ddd = rnd.randint(11, 99)
+    if sorteio < 0.60:
+        return f"({ddd}) 9{rnd.randint(1000, 9999)}-{rnd.randint(1000, 9999)}"
+    return f"{ddd}9{rnd.randint(10000000, 99999999)}"
+
+
+def gerar_clientes(n, seed=42):
+    """Lista de dicts com os campos de FIELDS_FULL, ids 1..n."""
+    rnd = random.Random(seed)
+    hoje = datetime(2026, 1, 1)
+    clientes = []
+    for i in range(1, n + 1):
+        nome = rnd.choice(NOMES)
+        sobrenome = rnd.choice(SOBRENOMES)
+        razao = f"{sobrenome} {rnd.choice(RAMOS)} {i} LTDA"
+        data = None if rnd.random() < 0.08 else (hoje - timedelta(days=rnd.randint(0, 900))).strftime("%Y-%m-%d")
+        tem_rep = rnd.random() < 0.4
+        clientes.append({
+            "id": i,
+            "pj_id": 100000 + i,
+            "razao_social": razao,
+            "nome_fantasia": f"{sobrenome} {rnd.choice(RAMOS)}",
+            "status_carteira": rnd.choice(STATUS),
+            "area_atuacao": rnd.choice(AREAS),
+            "data_ultima_compra": data,
+            "telefone_1": _telefone(rnd),
+            "email_1": _email(rnd, f"contato{i}"),
+            "obs_gerais": None if rnd.random() < 0.7 else "Cliente pediu catálogo novo",
+            "cnpj": f"{rnd.randint(10, 99)}.{rnd.randint(100, 999)}.{rnd.randint(100, 999)}/0001-{rnd.randint(10, 99)}",
+            "tentativa_1": None if rnd.random() < 0.7 else "05/01 - Email em Massa",
+            "tentativa_2": None,
+            "tentativa_3": None,
+            "status_prospect": rnd.choice(PROSPECT),
+            "email_2": _email(rnd, f"compras{i}") if rnd.random() < 0.5 else None,
+            "representante_nome": f"{nome} {sobrenome}" if tem_rep else None,
+            "representante_email": _email(rnd, f"{nome.lower()}.{sobrenome.lower()}{i}") if tem_rep else None,
+        })
+    return clientes
+
+
+def gerar_historico(n, clientes, seed=7, agora=None):
+    """Linhas de historico_envios como o registrar_log grava, espalhadas nos últimos 30 dias."""
+    rnd = random.Random(seed)
+    agora = agora or datetime.now()
+    historico = []
+    for i in range(1, n + 1):
+        cliente = rnd.choice(clientes) if clientes and rnd.random() < 0.8 else None
+        email = (cliente or {}).get("email_1") or f"lead{i}@{rnd.choice(DOMINIOS)}"
+        status = "Enviado (Principal)" if rnd.random() < 0.92 else "Erro: 550 mailbox unavailable"
+        historico.append({
+            "id": i,
+            "cliente_pj_id": cliente["pj_id"] if cliente else None,
+            "assunto_gerado": "Novidades Elo Brindes" if cliente else "[EXTERNO] Oportunidade de Parceria",
+            "corpo_email": f"Para: {email}" if cliente else f"Lead: {email}",
+            "status_envio": status,
+            "data_envio": (agora - timedelta(seconds=rnd.randint(0, 30 * 24 * 3600))).strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    # Ids na ordem de gravação, como no Directus
+    historico.sort(key=lambda h: h["data_envio"])
+    for i, item in enumerate(historico, 1):
+        item["id"] = i
+    return historico
+
+
+def gerar_leads_csv(n, seed=11):
+    """CSV (bytes) de leads com cabeçalho Nome,E-mail,Empresa e colunas extras a ignorar."""
+    rnd = random.Random(seed)
+    saida = io.StringIO()
+    saida.write("Nome,E-mail,Empresa,Cidade,Observacao\n")
+    for i in range(n):
+        email = _email(rnd, f"lead{i}") or ""
+        if ";" in email:
+            email = f'"{email}"'
+        saida.write(f"{rnd.choice(NOMES)},{email},{rnd.choice(SOBRENOMES)} {rnd.choice(RAMOS)},São Paulo,\n")
+    return saida.getvalue().encode("utf-8")
@@ -0,0 +1,237 @@
+"""
+Servidor HTTP local que imita o pedaço da API do Directus que o app usa.
+
+Suporta:
+  GET   /users/me
+  GET   /items/<colecao>   fields, limit (-1 = tudo), offset, sort (campo ou -campo),
+                           meta=filter_count, filter[campo][_op]=valor, aggregate[count]=*
+  POST  /items/<colecao>   um item ou lista de itens
+  PATCH /items/<colecao>/<id> e PATCH /items/<colecao> (lista ou {keys, data})
+
+Operadores de filtro: _eq, _neq, _gt, _gte, _lt, _lte, _contains, _starts_with,
+_in, _null, _nnull. Qualquer token Bearer é aceito; sem token responde 401.
+
+Uso isolado: python benchmarks/directus_falso.py [porta] [clientes] [historico]
+"""
+import json
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+RE_FILTRO = re.compile(r"^filter\[(\w+)\]\[(_\w+)\]$")
+USUARIO = {"id": "usuario-bench", "email": "bench@elobrindes.com.br", "first_name": "Bench", "role": "vendedor"}
+
+
+def _comparar(valor, op, alvo):
+    if op == "_null":
+        return valor is None
+    if op == "_nnull":
+        return valor is not None
+    if op == "_in":
+        return str(valor) in alvo.split(",")
+    if valor is None:
+        return op == "_neq"
+    # O Directus compara números como números; datas/strings como texto
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        try:
+            alvo = type(valor)(alvo)
+        except ValueError:
+            valor = str(valor)
+    else:
+        valor = str(valor)
+    if op == "_eq":
+        return valor == alvo
+    if op == "_neq":
+        return valor != alvo
+    if op == "_gt":
+        return valor > alvo
+    if op == "_gte":
+        return valor >= alvo
+    if op == "_lt":
+        return valor < alvo
+    if op == "_lte":
+        return valor <= alvo
+    if op == "_contains":
+        return str(alvo) in str(valor)
+    if op == "_starts_with":
+        return str(valor).startswith(str(alvo))
+    raise ValueError(f"operador não suportado: {op}")
+
+
+class DirectusFalso:
+    def __init__(self, colecoes=None, porta=0, latencia=0.0):
+        """colecoes: {nome: [itens]} (cada item com 'id'). latencia: segundos extras por requisição."""
+        self.colecoes = {nome: list(itens) for nome, itens in (colecoes or {}).items()}
+        self.latencia = latencia
+        self.requisicoes = 0
+        self._lock = threading.Lock()
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", porta), self._criar_handler())
+        self._servidor.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}"
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
+
+    # --- Consultas ---
+
+    def listar(self, colecao, params):
+        itens = self.colecoes.get(colecao)
+        if itens is None:
+            return 403, {"errors": [{"message": "You don't have permission to access this."}]}
+
+        filtros = []
+        for chave, valor in params.items():
+            achado = RE_FILTRO.match(chave)
+            if achado:
+                filtros.append((achado.group(1), achado.group(2), valor))
+        if filtros:
+            itens = [i for i in itens if all(_comparar(i.get(campo), op, alvo) for campo, op, alvo in filtros)]
+
+        if params.get("aggregate[count]"):
+            return 200, {"data": [{"count": len(itens)}]}
+
+        sort = params.get("sort")
+        if sort and sort not in ("id",):
+            campo = sort.lstrip("-")
+            itens = sorted(itens, key=lambda i: (i.get(campo) is None, i.get(campo)), reverse=sort.startswith("-"))
+
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100))
+        pagina = itens[offset:] if limit < 0 else itens[offset:offset + limit]
+
+        fields = params.get("fields")
+        if fields and fields != "*":
+            campos = fields.split(",")
+            if colecao == "clientes" and any(c not in itens[0] for c in campos if itens):
+                return 403, {"errors": [{"message": "You don't have permission to access this."}]}
+            pagina = [{c: i.get(c) for c in campos} for i in pagina]
+
+        corpo = {"data": pagina}
+        if params.get("meta") == "filter_count":
+            corpo["meta"] = {"filter_count": len(itens)}
+        return 200, corpo
+
+    def criar(self, colecao, dados):
+        with self._lock:
+            itens = self.colecoes.setdefault(colecao, [])
+            novos = dados if isinstance(dados, list) else [dados]
+            proximo = (itens[-1]["id"] + 1) if itens else 1
+            criados = []
+            for item in novos:
+                item = dict(item, id=proximo)
+                proximo += 1
+                itens.append(item)
+                criados.append(item)
+        return 200, {"data": criados if isinstance(dados, list) else criados[0]}
+
+    def atualizar(self, colecao, id_item, dados):
+        itens = self.colecoes.get(colecao, [])
+        if id_item is not None:
+            alvos = [(id_item, dados)]
+        elif isinstance(dados, list):
+            alvos = [(d.get("id"), d) for d in dados]
+        else:
+            alvos = [(k, dados.get("data", {})) for k in dados.get("keys", [])]
+        with self._lock:
+            por_id = {str(i["id"]): i for i in itens}
+            for chave, campos in alvos:
+                if str(chave) in por_id:
+                    por_id[str(chave)].update({k: v for k, v in campos.items() if k != "id"})
+        return 200, {"data": None}
+
+    # --- HTTP ---
+
+    def _criar_handler(self):
+        falso = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _responder(self, status, corpo):
+                dados = json.dumps(corpo).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def _preparar(self):
+                if falso.latencia:
+                    threading.Event().wait(falso.latencia)
+                with falso._lock:
+                    falso.requisicoes += 1
+                partes = urlsplit(self.path)
+                params = dict(parse_qsl(partes.query, keep_blank_values=True))
+                caminho = [p for p in partes.path.split("/") if p]
+                tamanho = int(self.headers.get("Content-Length") or 0)
+                corpo = json.loads(self.rfile.read(tamanho) or b"null") if tamanho else None
+                autorizado = self.headers.get("Authorization", "").startswith("Bearer ")
+                return caminho, params, corpo, autorizado
+
+            def do_GET(self):
+                caminho, params, _, autorizado = self._preparar()
+                if not autorizado:
+                    return self._responder(401, {"errors": [{"message": "Invalid user credentials."}]})
+                if caminho == ["users", "me"]:
+                    return self._responder(200, {"data": USUARIO})
+                if len(caminho) == 2 and caminho[0] == "items":
+                    return self._responder(*falso.listar(caminho[1], params))
+                self._responder(404, {"errors": [{"message": "Route doesn't exist."}]})
+
+            def do_POST(self):
+                caminho, _, corpo, autorizado = self._preparar()
+                if not autorizado:
+                    return self._responder(401, {"errors": [{"message": "Invalid user credentials."}]})
+                if len(caminho) == 2 and caminho[0] == "items":
+                    return self._responder(*falso.criar(caminho[1], corpo))
+                self._responder(404, {"errors": [{"message": "Route doesn't exist."}]})
+
+            def do_PATCH(self):
+                caminho, _, corpo, autorizado = self._preparar()
+                if not autorizado:
+                    return self._responder(401, {"errors": [{"message": "Invalid user credentials."}]})
+                if len(caminho) in (2, 3) and caminho[0] == "items":
+                    id_item = caminho[2] if len(caminho) == 3 else None
+                    return self._responder(*falso.atualizar(caminho[1], id_item, corpo))
+                self._responder(404, {"errors": [{"message": "Route doesn't exist."}]})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from dados_sinteticos import gerar_clientes, gerar_historico
+
+    porta = int(sys.argv[1]) if len(sys.argv) > 1 else 8055
+    n_clientes = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    n_historico = int(sys.argv[3]) if len(sys.argv) > 3 else n_clientes
+    clientes = gerar_clientes(n_clientes)
+    servidor = DirectusFalso({"clientes": clientes, "historico_envios": gerar_historico(n_historico, clientes)}, porta=porta)
+    print(f"Directus falso em {servidor.url} ({n_clientes} clientes, {n_historico} envios). Ctrl+C para sair.")
+    try:
+        servidor.iniciar()._thread.join()
+    except KeyboardInterrupt:
+        servidor.parar()
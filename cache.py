@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# =========================================================
+#  CACHE EM MEMÓRIA DO PROCESSO
+# =========================================================
+# O app.py é re-executado a cada rerun do Streamlit, então qualquer estado
+# que precise sobreviver entre reruns (e ser compartilhado entre sessões)
+# fica aqui, num módulo importado uma única vez pelo processo.
+
+
+class CacheTTL:
+    """
+    Cache chave -> valor com TTL, compartilhado entre as sessões.
+    Depois do TTL o valor antigo continua sendo servido enquanto uma thread
+    recarrega em segundo plano (stale-while-revalidate). O mesmo vale quando
+    a `versao` passada em obter muda (ex.: o worker alterou os dados na origem).
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._dados = {}          # chave -> (valor, carregado_em, versao)
+        self._geracao = {}        # chave -> contador de invalidações
+        self._locks_carga = {}    # chave -> lock da primeira carga (só enquanto ela dura)
+        self._atualizando = set()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, carregar, recarregar=None, versao=None):
+        """recarregar (opcional) é usado na thread de fundo no lugar de carregar."""
+        with self._lock:
+            entrada = self._dados.get(chave)
+            if entrada is not None:
+                valor, carregado_em, versao_carregada = entrada
+                vencido = time.monotonic() - carregado_em >= self.ttl or versao_carregada != versao
+                if vencido and chave not in self._atualizando:
+                    self._atualizando.add(chave)
+                    geracao = self._geracao.get(chave, 0)
+                    threading.Thread(
+                        target=self._recarregar, args=(chave, recarregar or carregar, geracao, versao), daemon=True
+                    ).start()
+                return valor
+            lock_carga = self._locks_carga.setdefault(chave, threading.Lock())
+
+        # Sem valor em memória: só uma sessão baixa, as demais esperam o resultado
+        try:
+            with lock_carga:
+                with self._lock:
+                    entrada = self._dados.get(chave)
+                    geracao = self._geracao.get(chave, 0)
+                if entrada is not None:
+                    return entrada[0]
+                valor = carregar()
+                self._guardar(chave, valor, geracao, versao)
+                return valor
+        finally:
+            # Carregada (ou falhou), a chave não precisa mais do lock: não acumula um por chave
+            with self._lock:
+                if self._locks_carga.get(chave) is lock_carga:
+                    del self._locks_carga[chave]
+
+    def _recarregar(self, chave, carregar, geracao, versao):
+        try:
+            valor = carregar()
+            self._guardar(chave, valor, geracao, versao)
+        except Exception:
+            # Mantém o valor antigo; a próxima leitura vencida tenta de novo
+            pass
+        finally:
+            with self._lock:
+                self._atualizando.discard(chave)
+
+    def _guardar(self, chave, valor, geracao, versao=None):
+        # None = falha de carga, não vale a pena guardar
+        if valor is None:
+            return
+        with self._lock:
+            # Se alguém invalidou durante a carga, o valor pode estar desatualizado
+            if self._geracao.get(chave, 0) != geracao:
+                return
+            self._dados[chave] = (valor, time.monotonic(), versao)
+
+    def invalidar(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+            self._geracao[chave] = self._geracao.get(chave, 0) + 1
+
+    def invalidar_onde(self, afetada):
+        """Invalida só as chaves cujo valor atende afetada(valor) (ex.: contém o registro editado)."""
+        with self._lock:
+            chaves = [chave for chave, entrada in self._dados.items() if afetada(entrada[0])]
+            for chave in chaves:
+                self._dados.pop(chave, None)
+                self._geracao[chave] = self._geracao.get(chave, 0) + 1
+
+    def invalidar_tudo(self):
+        with self._lock:
+            for chave in set(self._dados) | set(self._geracao):
+                self._geracao[chave] = self._geracao.get(chave, 0) + 1
+            self._dados.clear()
+
+
+class CacheDisco:
+    """
+    Cache LRU em SQLite com TTL: sobrevive a restart e é compartilhado entre
+    processos. Valores precisam ser serializáveis em JSON.
+    """
+
+    def __init__(self, caminho, ttl, max_itens):
+        self.caminho = caminho
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._lock = threading.Lock()
+        con = self._conectar()
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS cache (chave TEXT PRIMARY KEY, valor TEXT NOT NULL, criado_em REAL NOT NULL, acessado_em REAL NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_cache_acesso ON cache (acessado_em)")
+        finally:
+            con.close()
+
+    def _conectar(self):
+        con = sqlite3.connect(self.caminho, timeout=10, isolation_level=None)
+        con.execute("PRAGMA busy_timeout=10000")
+        return con
+
+    def obter(self, chave):
+        """Valor guardado ou None (ausente ou vencido)."""
+        agora = time.time()
+        with self._lock:
+            con = self._conectar()
+            try:
+                row = con.execute("SELECT valor, criado_em FROM cache WHERE chave = ?", (chave,)).fetchone()
+                if row is None:
+                    return None
+                if agora - row[1] >= self.ttl:
+                    con.execute("DELETE FROM cache WHERE chave = ?", (chave,))
+                    return None
+                con.execute("UPDATE cache SET acessado_em = ? WHERE chave = ?", (agora, chave))
+                return json.loads(row[0])
+            finally:
+                con.close()
+
+    def guardar(self, chave, valor):
+        agora = time.time()
+        with self._lock:
+            con = self._conectar()
+            try:
+                con.execute(
+                    "INSERT OR REPLACE INTO cache (chave, valor, criado_em, acessado_em) VALUES (?, ?, ?, ?)",
+                    (chave, json.dumps(valor), agora, agora),
+                )
+                # Despejo LRU: mantém só os max_itens acessados mais recentemente
+                con.execute(
+                    "DELETE FROM cache WHERE chave IN (SELECT chave FROM cache ORDER BY acessado_em DESC LIMIT -1 OFFSET ?)",
+                    (self.max_itens,),
+                )
+            finally:
+                con.close()
+
+
+class CacheReferencia:
+    """
+    Registros pequenos que quase não mudam (config SMTP, campanha ativa,
+    validação de token): TTL por entrada e sem recarga em segundo plano.
+    Diferente do CacheTTL, guarda também None ("sem campanha ativa"), com
+    um TTL próprio e normalmente curto, porque None também pode ser falha.
+    """
+
+    def __init__(self):
+        self._dados = {}          # chave -> (valor, expira_em)
+        self._lock = threading.Lock()
+
+    def obter(self, chave, carregar, ttl, ttl_vazio=None):
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._dados.get(chave)
+        if entrada is not None and entrada[1] > agora:
+            return entrada[0]
+        valor = carregar()
+        validade = ttl if valor is not None or ttl_vazio is None else ttl_vazio
+        with self._lock:
+            if validade > 0:
+                self._dados[chave] = (valor, agora + validade)
+            else:
+                self._dados.pop(chave, None)
+        return valor
+
+    def invalidar(self, chave):
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def invalidar_tudo(self):
+        with self._lock:
+            self._dados.clear()
+
+
+# Carteira de clientes por (usuário, role). TTL em segundos via ambiente.
+cache_clientes = CacheTTL(ttl=int(os.getenv("CLIENTES_CACHE_TTL", "300")))
+
+# Tokens já validados no Directus (restauração de sessão pelo ?token= da URL)
+cache_tokens = CacheReferencia()
+TTL_TOKEN = int(os.getenv("TOKEN_CACHE_TTL", "300"))
@@ -0,0 +1,340 @@
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from directus import directus
+from emails import normalizar_emails
+from metricas import medir
+
+# =========================================================
+#  CARTEIRA DE CLIENTES (DOWNLOAD + COLUNAS DERIVADAS)
+# =========================================================
+# Sem st.* aqui: estas funções também rodam na thread de recarga do cache.
+
+# CAMPOS COMPLETOS
+FIELDS_FULL = "id,pj_id,razao_social,nome_fantasia,status_carteira,area_atuacao,data_ultima_compra,telefone_1,email_1,obs_gerais,cnpj,tentativa_1,tentativa_2,tentativa_3,status_prospect,email_2,representante_nome,representante_email"
+FIELDS_SAFE = "id,pj_id,razao_social,nome_fantasia,status_carteira,area_atuacao,data_ultima_compra,telefone_1,email_1,obs_gerais,cnpj,status_prospect,email_2,representante_nome,representante_email"
+
+TAMANHO_PAGINA = int(os.getenv("CLIENTES_PAGE_SIZE", "1000"))
+MAX_WORKERS = int(os.getenv("CLIENTES_MAX_WORKERS", "4"))
+
+# Colunas auxiliares geradas em preparar_clientes que não vão para a grade
+COLUNAS_INTERNAS = ['telefone_limpo', 'tem_email', 'emails_validos', 'pendente', 'label_select']
+COLUNAS_EMAIL = ['email_1', 'email_2', 'representante_email']
+
+
+def _buscar_pagina(token, fields, offset, com_total=False):
+    params = {"limit": TAMANHO_PAGINA, "offset": offset, "sort": "id", "fields": fields}
+    if com_total:
+        params["meta"] = "filter_count"
+    return directus.get("/items/clientes", token, params=params)
+
+
+def baixar_clientes(token, ao_progresso=None):
+    """
+    Baixa a carteira paginada (limit/offset ordenado por id), com as páginas
+    seguintes em paralelo. ao_progresso(carregados, total, df_primeira_pagina)
+    é chamado na thread de quem chamou, à medida que as páginas chegam.
+    Retorna (df, indice, colunas_faltantes) ou None se o Directus recusar as duas consultas.
+    """
+    # Carga inteira (todas as páginas + preparo); cada página também é medida pelo gancho do Directus
+    with medir("directus", "carregar_clientes") as medicao:
+        resultado = _baixar_clientes(token, ao_progresso)
+        if resultado is None:
+            medicao.resultado = "recusado"
+        return resultado
+
+
+def _baixar_clientes(token, ao_progresso=None):
+    # A primeira página decide o conjunto de campos (fallback se faltar 'tentativa_*')
+    colunas_faltantes = False
+    fields = FIELDS_FULL
+    r = _buscar_pagina(token, fields, 0, com_total=True)
+    if r.status_code != 200:
+        colunas_faltantes = True
+        fields = FIELDS_SAFE
+        r = _buscar_pagina(token, fields, 0, com_total=True)
+        if r.status_code != 200:
+            return None
+
+    corpo = r.json()
+    primeira = pd.DataFrame(corpo['data'])
+    total = (corpo.get('meta') or {}).get('filter_count')
+    del corpo, r
+
+    partes = [primeira]
+    carregados = len(primeira)
+    if ao_progresso:
+        ao_progresso(carregados, total or carregados, primeira)
+
+    if len(primeira) == TAMANHO_PAGINA:
+        if total is None:
+            # Directus sem meta: segue sequencial até a página vir incompleta
+            offset = TAMANHO_PAGINA
+            while True:
+                pagina = _converter_pagina(_buscar_pagina(token, fields, offset), offset)
+                partes.append(pagina)
+                carregados += len(pagina)
+                if ao_progresso:
+                    ao_progresso(carregados, carregados, None)
+                if len(pagina) < TAMANHO_PAGINA:
+                    break
+                offset += TAMANHO_PAGINA
+        else:
+            offsets = list(range(TAMANHO_PAGINA, total, TAMANHO_PAGINA))
+            paginas = {}
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+                futuros = {pool.submit(_buscar_pagina, token, fields, off): off for off in offsets}
+                for futuro in as_completed(futuros):
+                    off = futuros[futuro]
+                    paginas[off] = _converter_pagina(futuro.result(), off)
+                    carregados += len(paginas[off])
+                    if ao_progresso:
+                        ao_progresso(carregados, total, None)
+            partes.extend(paginas[off] for off in offsets)
+
+    df = pd.concat(partes, ignore_index=True) if len(partes) > 1 else primeira
+    if 'id' in df.columns and len(partes) > 1:
+        # Inserções durante o download podem deslocar o offset e repetir linhas
+        df = df.drop_duplicates(subset='id', keep='first').reset_index(drop=True)
+
+    if colunas_faltantes:
+        df['tentativa_1'] = None
+        df['tentativa_2'] = None
+        df['tentativa_3'] = None
+
+    df = preparar_clientes(df)
+    return df, IndiceClientes(df), colunas_faltantes
+
+
+def _converter_pagina(r, offset):
+    if r.status_code != 200:
+        raise RuntimeError(f"Falha ao baixar clientes (offset {offset}): HTTP {r.status_code}")
+    return pd.DataFrame(r.json()['data'])
+
+
+def preparar_clientes(df):
+    """
+    Colunas derivadas da carteira, todas com operações de coluna (sem apply por linha):
+    categoria, GAP, telefone limpo, e-mail válido, pendência de cadastro e label_select.
+    """
+    if df.empty:
+        return df
+
+    df['data_temp'] = pd.to_datetime(df['data_ultima_compra'], errors='coerce')
+    df['Ultima_Compra'] = df['data_temp'].dt.strftime('%d/%m/%Y').fillna("-")
+    hoje = pd.Timestamp.now()
+    df['dias_sem_compra'] = (hoje - df['data_temp']).dt.days.fillna(9999).astype(int)
+
+    if 'status_prospect' not in df.columns:
+        df['status_prospect'] = None
+
+    # Garantir colunas novas
+    for col_nova in ['email_2', 'representante_nome', 'representante_email']:
+        if col_nova not in df.columns:
+            df[col_nova] = None
+
+    # Categoria: status_carteira preenchido manda; senão, pelos dias sem compra
+    dias = df['dias_sem_compra'].to_numpy()
+    categoria_dias = np.select([dias > 365, dias > 180], ["Crítico", "Inativo"], default="Ativo")
+    if 'status_carteira' in df.columns:
+        status = df['status_carteira']
+        tem_status = (status.notna() & (status.astype(str) != "")).to_numpy()
+        df['Categoria_Cliente'] = np.where(tem_status, status.to_numpy(dtype=object), categoria_dias)
+    else:
+        df['Categoria_Cliente'] = categoria_dias
+    df['GAP (dias)'] = df['dias_sem_compra']
+
+    for col in ['tentativa_1', 'tentativa_2', 'tentativa_3']:
+        df[col] = df[col].fillna("")
+
+    # Mesmo resultado de limpar_telefone(), coluna inteira de uma vez
+    tel = df['telefone_1']
+    df['telefone_limpo'] = tel.astype(str).str.replace(r'\D', '', regex=True).where(tel.notna(), None)
+
+    # Validação de verdade (emails.py), não só "tem @". Uma passada por coluna:
+    # os endereços válidos de cada linha ficam em emails_validos para o índice
+    por_linha = {}
+    ok = {}
+    for col in COLUNAS_EMAIL:
+        validos, _ = normalizar_emails(pd.Series(df[col].to_numpy(dtype=object)))
+        posicoes = validos.index.to_numpy()
+        ok[col] = np.zeros(len(df), dtype=bool)
+        ok[col][posicoes] = True
+        for posicao, email in zip(posicoes.tolist(), validos['email'].tolist()):
+            lista = por_linha.setdefault(posicao, [])
+            if email not in lista:
+                lista.append(email)
+    df['emails_validos'] = [por_linha.get(posicao, []) for posicao in range(len(df))]
+    df['tem_email'] = ok['email_1'] | ok['email_2'] | ok['representante_email']
+
+    # Pendência: telefone com menos de 8 dígitos ou email_1 inválido
+    tel_ok = df['telefone_limpo'].str.len().fillna(0) >= 8
+    df['pendente'] = ~(tel_ok & ok['email_1'])
+
+    df['label_select'] = df['razao_social'] + " (" + df['Ultima_Compra'] + ")"
+
+    return df
+
+
+# =========================================================
+#  ÍNDICE DA CARTEIRA (BUSCA POR ID, PJ_ID E E-MAIL)
+# =========================================================
+# Os widgets guardam o id do cliente, não o label_select: dois clientes com
+# a mesma razão social e data de compra têm o mesmo rótulo. O índice é
+# montado junto com o download e fica no cache com o DataFrame; cada
+# recarga da carteira gera um índice novo (nova "versão" dos dados).
+#
+# Também guarda os Filtros Globais: status e área fatorados em códigos
+# inteiros uma vez, e o resultado de cada combinação (status, áreas)
+# memorizado, então um rerun por outro widget não refiltra nem copia nada.
+
+FILTROS_MEMORIZADOS = 16
+
+# Colunas de texto que ordenam por outra (dd/mm/aaaa não ordena como texto)
+ORDENAR_POR = {'Ultima_Compra': 'data_temp'}
+
+_versoes = itertools.count(1)
+
+
+def _normalizar_email(email):
+    return str(email).strip().lower()
+
+
+class IndiceClientes:
+    def __init__(self, df):
+        self.df = df
+        self.versao = next(_versoes)
+        self._filtros = OrderedDict()   # (status, áreas[, ordenação]) -> resultado memorizado
+        self._lock_filtros = threading.Lock()
+        self._preparar_filtros(df)
+        if df.empty or 'id' not in df.columns:
+            self._posicao = {}
+            self._por_pj = {}
+            self._por_email = {}
+            self._rotulos = {}
+            return
+        ids = df['id'].tolist()
+        self._posicao = dict(zip(ids, range(len(ids))))
+        self._rotulos = dict(zip(ids, df['label_select'].tolist())) if 'label_select' in df.columns else {}
+
+        self._por_pj = {}
+        if 'pj_id' in df.columns:
+            for pj_id, cliente_id in zip(df['pj_id'].tolist(), ids):
+                if pj_id is not None:
+                    self._por_pj.setdefault(str(pj_id), []).append(cliente_id)
+
+        # Endereços já normalizados em preparar_clientes (emails.py): a mesma chave que a lista de leads usa
+        self._por_email = {}
+        if 'emails_validos' in df.columns:
+            for cliente_id, enderecos in zip(ids, df['emails_validos'].tolist()):
+                for email in enderecos:
+                    lista = self._por_email.setdefault(email, [])
+                    if cliente_id not in lista:
+                        lista.append(cliente_id)
+
+    def __contains__(self, id_cliente):
+        return id_cliente in self._posicao
+
+    def linha(self, id_cliente):
+        """Linha (Series) do cliente ou None."""
+        posicao = self._posicao.get(id_cliente)
+        if posicao is None:
+            return None
+        return self.df.iloc[posicao]
+
+    def rotulo(self, id_cliente):
+        return self._rotulos.get(id_cliente, str(id_cliente))
+
+    def por_pj(self, pj_id):
+        """Ids dos clientes com este pj_id."""
+        return list(self._por_pj.get(str(pj_id), []))
+
+    def tem_email(self, email):
+        return _normalizar_email(email) in self._por_email
+
+    def por_email(self, email):
+        """Ids dos clientes que têm este e-mail em qualquer campo de e-mail."""
+        return list(self._por_email.get(_normalizar_email(email), []))
+
+    def ordenar_por_rotulo(self, ids):
+        return sorted(ids, key=lambda i: (self.rotulo(i), str(i)))
+
+    # --- Filtros Globais ---
+
+    def _preparar_filtros(self, df):
+        self.opcoes_status = []
+        self.opcoes_area = []
+        self.oportunidades = 0
+        self._cod_status = self._cod_area = None
+        self._valores_status = self._valores_area = {}
+        if df.empty:
+            return
+        if 'Categoria_Cliente' in df.columns:
+            categoria = df['Categoria_Cliente']
+            self.opcoes_status = sorted(list(categoria.unique()))
+            self._cod_status, uniques = pd.factorize(categoria)
+            self._valores_status = {valor: codigo for codigo, valor in enumerate(uniques)}
+            self.oportunidades = int(categoria.astype(str).str.contains('Inativo|Frio|Crítico', case=False).sum())
+        if 'area_atuacao' in df.columns:
+            self.opcoes_area = sorted([str(x) for x in df['area_atuacao'].dropna().unique()])
+            self._cod_area, uniques = pd.factorize(df['area_atuacao'].astype(str))
+            self._valores_area = {valor: codigo for codigo, valor in enumerate(uniques)}
+
+    @staticmethod
+    def _mascara(codigos, valores, selecionados):
+        alvo = [valores[v] for v in selecionados if v in valores]
+        return np.isin(codigos, alvo)
+
+    def filtrar(self, status=None, areas=None):
+        """
+        Carteira com os Filtros Globais (lista vazia = sem filtro naquela dimensão).
+        O DataFrame devolvido é compartilhado entre sessões: não altere.
+        """
+        chave = (frozenset(status or ()), frozenset(areas or ()))
+        with self._lock_filtros:
+            if chave in self._filtros:
+                self._filtros.move_to_end(chave)
+                return self._filtros[chave]
+
+        mascara = np.ones(len(self.df), dtype=bool)
+        if status and self._cod_status is not None:
+            mascara &= self._mascara(self._cod_status, self._valores_status, status)
+        if areas and self._cod_area is not None:
+            mascara &= self._mascara(self._cod_area, self._valores_area, areas)
+        resultado = self.df if mascara.all() else self.df[mascara]
+        self._memorizar(chave, resultado)
+        return resultado
+
+    def _memorizar(self, chave, resultado):
+        with self._lock_filtros:
+            self._filtros[chave] = resultado
+            while len(self._filtros) > FILTROS_MEMORIZADOS:
+                self._filtros.popitem(last=False)
+
+    def ordenar(self, status, areas, coluna, crescente=True):
+        """Posições (iloc) do resultado de filtrar() ordenadas por `coluna`, sem copiar o DataFrame."""
+        chave = (frozenset(status or ()), frozenset(areas or ()), coluna, crescente)
+        with self._lock_filtros:
+            if chave in self._filtros:
+                self._filtros.move_to_end(chave)
+                return self._filtros[chave]
+
+        df = self.filtrar(status, areas)
+        coluna_ordem = ORDENAR_POR.get(coluna, coluna)
+        if coluna_ordem not in df.columns:
+            posicoes = np.arange(len(df))
+        else:
+            serie = df[coluna_ordem].reset_index(drop=True)
+            try:
+                posicoes = serie.sort_values(ascending=crescente, kind='stable', na_position='last').index.to_numpy()
+            except TypeError:
+                # Coluna com tipos misturados (texto e número)
+                posicoes = serie.astype(str).sort_values(ascending=crescente, kind='stable').index.to_numpy()
+        self._memorizar(chave, posicoes)
+        return posicoes
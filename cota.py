@@ -0,0 +1,193 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from armazenamento import caminho_dados
+from directus import directus
+
+# =========================================================
+#  COTA DIÁRIA DA EQUIPE (COMPARTILHADA)
+# =========================================================
+# Um balde de fichas por dia, num SQLite local que todas as sessões do
+# Streamlit e o worker de campanhas enxergam. Cada envio reserva sua ficha
+# de forma atômica antes de sair, então dois vendedores disparando ao mesmo
+# tempo não estouram a cota. A leitura é local; o Directus (historico_envios)
+# só é consultado em segundo plano para reconciliar o contador.
+
+DB_PATH = caminho_dados("cota.db")
+COTA_DIARIA = int(os.getenv("COTA_DIARIA_EQUIPE", "100"))
+INTERVALO_RECONCILIACAO = int(os.getenv("COTA_RECONCILIACAO_SEG", "60"))
+
+_tabela_ok = False
+_ultima_reconciliacao = 0.0
+_lock_reconciliacao = threading.Lock()
+
+
+def conectar():
+    global _tabela_ok
+    con = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    con.execute("PRAGMA busy_timeout=30000")
+    if not _tabela_ok:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript("""
+            CREATE TABLE IF NOT EXISTS cota (
+                dia TEXT PRIMARY KEY,
+                usados INTEGER NOT NULL DEFAULT 0,
+                reconciliado_em REAL
+            );
+            CREATE TABLE IF NOT EXISTS cota_conta (
+                dia TEXT NOT NULL,
+                conta TEXT NOT NULL,
+                usados INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (dia, conta)
+            );
+        """)
+        _tabela_ok = True
+    return con
+
+
+def _hoje():
+    return datetime.now().strftime("%Y-%m-%d")
+
+
+def usados_hoje():
+    """Fichas já consumidas hoje (leitura local, sem ir ao Directus)."""
+    con = conectar()
+    try:
+        row = con.execute("SELECT usados FROM cota WHERE dia = ?", (_hoje(),)).fetchone()
+        return row[0] if row else 0
+    finally:
+        con.close()
+
+
+def saldo_hoje():
+    return max(COTA_DIARIA - usados_hoje(), 0)
+
+
+def reservar(n=1):
+    """Reserva `n` envios de uma vez. Retorna False (sem reservar nada) se não couber na cota."""
+    dia = _hoje()
+    con = conectar()
+    try:
+        # BEGIN IMMEDIATE: a checagem e o incremento acontecem sob o mesmo lock de escrita
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            row = con.execute("SELECT usados FROM cota WHERE dia = ?", (dia,)).fetchone()
+            usados = row[0] if row else 0
+            if usados + n > COTA_DIARIA:
+                con.execute("ROLLBACK")
+                return False
+            con.execute(
+                "INSERT INTO cota (dia, usados) VALUES (?, ?) ON CONFLICT(dia) DO UPDATE SET usados = usados + ?",
+                (dia, n, n),
+            )
+            con.execute("COMMIT")
+            return True
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+    finally:
+        con.close()
+
+
+def liberar(n=1):
+    """Devolve `n` fichas reservadas que não viraram envio (ex.: destinatário adiado)."""
+    if n <= 0:
+        return
+    con = conectar()
+    try:
+        con.execute("UPDATE cota SET usados = MAX(usados - ?, 0) WHERE dia = ?", (n, _hoje()))
+    finally:
+        con.close()
+
+
+def contar_envios_hoje_directus(token):
+    """
+    Conta quantos registros existem na tabela 'historico_envios' com a data de hoje.
+    Usado para garantir a cota de segurança e evitar spam.
+    """
+    try:
+        hoje_str = _hoje()
+
+        # CORREÇÃO CRÍTICA: Usar _gte (Maior ou Igual) para garantir que a contagem funcione
+        # mesmo se o Directus estiver interpretando como data ou string, pegando tudo de hoje em diante.
+        params = {"filter[data_envio][_gte]": hoje_str, "aggregate[count]": "*"}
+
+        data = directus.listar_itens(token, "historico_envios", params=params)
+
+        if data is not None:
+            # O Directus retorna agregação como uma lista de objetos
+            if isinstance(data, list) and len(data) > 0:
+                return int(data[0].get('count', 0))
+            return 0
+    except Exception:
+        return None
+    return None
+
+
+def reservar_conta(conta, n, limite):
+    """Como reservar(), mas no limite diário de uma conta SMTP (remetentes.py)."""
+    dia = _hoje()
+    con = conectar()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            row = con.execute("SELECT usados FROM cota_conta WHERE dia = ? AND conta = ?", (dia, conta)).fetchone()
+            if (row[0] if row else 0) + n > limite:
+                con.execute("ROLLBACK")
+                return False
+            con.execute(
+                "INSERT INTO cota_conta (dia, conta, usados) VALUES (?, ?, ?) ON CONFLICT(dia, conta) DO UPDATE SET usados = usados + ?",
+                (dia, conta, n, n),
+            )
+            con.execute("COMMIT")
+            return True
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+    finally:
+        con.close()
+
+
+def liberar_conta(conta, n):
+    """Como liberar(), no limite diário da conta SMTP."""
+    if n <= 0:
+        return
+    con = conectar()
+    try:
+        con.execute("UPDATE cota_conta SET usados = MAX(usados - ?, 0) WHERE dia = ? AND conta = ?", (n, _hoje(), conta))
+    finally:
+        con.close()
+
+
+def reconciliar(token):
+    """
+    Alinha o contador local com o histórico do Directus. Fica com o maior dos
+    dois: reservas locais ainda não registradas no log não podem ser perdidas,
+    e envios feitos por outra instância do app precisam entrar na conta.
+    """
+    remoto = contar_envios_hoje_directus(token)
+    if remoto is None:
+        return
+    con = conectar()
+    try:
+        con.execute(
+            """INSERT INTO cota (dia, usados, reconciliado_em) VALUES (?, ?, ?)
+               ON CONFLICT(dia) DO UPDATE SET usados = MAX(usados, excluded.usados), reconciliado_em = excluded.reconciliado_em""",
+            (_hoje(), remoto, time.time()),
+        )
+    finally:
+        con.close()
+
+
+def reconciliar_em_fundo(token):
+    """Dispara a reconciliação numa thread, no máximo uma vez por intervalo por processo."""
+    global _ultima_reconciliacao
+    with _lock_reconciliacao:
+        agora = time.monotonic()
+        if _ultima_reconciliacao and agora - _ultima_reconciliacao < INTERVALO_RECONCILIACAO:
+            return
+        _ultima_reconciliacao = agora
+    threading.Thread(target=reconciliar, args=(token,), daemon=True).start()
@@ -0,0 +1,47 @@
+# =========================================================
+#  DIÁRIO DE EDIÇÕES DA "LISTA GERAL"
+# =========================================================
+# O st.data_editor mantém edited_rows entre reruns, então as mesmas edições
+# voltam a cada interação. O diário guarda o último valor já gravado no
+# Directus para cada (id do cliente, campo) e só deixa passar o que mudou.
+# Vale só para uma instância da grade (chave do editor): quando os dados
+# recarregam a grade ganha chave nova e o diário recomeça, senão um valor
+# gravado há tempos barraria a mesma edição depois de outra mudança no campo.
+
+
+class DiarioEdicoes:
+    def __init__(self, chave_editor=None):
+        self.chave_editor = chave_editor
+        self._gravados = {}   # (id_cliente, campo) -> valor persistido
+
+    def pendentes(self, edicoes):
+        """
+        edicoes: iterável de (id_cliente, campo, valor).
+        Retorna {id_cliente: {campo: valor}} só com o que ainda não foi gravado,
+        juntando várias edições do mesmo cliente num único payload.
+        """
+        payloads = {}
+        for id_cliente, campo, valor in edicoes:
+            chave = (id_cliente, campo)
+            if chave in self._gravados and self._gravados[chave] == valor:
+                continue
+            payloads.setdefault(id_cliente, {})[campo] = valor
+        return payloads
+
+    def marcar_gravados(self, payloads):
+        for id_cliente, dados in payloads.items():
+            for campo, valor in dados.items():
+                self._gravados[(id_cliente, campo)] = valor
+
+
+def montar_lote(payloads):
+    """
+    Corpo único para o PATCH /items/clientes do Directus.
+    Se todos os clientes recebem os mesmos dados usa {keys, data};
+    senão manda a lista de itens parciais com a chave primária.
+    """
+    ids = list(payloads)
+    primeiro = payloads[ids[0]]
+    if all(payloads[i] == primeiro for i in ids[1:]):
+        return {"keys": ids, "data": primeiro}
+    return [dict(dados, id=id_cliente) for id_cliente, dados in payloads.items()]
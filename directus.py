@@ -0,0 +1,102 @@
+import os
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# =========================================================
+#  CLIENTE DIRECTUS (POOL DE CONEXÕES)
+# =========================================================
+# Uma instância por processo: as conexões TCP/TLS ficam abertas (keep-alive)
+# e são reaproveitadas por todas as sessões do Streamlit.
+
+DIRECTUS_URL = os.getenv("DIRECTUS_URL", "https://elo-flow-eloflowdirectus-a9lluh-7f4d22-152-53-165-62.traefik.me")
+TIMEOUT_PADRAO = float(os.getenv("DIRECTUS_TIMEOUT", "10"))
+TENTATIVAS = int(os.getenv("DIRECTUS_RETRIES", "3"))
+TAMANHO_POOL = int(os.getenv("DIRECTUS_POOL_SIZE", "20"))
+
+
+class DirectusClient:
+    def __init__(self, base_url, timeout=TIMEOUT_PADRAO, tentativas=TENTATIVAS, tamanho_pool=TAMANHO_POOL, verify=False):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.verify = verify
+        # Ganchos de métricas: fn(metodo, caminho, status, duracao_s, bytes_resposta, erro)
+        self.ganchos = []
+
+        # Retry com backoff exponencial só para métodos idempotentes
+        retry = Retry(
+            total=tentativas,
+            backoff_factor=0.5,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=tamanho_pool, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def adicionar_gancho(self, fn):
+        self.ganchos.append(fn)
+
+    def requisitar(self, metodo, caminho, token=None, **kwargs):
+        headers = dict(kwargs.pop('headers', None) or {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        kwargs.setdefault('timeout', self.timeout)
+
+        inicio = time.perf_counter()
+        try:
+            r = self.session.request(metodo, f"{self.base_url}{caminho}", headers=headers, verify=self.verify, **kwargs)
+        except Exception as e:
+            self._notificar(metodo, caminho, None, time.perf_counter() - inicio, 0, e)
+            raise
+        self._notificar(metodo, caminho, r.status_code, time.perf_counter() - inicio, len(r.content), None)
+        return r
+
+    def _notificar(self, metodo, caminho, status, duracao, tamanho, erro):
+        for gancho in self.ganchos:
+            try:
+                gancho(metodo, caminho, status, duracao, tamanho, erro)
+            except Exception:
+                pass
+
+    def get(self, caminho, token=None, **kwargs):
+        return self.requisitar("GET", caminho, token, **kwargs)
+
+    def post(self, caminho, token=None, **kwargs):
+        return self.requisitar("POST", caminho, token, **kwargs)
+
+    def patch(self, caminho, token=None, **kwargs):
+        return self.requisitar("PATCH", caminho, token, **kwargs)
+
+    # --- Atalhos para /items ---
+
+    def listar_itens(self, token, colecao, params=None):
+        """Retorna a lista 'data' ou None se o Directus recusar."""
+        r = self.get(f"/items/{colecao}", token, params=params)
+        if r.status_code == 200:
+            return r.json().get('data')
+        return None
+
+    def criar_item(self, token, colecao, dados):
+        """dados pode ser um dict ou uma lista de dicts (criação em lote)."""
+        return self.post(f"/items/{colecao}", token, json=dados)
+
+    def atualizar_item(self, token, colecao, id_item, dados):
+        return self.patch(f"/items/{colecao}/{id_item}", token, json=dados)
+
+    def atualizar_itens(self, token, colecao, corpo):
+        """PATCH em lote: corpo {keys, data} ou lista de itens com a chave primária."""
+        return self.patch(f"/items/{colecao}", token, json=corpo)
+
+    def usuario_atual(self, token, timeout=None):
+        r = self.get("/users/me", token, timeout=timeout or self.timeout)
+        if r.status_code == 200:
+            return r.json()['data']
+        return None
+
+
+directus = DirectusClient(DIRECTUS_URL)
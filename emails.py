@@ -0,0 +1,149 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# =========================================================
+#  NORMALIZAÇÃO E VALIDAÇÃO DE E-MAILS (COLUNA INTEIRA)
+# =========================================================
+# "Tem @" deixava passar endereço malformado, espaço sobrando, vários
+# endereços na mesma célula e domínio digitado errado, e cada um virava um
+# bounce (cota gasta + intervalo anti-spam perdido). A análise roda uma vez
+# por valor distinto da coluna (e a correção, uma vez por domínio distinto);
+# o resultado volta para as células com operações de vetor do numpy.
+
+# Separadores entre endereços numa mesma célula
+RE_SEPARADORES = r"[;,\s]+"
+RE_EMAIL = (
+    r"[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    r"@(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z]{2,}"
+)
+LIXO_BORDAS = " .;:,()[]<>\"'"
+
+# Erros de digitação comuns nos provedores mais usados pelos clientes
+DOMINIOS_CORRIGIDOS = {
+    "gmail.com": ["gmial.com", "gmai.com", "gmal.com", "gamil.com", "gmaill.com", "gnail.com", "gmail.co", "gmail.cm", "gmail.om", "gmail.com.br", "gmeil.com", "gimail.com"],
+    "hotmail.com": ["hotmial.com", "hotmai.com", "hotmal.com", "hotamil.com", "hotmaill.com", "hormail.com", "hotmail.co", "homail.com", "hotmil.com"],
+    "hotmail.com.br": ["hotmail.combr", "hotmial.com.br", "hotmai.com.br"],
+    "outlook.com": ["outlok.com", "outllok.com", "outook.com", "otlook.com", "outlook.co", "outloo.com"],
+    "yahoo.com": ["yaho.com", "yahooo.com", "yhoo.com", "yahoo.co"],
+    "yahoo.com.br": ["yaho.com.br", "yahooo.com.br", "yhoo.com.br", "yahoo.combr"],
+    "uol.com.br": ["uol.com", "uol.combr", "uol.com.b"],
+    "bol.com.br": ["bol.com", "bol.combr"],
+    "terra.com.br": ["terra.combr", "tera.com.br"],
+    "icloud.com": ["iclod.com", "icloud.co", "icoud.com"],
+}
+_TYPOS = {errado: certo for certo, errados in DOMINIOS_CORRIGIDOS.items() for errado in errados}
+# Final ".com" digitado errado em qualquer domínio
+RE_TLD_COM = re.compile(r"\.(?:con|cmo|cpm|copm|vom|xom|comm|coom)$")
+
+
+def corrigir_dominio(dominio):
+    dominio = dominio.strip(".")
+    if dominio in _TYPOS:
+        return _TYPOS[dominio]
+    corrigido = RE_TLD_COM.sub(".com", dominio)
+    if corrigido.endswith(".combr"):
+        corrigido = corrigido[:-len(".combr")] + ".com.br"
+    return _TYPOS.get(corrigido, corrigido)
+
+
+VAZIOS = {"nan", "none", "null", "-"}
+_RE_SEPARADORES = re.compile(RE_SEPARADORES)
+_RE_EMAIL = re.compile(RE_EMAIL)
+
+
+def _enderecos_celula(valor, dominios):
+    """[(email, corrigido)] de uma célula, ou None se ela estiver vazia. `dominios` memoriza corrigir_dominio."""
+    texto = str(valor).strip()
+    if not texto or texto.lower() in VAZIOS:
+        return None
+    texto = texto.lower()
+    if _RE_EMAIL.fullmatch(texto):
+        # Caso comum: um endereço limpo; só falta conferir o domínio
+        usuario, _, dominio = texto.rpartition("@")
+        if dominio not in dominios:
+            dominios[dominio] = corrigir_dominio(dominio)
+        if dominios[dominio] == dominio:
+            return [(texto, False)]
+    achados = []
+    for parte in _RE_SEPARADORES.split(texto.replace("mailto:", "")):
+        parte = parte.strip(LIXO_BORDAS)
+        if "@" not in parte:
+            continue
+        usuario, _, dominio = parte.rpartition("@")
+        if dominio not in dominios:
+            dominios[dominio] = corrigir_dominio(dominio)
+        final = usuario + "@" + dominios[dominio]
+        # O mesmo endereço repetido na mesma célula conta uma vez
+        if _RE_EMAIL.fullmatch(final) and all(final != e for e, _ in achados):
+            achados.append((final, dominios[dominio] != dominio))
+    return achados
+
+
+def normalizar_emails(valores):
+    """
+    valores: Series com um ou mais endereços por célula.
+    Retorna (validos, relatorio):
+      validos: DataFrame com 'email' (minúsculo, sem sobras, domínio corrigido) e
+               'corrigido' (domínio trocado), uma linha por endereço válido, no
+               índice da célula de origem (células com vários endereços repetem o índice);
+      relatorio: {'celulas', 'validos', 'corrigidos', 'rejeitados', 'divididos'}, onde
+               rejeitados = células preenchidas sem nenhum endereço válido.
+    Cada valor distinto é analisado uma vez (listas e carteiras repetem muito
+    vazio, "sem email" e o mesmo endereço) e o resultado é espalhado pelas células.
+    """
+    serie = pd.Series(valores, dtype=object) if not isinstance(valores, pd.Series) else valores.astype(object)
+    codigos, unicos = pd.factorize(serie.to_numpy(dtype=object))
+
+    dominios = {}
+    analisados = [_enderecos_celula(valor, dominios) for valor in unicos]
+    preenchida = np.array([a is not None for a in analisados], dtype=bool)
+    quantos = np.array([len(a) if a else 0 for a in analisados], dtype=np.int64)
+    planos = [par for a in analisados if a for par in a]
+
+    tem_valor = codigos >= 0
+    posicoes = np.flatnonzero(tem_valor)
+    codigos = codigos[tem_valor]
+    celulas = int(preenchida[codigos].sum())
+
+    # Linha i da célula p (código c) = planos[inicio[c] + i]
+    por_celula = quantos[codigos]
+    inicio = np.concatenate(([0], np.cumsum(quantos)[:-1])).astype(np.int64)
+    total = int(por_celula.sum())
+    deslocamento = np.arange(total) - np.repeat(np.cumsum(por_celula) - por_celula, por_celula)
+    linhas = np.repeat(inicio[codigos], por_celula) + deslocamento
+
+    emails = np.array([e for e, _ in planos], dtype=object)[linhas] if planos else np.array([], dtype=object)
+    corrigidos = np.array([c for _, c in planos], dtype=bool)[linhas] if planos else np.array([], dtype=bool)
+    validos = pd.DataFrame(
+        {'email': emails, 'corrigido': corrigidos},
+        index=serie.index[np.repeat(posicoes, por_celula)],
+    )
+
+    celulas_validas = int((por_celula > 0).sum())
+    relatorio = {
+        'celulas': celulas,
+        'validos': total,
+        'corrigidos': int(corrigidos.sum()),
+        'rejeitados': celulas - celulas_validas,
+        'divididos': total - celulas_validas,
+    }
+    return validos, relatorio
+
+
+def tem_email_valido(valores):
+    """Máscara booleana (mesmo índice de `valores`): a célula tem ao menos um endereço válido."""
+    serie = valores if isinstance(valores, pd.Series) else pd.Series(valores, dtype=object)
+    validos, _ = normalizar_emails(serie)
+    return pd.Series(serie.index.isin(validos.index), index=serie.index)
+
+
+def enderecos_validos(valor):
+    """Endereços válidos (já corrigidos) de uma célula, na ordem em que aparecem."""
+    validos, _ = normalizar_emails(pd.Series([valor], dtype=object))
+    return validos['email'].tolist()
+
+
+def somar_relatorios(a, b):
+    return {k: a.get(k, 0) + b.get(k, 0) for k in set(a) | set(b)}
@@ -0,0 +1,86 @@
+import smtplib
+from datetime import datetime
+
+import anexos
+import log_envios
+from mensagens import MensagemCampanha
+from sessao_smtp import SessaoSMTP
+
+# =========================================================
+#  ENVIO DE E-MAIL (SMTP) E LOG NO DIRECTUS
+# =========================================================
+# Usado pela interface e pelo worker de campanhas (worker_campanhas.py),
+# por isso não depende do Streamlit.
+
+
+class Anexo:
+    """
+    Arquivo anexado fora da sessão, com a mesma interface do UploadedFile do Streamlit.
+    Com `hash_conteudo` o conteúdo fica no armazenamento em disco (anexos.py) e só é lido quando usado.
+    """
+
+    def __init__(self, name, type, conteudo=None, hash_conteudo=None):
+        self.name = name
+        self.type = type
+        self.hash = hash_conteudo
+        self._conteudo = conteudo
+
+    def getvalue(self):
+        if self._conteudo is None and self.hash:
+            return anexos.ler(self.hash)
+        return self._conteudo
+
+
+def enviar_email_smtp(token, destinatario, assunto, mensagem_html, conf_smtp, arquivo_anexo=None, sessao=None):
+    return enviar_email_smtp_multiplo(token, [destinatario], assunto, mensagem_html, conf_smtp, arquivo_anexo, sessao)[destinatario]
+
+def enviar_email_smtp_multiplo(token, destinatarios, assunto, mensagem_html, conf_smtp, arquivo_anexo=None, sessao=None, modelo=None):
+    """
+    Mesmo conteúdo para vários endereços numa única transação SMTP.
+    Com `sessao` (SessaoSMTP) reaproveita a conexão já autenticada e com
+    `modelo` (MensagemCampanha) reaproveita o MIME já montado da campanha.
+    Retorna {email: (sucesso, mensagem)}.
+    """
+    if not conf_smtp: return {d: (False, "SMTP não configurado") for d in destinatarios}
+    try:
+        if modelo is None:
+            modelo = MensagemCampanha(assunto, mensagem_html, conf_smtp, arquivo_anexo)
+        texto = modelo.montar(destinatarios, mensagem_html)
+        
+        # Envio
+        if sessao is not None:
+            recusados = sessao.enviar(conf_smtp['smtp_user'], destinatarios, texto)
+        else:
+            with SessaoSMTP(conf_smtp) as sessao_avulsa:
+                recusados = sessao_avulsa.enviar(conf_smtp['smtp_user'], destinatarios, texto)
+        return {d: (False, str(recusados[d])) if d in recusados else (True, "Enviado") for d in destinatarios}
+    except smtplib.SMTPRecipientsRefused as e:
+        return {d: (False, str(e.recipients.get(d, e))) for d in destinatarios}
+    except Exception as e:
+        return {d: (False, str(e)) for d in destinatarios}
+
+
+def registrar_log(token, pj_id, assunto, corpo, status):
+    try:
+        # CORREÇÃO: Usar formato de data simples para compatibilidade com Directus
+        data_formatada = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        # Se for envio externo, pj_id pode vir como string "EXTERNO" ou nulo, o Directus pode reclamar
+        # se o campo for relacional. Tentamos converter, se falhar, envia null se permitido ou 0.
+        
+        payload = {
+            "cliente_pj_id": pj_id if str(pj_id).isdigit() else None, 
+            "assunto_gerado": assunto, 
+            "corpo_email": corpo, 
+            "status_envio": status, 
+            "data_envio": data_formatada
+        }
+        
+        # Se pj_id for None (externo), talvez precise registrar o nome do lead no corpo ou em outro campo
+        if payload['cliente_pj_id'] is None:
+            # Adicionamos uma flag no corpo/assunto para saber que foi externo
+            payload['assunto_gerado'] = f"[EXTERNO] {assunto}"
+        
+        # Vai para o arquivo local e é gravado no Directus em lote (log_envios.py)
+        log_envios.escritor.registrar(token, payload)
+    except: pass
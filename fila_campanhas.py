@@ -0,0 +1,410 @@
+import fcntl
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+import anexos
+from armazenamento import caminho_dados
+
+# =========================================================
+#  FILA PERSISTENTE DE CAMPANHAS (SQLITE)
+# =========================================================
+# A interface só enfileira e acompanha o progresso; quem envia é o
+# worker_campanhas.py, um processo separado. Cada destinatário guarda os
+# e-mails já enviados, então uma campanha interrompida (restart, queda do
+# container) continua de onde parou sem repetir envio.
+
+DB_PATH = caminho_dados("campanhas.db")
+LOCK_WORKER = caminho_dados("worker.lock")
+LOG_WORKER = caminho_dados("worker.log")
+
+COLUNAS_NOVAS = [
+    ("campanhas", "anexo_hash", "TEXT"),
+    ("campanhas", "personalizar_ia", "INTEGER NOT NULL DEFAULT 0"),
+    ("campanhas", "contexto_ia", "TEXT"),
+    ("destinatarios", "dados_ia", "TEXT"),
+]
+
+# O worker fala com o Directus só pelo token de serviço: o token da sessão
+# expira em minutos e não pode ficar gravado. Sem ele a fila não aceita campanha.
+TOKEN_SERVICO = os.getenv("DIRECTUS_SERVICE_TOKEN", "")
+
+# Campanha encerrada não guarda mais credenciais (token e contas SMTP).
+# 'cota_esgotada' só aparece em bancos antigos: hoje a campanha fica em
+# 'aguardando_cota' e volta para a fila quando o dia vira (cota nova).
+STATUS_FINAIS = ('concluida', 'cancelada', 'erro', 'cota_esgotada')
+
+_tabelas_ok = False
+_ultima_checagem_worker = 0.0
+_lock_checagem = threading.Lock()
+
+
+def conectar():
+    global _tabelas_ok
+    con = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA busy_timeout=30000")
+    if not _tabelas_ok:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript("""
+            CREATE TABLE IF NOT EXISTS campanhas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                vendedor_email TEXT NOT NULL,
+                token TEXT,
+                conf_smtp TEXT NOT NULL,
+                assunto TEXT NOT NULL,
+                corpo TEXT NOT NULL,
+                anexo_nome TEXT,
+                anexo_tipo TEXT,
+                anexo BLOB,
+                anexo_hash TEXT,
+                personalizar_ia INTEGER NOT NULL DEFAULT 0,
+                contexto_ia TEXT,
+                intervalo_min INTEGER NOT NULL,
+                intervalo_max INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                enviados INTEGER NOT NULL DEFAULT 0,
+                erros INTEGER NOT NULL DEFAULT 0,
+                criada_em TEXT NOT NULL,
+                atualizada_em TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS destinatarios (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                campanha_id INTEGER NOT NULL REFERENCES campanhas(id),
+                ordem INTEGER NOT NULL,
+                nome TEXT,
+                cliente_id TEXT,
+                pj_id TEXT,
+                variaveis TEXT NOT NULL,
+                emails TEXT NOT NULL,
+                emails_enviados TEXT NOT NULL DEFAULT '[]',
+                atualizar_tentativa INTEGER NOT NULL DEFAULT 0,
+                dados_ia TEXT,
+                status TEXT NOT NULL DEFAULT 'pendente',
+                detalhe TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_dest_campanha ON destinatarios (campanha_id, status, ordem);
+            CREATE INDEX IF NOT EXISTS idx_campanha_status ON campanhas (status, id);
+            CREATE TABLE IF NOT EXISTS versoes (
+                nome TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL
+            );
+        """)
+        # Bancos criados por versões anteriores da fila
+        for tabela, coluna, definicao in COLUNAS_NOVAS:
+            colunas = {r['name'] for r in con.execute(f"PRAGMA table_info({tabela})")}
+            if coluna not in colunas:
+                con.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+        _tabelas_ok = True
+    return con
+
+
+def _agora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def fila_disponivel():
+    return bool(TOKEN_SERVICO)
+
+
+def criar_campanha(tipo, vendedor_email, contas, assunto, corpo, destinatarios, anexo=None, intervalo=(15, 45), contexto_ia=None):
+    """
+    tipo: 'carteira' ou 'externa'.
+    contas: vendedor_email de cada conta SMTP (mais de uma = rodízio, remetentes.py). A senha não
+    entra na fila: o worker lê a config_smtp no Directus (remetentes.carregar_pool).
+    destinatarios: lista de dicts com nome, cliente_id, pj_id, variaveis ({"{cliente}": "João"}),
+    emails ([{'email': ..., 'tipo': ...}]), atualizar_tentativa e, para personalização, dados_ia.
+    contexto_ia: se informado, cada destinatário recebe um corpo gerado pela IA (ia.PersonalizadorIA).
+    """
+    if not fila_disponivel():
+        raise RuntimeError("DIRECTUS_SERVICE_TOKEN não configurado: o worker não teria como acessar o Directus")
+    # O conteúdo do anexo vai para o armazenamento por hash; a fila guarda só a referência
+    anexo_hash = anexos.guardar(anexo.getvalue()) if anexo is not None else None
+    con = conectar()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        cur = con.execute(
+            """INSERT INTO campanhas (tipo, vendedor_email, conf_smtp, assunto, corpo,
+                   anexo_nome, anexo_tipo, anexo_hash, personalizar_ia, contexto_ia,
+                   intervalo_min, intervalo_max, criada_em, atualizada_em)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (
+                tipo, vendedor_email, json.dumps(contas), assunto, corpo,
+                anexo.name if anexo is not None else None,
+                anexo.type if anexo is not None else None,
+                anexo_hash,
+                1 if contexto_ia else 0,
+                json.dumps(contexto_ia) if contexto_ia else None,
+                intervalo[0], intervalo[1], _agora(), _agora(),
+            ),
+        )
+        campanha_id = cur.lastrowid
+        con.executemany(
+            """INSERT INTO destinatarios (campanha_id, ordem, nome, cliente_id, pj_id, variaveis, emails, atualizar_tentativa, dados_ia)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (
+                    campanha_id, ordem, d.get('nome'),
+                    None if d.get('cliente_id') is None else str(d['cliente_id']),
+                    None if d.get('pj_id') is None else str(d['pj_id']),
+                    json.dumps(d.get('variaveis', {})), json.dumps(d['emails']),
+                    1 if d.get('atualizar_tentativa') else 0,
+                    json.dumps(d['dados_ia']) if d.get('dados_ia') else None,
+                )
+                for ordem, d in enumerate(destinatarios)
+            ],
+        )
+        con.execute("COMMIT")
+        return campanha_id
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+
+
+def listar_campanhas(vendedor_email, limite=5):
+    con = conectar()
+    try:
+        rows = con.execute(
+            """SELECT c.id, c.tipo, c.assunto, c.status, c.enviados, c.erros, c.criada_em, c.atualizada_em,
+                      COUNT(d.id) AS total,
+                      SUM(CASE WHEN d.status != 'pendente' THEN 1 ELSE 0 END) AS processados
+               FROM campanhas c LEFT JOIN destinatarios d ON d.campanha_id = c.id
+               WHERE c.vendedor_email = ?
+               GROUP BY c.id ORDER BY c.id DESC LIMIT ?""",
+            (vendedor_email, limite),
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        con.close()
+
+
+def cancelar_campanha(campanha_id, vendedor_email):
+    con = conectar()
+    try:
+        con.execute(
+            """UPDATE campanhas SET status = 'cancelada', token = NULL, conf_smtp = '[]', atualizada_em = ?
+               WHERE id = ? AND vendedor_email = ? AND status IN ('pendente', 'executando', 'aguardando_cota')""",
+            (_agora(), campanha_id, vendedor_email),
+        )
+    finally:
+        con.close()
+    limpar_anexos()
+
+
+# --- Lado do worker ---
+
+def reiniciar_interrompidas():
+    """Chamado quando o worker sobe: o que estava 'executando' morreu com o processo anterior."""
+    con = conectar()
+    try:
+        con.execute("UPDATE campanhas SET status = 'pendente', atualizada_em = ? WHERE status = 'executando'", (_agora(),))
+        # Campanhas encerradas por versões anteriores ainda guardavam token e senhas
+        con.execute(
+            f"UPDATE campanhas SET token = NULL, conf_smtp = '[]' WHERE status IN ({','.join('?' * len(STATUS_FINAIS))}) AND (token IS NOT NULL OR conf_smtp != '[]')",
+            STATUS_FINAIS,
+        )
+    finally:
+        con.close()
+
+
+def reservar_proximas(limite, ignorar_ids=()):
+    """Marca até `limite` campanhas pendentes como 'executando' e devolve seus dados."""
+    if limite <= 0:
+        return []
+    con = conectar()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        # Cota diária renovada: as campanhas paradas em dias anteriores voltam para a fila
+        con.execute(
+            "UPDATE campanhas SET status = 'pendente', atualizada_em = ? WHERE status = 'aguardando_cota' AND substr(atualizada_em, 1, 10) < ?",
+            (_agora(), datetime.now().strftime("%Y-%m-%d")),
+        )
+        filtro = ""
+        if ignorar_ids:
+            filtro = f"AND id NOT IN ({','.join('?' * len(ignorar_ids))})"
+        rows = con.execute(
+            f"SELECT * FROM campanhas WHERE status = 'pendente' {filtro} ORDER BY id LIMIT ?",
+            (*ignorar_ids, limite),
+        ).fetchall()
+        for r in rows:
+            con.execute("UPDATE campanhas SET status = 'executando', atualizada_em = ? WHERE id = ?", (_agora(), r['id']))
+        con.execute("COMMIT")
+        return [dict(r) for r in rows]
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+
+
+def status_campanha(campanha_id):
+    con = conectar()
+    try:
+        row = con.execute("SELECT status FROM campanhas WHERE id = ?", (campanha_id,)).fetchone()
+        return row['status'] if row else None
+    finally:
+        con.close()
+
+
+def destinatarios_pendentes(campanha_id):
+    con = conectar()
+    try:
+        rows = con.execute(
+            "SELECT * FROM destinatarios WHERE campanha_id = ? AND status = 'pendente' ORDER BY ordem",
+            (campanha_id,),
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        con.close()
+
+
+def ja_iniciada(campanha_id):
+    con = conectar()
+    try:
+        row = con.execute(
+            "SELECT COUNT(*) FROM destinatarios WHERE campanha_id = ? AND (status != 'pendente' OR emails_enviados != '[]')",
+            (campanha_id,),
+        ).fetchone()
+        return row[0] > 0
+    finally:
+        con.close()
+
+
+def registrar_resultado_email(campanha_id, destinatario_id, email, sucesso):
+    con = conectar()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        if sucesso:
+            row = con.execute("SELECT emails_enviados FROM destinatarios WHERE id = ?", (destinatario_id,)).fetchone()
+            enviados = json.loads(row['emails_enviados'])
+            enviados.append(email)
+            con.execute("UPDATE destinatarios SET emails_enviados = ? WHERE id = ?", (json.dumps(enviados), destinatario_id))
+            con.execute("UPDATE campanhas SET enviados = enviados + 1, atualizada_em = ? WHERE id = ?", (_agora(), campanha_id))
+        else:
+            con.execute("UPDATE campanhas SET erros = erros + 1, atualizada_em = ? WHERE id = ?", (_agora(), campanha_id))
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.close()
+
+
+def concluir_destinatario(destinatario_id, status, detalhe=None):
+    con = conectar()
+    try:
+        con.execute("UPDATE destinatarios SET status = ?, detalhe = ? WHERE id = ?", (status, detalhe, destinatario_id))
+    finally:
+        con.close()
+
+
+def aguardar_cota(campanha_id):
+    """A cota acabou no meio da campanha: os pendentes esperam o próximo dia (reservar_proximas retoma)."""
+    con = conectar()
+    try:
+        con.execute(
+            "UPDATE campanhas SET status = 'aguardando_cota', atualizada_em = ? WHERE id = ? AND status = 'executando'",
+            (_agora(), campanha_id),
+        )
+    finally:
+        con.close()
+
+
+def finalizar_campanha(campanha_id, status):
+    con = conectar()
+    try:
+        # Não sobrescreve um cancelamento feito durante o envio
+        con.execute(
+            "UPDATE campanhas SET status = ?, atualizada_em = ? WHERE id = ? AND status = 'executando'",
+            (status, _agora(), campanha_id),
+        )
+        con.execute("UPDATE campanhas SET token = NULL, conf_smtp = '[]' WHERE id = ?", (campanha_id,))
+    finally:
+        con.close()
+    limpar_anexos()
+
+
+def limpar_anexos():
+    """Apaga do disco os anexos que nenhuma campanha ainda em andamento referencia."""
+    con = conectar()
+    try:
+        em_uso = {
+            r['anexo_hash'] for r in con.execute(
+                f"SELECT DISTINCT anexo_hash FROM campanhas WHERE anexo_hash IS NOT NULL AND status NOT IN ({','.join('?' * len(STATUS_FINAIS))})",
+                STATUS_FINAIS,
+            )
+        }
+    finally:
+        con.close()
+    try:
+        anexos.remover_sem_uso(em_uso)
+    except OSError:
+        pass
+
+
+# =========================================================
+#  VERSÃO DA CARTEIRA (AVISO DO WORKER PARA O APP)
+# =========================================================
+# Campanhas da carteira mudam clientes no Directus (status_prospect,
+# tentativa_1). O worker soma 1 aqui a cada cliente alterado e o app passa o
+# número como versão do cache da carteira: mudou, recarrega em segundo plano.
+
+def marcar_carteira_alterada():
+    con = conectar()
+    try:
+        con.execute(
+            "INSERT INTO versoes (nome, valor) VALUES ('carteira', 1) "
+            "ON CONFLICT(nome) DO UPDATE SET valor = valor + 1"
+        )
+    finally:
+        con.close()
+
+
+def versao_carteira():
+    con = conectar()
+    try:
+        row = con.execute("SELECT valor FROM versoes WHERE nome = 'carteira'").fetchone()
+        return row['valor'] if row else 0
+    finally:
+        con.close()
+
+
+# --- Processo do worker ---
+
+def worker_ativo():
+    """True se algum processo segura o lock do worker."""
+    with open(LOCK_WORKER, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return True
+        fcntl.flock(f, fcntl.LOCK_UN)
+        return False
+
+
+def garantir_worker(intervalo=30):
+    """Sobe o worker_campanhas.py em segundo plano se não houver um rodando (checa no máximo a cada `intervalo` s)."""
+    global _ultima_checagem_worker
+    if os.getenv("CAMPANHAS_WORKER_AUTO", "1") == "0":
+        return
+    with _lock_checagem:
+        if time.monotonic() - _ultima_checagem_worker < intervalo:
+            return
+        _ultima_checagem_worker = time.monotonic()
+        if worker_ativo():
+            return
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker_campanhas.py")
+        with open(LOG_WORKER, "a") as log:
+            subprocess.Popen(
+                [sys.executable, script],
+                stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                start_new_session=True,
+            )
@@ -0,0 +1,275 @@
+import os
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
+
+from armazenamento import caminho_dados
+from cache import CacheDisco
+from metricas import medir
+
+# =========================================================
+#  IA (GROQ): SUGESTÕES DE BRINDES E E-MAIL PERSONALIZADO
+# =========================================================
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY", "") 
+
+# Cliente Groq: o SDK é pesado e a tela de login não precisa dele, então
+# é importado e criado só no primeiro uso (uma vez por processo).
+_groq_client = None
+erro_groq = None
+_lock_groq = threading.Lock()
+
+
+def ia_disponivel():
+    """Se a IA pode ser usada, sem importar o SDK."""
+    return bool(GROQ_API_KEY) and erro_groq is None
+
+
+def cliente_groq():
+    global _groq_client, erro_groq
+    if _groq_client is None and ia_disponivel():
+        with _lock_groq:
+            if _groq_client is None and erro_groq is None:
+                try:
+                    from groq import Groq
+                    _groq_client = Groq(api_key=GROQ_API_KEY)
+                except Exception as e:
+                    erro_groq = e
+    return _groq_client
+
+
+def erro_configuracao_groq():
+    return erro_groq
+
+# A sugestão depende só da área de atuação: cache em disco por área
+# normalizada + versão do prompt (mude a versão ao alterar o prompt).
+VERSAO_PROMPT_SUGESTOES = "v1"
+cache_sugestoes = CacheDisco(
+    caminho_dados("sugestoes_ia.db"),
+    ttl=int(os.getenv("SUGESTOES_CACHE_TTL", str(7 * 24 * 3600))),
+    max_itens=int(os.getenv("SUGESTOES_CACHE_MAX", "2000")),
+)
+
+# Pré-aquecimento: poucas threads para não estourar o rate limit da Groq
+_pool_aquecimento = ThreadPoolExecutor(max_workers=int(os.getenv("SUGESTOES_WORKERS", "3")))
+_areas_agendadas = set()
+_areas_aquecidas = {}   # chave -> momento em que foi confirmada no cache
+_areas_falhas = {}      # chave -> (tentativas seguidas, momento da última falha)
+_lock_agendadas = threading.Lock()
+RECHECAR_AQUECIDAS = 3600
+# Área que falhou (Groq fora ou no rate limit) só volta depois de uma espera
+# que dobra a cada falha seguida, para os reruns não martelarem o provedor
+ESPERA_FALHA = int(os.getenv("SUGESTOES_ESPERA_FALHA_SEG", "60"))
+ESPERA_FALHA_MAXIMA = int(os.getenv("SUGESTOES_ESPERA_FALHA_MAX_SEG", "3600"))
+
+
+def _em_espera(chave, agora):
+    tentativas, quando = _areas_falhas.get(chave, (0, 0.0))
+    if not tentativas:
+        return False
+    return agora - quando < min(ESPERA_FALHA * 2 ** (tentativas - 1), ESPERA_FALHA_MAXIMA)
+
+
+def _chave_sugestao(area_atuacao):
+    area = unicodedata.normalize("NFKD", str(area_atuacao)).encode("ascii", "ignore").decode("ascii")
+    area = re.sub(r"\s+", " ", area).strip().lower()
+    return f"{VERSAO_PROMPT_SUGESTOES}:{area}"
+
+
+def sugestoes_em_cache(area_atuacao):
+    """(sugestoes, motivo) se já estiver no cache, senão None. Não chama a IA."""
+    valor = cache_sugestoes.obter(_chave_sugestao(area_atuacao))
+    if valor is None:
+        return None
+    return valor[0], valor[1]
+
+
+def aquecer_sugestoes(areas):
+    """Agenda em segundo plano as áreas que ainda não estão no cache. Retorna na hora."""
+    if not ia_disponivel():
+        return
+    agora = time.monotonic()
+    for area in areas:
+        chave = _chave_sugestao(area)
+        with _lock_agendadas:
+            if chave in _areas_agendadas or agora - _areas_aquecidas.get(chave, -RECHECAR_AQUECIDAS) < RECHECAR_AQUECIDAS:
+                continue
+            if _em_espera(chave, agora):
+                continue
+            _areas_agendadas.add(chave)
+        _pool_aquecimento.submit(_aquecer_area, area, chave)
+
+
+def _aquecer_area(area, chave):
+    try:
+        try:
+            if cache_sugestoes.obter(chave) is None:
+                gerar_sugestoes_elo_brindes(area)
+            aquecida = cache_sugestoes.obter(chave) is not None
+        except Exception:
+            aquecida = False
+        with _lock_agendadas:
+            if aquecida:
+                _areas_aquecidas[chave] = time.monotonic()
+                _areas_falhas.pop(chave, None)
+            else:
+                tentativas = _areas_falhas.get(chave, (0, 0.0))[0]
+                _areas_falhas[chave] = (tentativas + 1, time.monotonic())
+    finally:
+        with _lock_agendadas:
+            _areas_agendadas.discard(chave)
+
+
+def gerar_sugestoes_elo_brindes(area_atuacao):
+    groq_client = cliente_groq()
+    if not groq_client:
+        return ["🎁 Kit Boas Vindas Personalizado", "🎁 Caneta Metal Premium", "🎁 Caderno Moleskine com Logo"], "Sugestão Padrão (Sem IA)"
+    
+    em_cache = cache_sugestoes.obter(_chave_sugestao(area_atuacao))
+    if em_cache is not None:
+        return em_cache[0], em_cache[1]
+    
+    try:
+        prompt = f"""
+        Você é um consultor especialista da Elo Brindes (www.elobrindes.com.br).
+        O cliente atua na área: '{area_atuacao}'.
+        Sugira 3 brindes corporativos personalizados do catálogo da Elo Brindes que façam sentido para este ramo.
+        Responda EXATAMENTE no formato: Produto A|Produto B|Produto C
+        Não use introduções, apenas os nomes dos produtos.
+        """
+        
+        with medir("groq", "sugestoes") as medicao:
+            chat_completion = groq_client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    }
+                ],
+                model="llama-3.3-70b-versatile",
+            )
+            texto = chat_completion.choices[0].message.content.strip()
+            medicao.tamanho = len(texto.encode("utf-8"))
+        
+        if "|" in texto:
+            produtos = texto.split("|")
+            produtos_fmt = [f"📦 {p.strip().replace('📦', '')}" for p in produtos[:3]]
+            resultado = (produtos_fmt, f"Sugestão IA (Baseada em {area_atuacao})")
+        else:
+            resultado = ([f"📦 {texto}"], "Sugestão IA")
+        # Só respostas da IA vão para o cache; os fallbacks de erro não
+        cache_sugestoes.guardar(_chave_sugestao(area_atuacao), list(resultado))
+        return resultado
+    except Exception:
+        return ["🎁 Garrafa Térmica Personalizada", "🎁 Mochila Executiva", "🎁 Kit Tecnológico (Powerbank)"], "Sugestão Geral (Erro IA)"
+
+
+def gerar_email_ia(nome_destinatario, ramo, data_compra, campanha, usuario_nome, usuario_cargo):
+    groq_client = cliente_groq()
+    if not groq_client: return "Erro IA", "Sem Chave API configurada"
+    camp_nome = campanha.get('nome_campanha', 'Retomada') if campanha else 'Contato'
+    
+    # PROMPT ATUALIZADO PARA HUMANO + 3 BRINDES + LINKS
+    prompt = f"""
+    Aja como {usuario_nome}, da Elo Brindes.
+    Escreva um e-mail curto e direto para {nome_destinatario} (Setor: {ramo}).
+    
+    Contexto: Cliente inativo desde {data_compra}.
+    Objetivo: Mostrar novidades e levar para o site.
+
+    REGRAS DE TOM DE VOZ (HUMANO):
+    1. Seja casual, mas profissional. Evite "Prezado(a)" ou linguagem muito formal. Use "Olá".
+    2. Seja breve. Ninguém lê e-mails longos.
+    3. Nada de robótico. Escreva como se estivesse falando com um colega.
+
+    CONTEÚDO OBRIGATÓRIO:
+    1. Diga que estava revisando a carteira e lembrou deles.
+    2. Sugira 3 categorias de brindes ESPECÍFICAS para o setor de {ramo}. 
+    3. Para cada sugestão, tente inventar um link de busca simples no formato: (www.elobrindes.com.br/?s=produto)
+    4. Encerre com um CTA leve: "Dá uma olhada no site ou me chama aqui se precisar de algo."
+    
+    SAÍDA ESPERADA:
+    Assunto: Ideias para a {ramo}|||Olá {nome_destinatario}, tudo bem?
+
+    Estava aqui revisando alguns parceiros antigos e lembrei de vocês. Faz um tempo que não nos falamos!
+
+    Separei algumas novidades que têm saído muito para o setor de {ramo}:
+
+    - [Sugestão 1] (Link: www.elobrindes.com.br/?s=sugestao1)
+    - [Sugestão 2] (Link: www.elobrindes.com.br/?s=sugestao2)
+    - [Sugestão 3] (Link: www.elobrindes.com.br/?s=sugestao3)
+
+    Se precisar de cotação ou quiser ver mais opções, é só me chamar.
+
+    Abraço,
+    """
+    try:
+        with medir("groq", "gerar_email") as medicao:
+            chat_completion = groq_client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    }
+                ],
+                model="llama-3.3-70b-versatile",
+            )
+            txt = chat_completion.choices[0].message.content.strip()
+            medicao.tamanho = len(txt.encode("utf-8"))
+        
+        assunto = "Contato Elo Brindes"
+        corpo = txt
+        
+        if "|||" in txt:
+            partes = txt.split("|||", 1)
+            assunto = partes[0].replace("Assunto:", "").strip()
+            corpo = partes[1].strip()
+            
+        return assunto, corpo
+    except Exception as e: return "Erro", str(e)
+
+
+class PersonalizadorIA:
+    """
+    Gera o corpo personalizado dos próximos destinatários em paralelo enquanto
+    o envio espera o delay anti-spam. Se a IA não responder a tempo, quem
+    chama usa o texto padrão da campanha.
+    """
+
+    def __init__(self, contexto, paralelas=None, timeout=None):
+        self.contexto = contexto   # {'campanha': {...}, 'usuario_nome': ..., 'usuario_cargo': ...}
+        self.timeout = timeout if timeout is not None else float(os.getenv("IA_PERSONALIZACAO_TIMEOUT", "20"))
+        self.paralelas = paralelas or int(os.getenv("IA_PERSONALIZACAO_PARALELAS", "3"))
+        self._pool = ThreadPoolExecutor(max_workers=self.paralelas)
+        self._futuros = {}
+
+    def agendar(self, chave, dados):
+        """dados: {'nome': ..., 'ramo': ..., 'data_compra': ...}"""
+        if chave in self._futuros or not ia_disponivel():
+            return
+        self._futuros[chave] = self._pool.submit(
+            gerar_email_ia,
+            dados.get('nome', ''), dados.get('ramo', ''), dados.get('data_compra', ''),
+            self.contexto.get('campanha'), self.contexto.get('usuario_nome', ''), self.contexto.get('usuario_cargo', ''),
+        )
+
+    def obter(self, chave):
+        """Corpo gerado pela IA ou None (sem IA, erro ou timeout)."""
+        futuro = self._futuros.pop(chave, None)
+        if futuro is None:
+            return None
+        try:
+            assunto, corpo = futuro.result(timeout=self.timeout)
+        except FuturoTimeout:
+            futuro.cancel()
+            return None
+        except Exception:
+            return None
+        if assunto in ("Erro", "Erro IA") or not corpo:
+            return None
+        return corpo
+
+    def fechar(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,252 @@
+import gzip
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from armazenamento import caminho_dados
+from emails import normalizar_emails, somar_relatorios
+
+# =========================================================
+#  IMPORTAÇÃO DE LEADS (PROSPECÇÃO EXTERNA)
+# =========================================================
+# A planilha é lida em fluxo: CSV em blocos (só as colunas de e-mail, nome e
+# empresa) e XLSX pelo iterador read-only do openpyxl. As colunas são
+# detectadas só pelo cabeçalho e cada bloco já sai validado, então a memória
+# fica no tamanho de um bloco mais os leads válidos, não no arquivo inteiro.
+
+TAMANHO_BLOCO = int(os.getenv("LEADS_BLOCO", "5000"))
+COLUNAS_LEADS = ['Nome', 'Email', 'Empresa']
+NOME_PADRAO = 'Parceiro'
+
+
+class ArquivoLeadsInvalido(ValueError):
+    pass
+
+
+def detectar_colunas(cabecalho):
+    """Índices (email, nome, empresa) a partir do cabeçalho; None se a coluna não existir."""
+    nomes = [str(c).lower().strip() if c is not None else "" for c in cabecalho]
+    col_email = next((i for i, c in enumerate(nomes) if 'email' in c or 'e-mail' in c), None)
+    col_nome = next((i for i, c in enumerate(nomes) if 'nome' in c or 'name' in c), None)
+    col_empresa = next((i for i, c in enumerate(nomes) if 'empresa' in c or 'company' in c or 'razao' in c), None)
+    return col_email, col_nome, col_empresa
+
+
+def normalizar_bloco(emails, nomes=None, empresas=None):
+    """
+    Bloco de leads já validado (emails.py): uma linha por endereço válido, com
+    nome/empresa da linha de origem e vazios preenchidos. Retorna (bloco, relatorio).
+    """
+    validos, relatorio = normalizar_emails(pd.Series(emails, dtype=object))
+    origem = validos.index
+
+    if nomes is not None:
+        nome = pd.Series(nomes, dtype=object).loc[origem]
+        nome = nome.where(nome.notna(), '').astype(str).str.strip()
+        nome = nome.where(nome != '', NOME_PADRAO)
+    else:
+        nome = pd.Series(NOME_PADRAO, index=origem, dtype=object)
+
+    if empresas is not None:
+        empresa = pd.Series(empresas, dtype=object).loc[origem]
+        empresa = empresa.where(empresa.notna(), '').astype(str).str.strip()
+    else:
+        empresa = pd.Series('', index=origem, dtype=object)
+
+    bloco = pd.DataFrame({'Nome': nome.to_numpy(), 'Email': validos['email'].to_numpy(), 'Empresa': empresa.to_numpy()}, columns=COLUNAS_LEADS)
+    return bloco, relatorio
+
+
+def _blocos_csv(arquivo, tamanho_bloco):
+    cabecalho = list(pd.read_csv(arquivo, nrows=0).columns)
+    col_email, col_nome, col_empresa = detectar_colunas(cabecalho)
+    if col_email is None:
+        raise ArquivoLeadsInvalido("Não encontrei uma coluna de E-mail no arquivo.")
+    # usecols devolve as colunas na ordem do arquivo
+    usar = sorted({i for i in (col_email, col_nome, col_empresa) if i is not None})
+    arquivo.seek(0)
+    leitor = pd.read_csv(arquivo, usecols=usar, dtype=str, chunksize=tamanho_bloco)
+
+    def coluna(bloco, indice):
+        return bloco.iloc[:, usar.index(indice)].tolist() if indice is not None else None
+
+    for bloco in leitor:
+        yield (len(bloco),) + normalizar_bloco(coluna(bloco, col_email), coluna(bloco, col_nome), coluna(bloco, col_empresa))
+
+
+def _blocos_xlsx(arquivo, tamanho_bloco):
+    from openpyxl import load_workbook
+
+    livro = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        linhas = livro.active.iter_rows(values_only=True)
+        cabecalho = next(linhas, None) or ()
+        col_email, col_nome, col_empresa = detectar_colunas(cabecalho)
+        if col_email is None:
+            raise ArquivoLeadsInvalido("Não encontrei uma coluna de E-mail no arquivo.")
+
+        def valor(linha, indice):
+            return linha[indice] if indice is not None and indice < len(linha) else None
+
+        emails, nomes, empresas = [], [], []
+        for linha in linhas:
+            emails.append(valor(linha, col_email))
+            nomes.append(valor(linha, col_nome))
+            empresas.append(valor(linha, col_empresa))
+            if len(emails) >= tamanho_bloco:
+                yield (len(emails),) + normalizar_bloco(emails, nomes if col_nome is not None else None, empresas if col_empresa is not None else None)
+                emails, nomes, empresas = [], [], []
+        if emails:
+            yield (len(emails),) + normalizar_bloco(emails, nomes if col_nome is not None else None, empresas if col_empresa is not None else None)
+    finally:
+        livro.close()
+
+
+def ler_leads(arquivo, nome_arquivo, tamanho_bloco=TAMANHO_BLOCO, ao_progresso=None):
+    """
+    Lê um CSV/XLSX de leads em blocos. ao_progresso(linhas_lidas, leads_validos)
+    é chamado a cada bloco. Retorna (df com Nome/Email/Empresa, relatorio), com
+    relatorio = {'linhas', 'validos', 'corrigidos', 'rejeitados', 'divididos', ...}.
+    Levanta ArquivoLeadsInvalido se não houver coluna de e-mail.
+    """
+    arquivo.seek(0)
+    if nome_arquivo.lower().endswith('.csv'):
+        blocos = _blocos_csv(arquivo, tamanho_bloco)
+    else:
+        blocos = _blocos_xlsx(arquivo, tamanho_bloco)
+
+    partes = []
+    relatorio = {'linhas': 0}
+    for lidas, bloco, relatorio_bloco in blocos:
+        relatorio = somar_relatorios(relatorio, relatorio_bloco)
+        relatorio['linhas'] += lidas
+        if not bloco.empty:
+            partes.append(bloco)
+        if ao_progresso:
+            ao_progresso(relatorio['linhas'], relatorio.get('validos', 0))
+
+    if not partes:
+        return pd.DataFrame(columns=COLUNAS_LEADS), relatorio
+    return pd.concat(partes, ignore_index=True), relatorio
+
+
+# =========================================================
+#  CACHE DAS LISTAS JÁ IMPORTADAS (POR HASH DO CONTEÚDO)
+# =========================================================
+# O file_uploader devolve o mesmo arquivo a cada rerun; sem cache, digitar o
+# assunto relia a planilha inteira. A tabela normalizada fica em memória
+# (poucas listas) e em disco em formato colunar: parquet (pyarrow, em
+# requirements.txt); sem ele, JSON gzipado com uma lista por coluna (um array
+# numpy de texto teria largura fixa = o maior valor, e estourava a memória
+# em listas grandes com uma célula comprida). Mude a versão ao
+# alterar a leitura/normalização para não reaproveitar tabelas antigas.
+
+VERSAO_IMPORTACAO = "2"
+PASTA_CACHE = caminho_dados("leads")
+LISTAS_EM_MEMORIA = 4
+VALIDADE_DISCO = int(os.getenv("LEADS_CACHE_DIAS", "7")) * 24 * 3600
+TEM_PARQUET = importlib.util.find_spec("pyarrow") is not None
+
+_em_memoria = OrderedDict()   # chave -> (df, relatorio)
+_lock_memoria = threading.Lock()
+
+
+def hash_arquivo(arquivo):
+    arquivo.seek(0)
+    h = hashlib.sha256()
+    for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+        h.update(bloco)
+    arquivo.seek(0)
+    return h.hexdigest()
+
+
+def _caminho_cache(chave):
+    return os.path.join(PASTA_CACHE, chave + (".parquet" if TEM_PARQUET else ".json.gz"))
+
+
+def _guardar_memoria(chave, valor):
+    with _lock_memoria:
+        _em_memoria[chave] = valor
+        _em_memoria.move_to_end(chave)
+        while len(_em_memoria) > LISTAS_EM_MEMORIA:
+            _em_memoria.popitem(last=False)
+
+
+def _ler_disco(chave):
+    caminho = _caminho_cache(chave)
+    caminho_meta = os.path.join(PASTA_CACHE, chave + ".json")
+    if not (os.path.exists(caminho) and os.path.exists(caminho_meta)):
+        return None
+    try:
+        with open(caminho_meta, encoding="utf-8") as f:
+            relatorio = json.load(f)['relatorio']
+        if TEM_PARQUET:
+            df = pd.read_parquet(caminho)
+        else:
+            with gzip.open(caminho, "rt", encoding="utf-8") as f:
+                colunas = json.load(f)
+            df = pd.DataFrame({c: pd.Series(colunas[c], dtype=object) for c in COLUNAS_LEADS}, columns=COLUNAS_LEADS)
+        return df, relatorio
+    except Exception:
+        return None
+
+
+def _gravar_disco(chave, df, relatorio):
+    os.makedirs(PASTA_CACHE, exist_ok=True)
+    caminho = _caminho_cache(chave)
+    temporario = caminho + ".tmp"
+    if TEM_PARQUET:
+        df.to_parquet(temporario, index=False)
+    else:
+        with gzip.open(temporario, "wt", encoding="utf-8") as f:
+            json.dump({c: df[c].astype(str).tolist() for c in COLUNAS_LEADS}, f, ensure_ascii=False)
+    os.replace(temporario, caminho)
+    with open(os.path.join(PASTA_CACHE, chave + ".json"), "w", encoding="utf-8") as f:
+        json.dump({"relatorio": relatorio, "gravado_em": time.time()}, f)
+    _limpar_disco()
+
+
+def _limpar_disco():
+    limite = time.time() - VALIDADE_DISCO
+    for nome in os.listdir(PASTA_CACHE):
+        caminho = os.path.join(PASTA_CACHE, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+
+def ler_leads_em_cache(arquivo, nome_arquivo, ao_progresso=None, hash_conteudo=None):
+    """
+    Como ler_leads, mas lê cada conteúdo uma vez só. Retorna (df, relatorio, veio_do_cache).
+    O DataFrame é compartilhado entre sessões: não altere.
+    """
+    formato = "csv" if nome_arquivo.lower().endswith('.csv') else "xlsx"
+    chave = f"{hash_conteudo or hash_arquivo(arquivo)}-{formato}-v{VERSAO_IMPORTACAO}"
+
+    with _lock_memoria:
+        if chave in _em_memoria:
+            _em_memoria.move_to_end(chave)
+            df, relatorio = _em_memoria[chave]
+            return df, relatorio, True
+
+    em_disco = _ler_disco(chave)
+    if em_disco is not None:
+        _guardar_memoria(chave, em_disco)
+        return em_disco[0], em_disco[1], True
+
+    df, relatorio = ler_leads(arquivo, nome_arquivo, ao_progresso=ao_progresso)
+    _guardar_memoria(chave, (df, relatorio))
+    try:
+        _gravar_disco(chave, df, relatorio)
+    except Exception:
+        # Sem disco o cache em memória ainda evita reler nesta sessão
+        pass
+    return df, relatorio, False
@@ -0,0 +1,198 @@
+import atexit
+import fcntl
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from armazenamento import caminho_dados
+from directus import directus
+
+# =========================================================
+#  LOG DE ENVIOS EM LOTE (HISTORICO_ENVIOS)
+# =========================================================
+# Antes cada e-mail fazia um POST síncrono no Directus e, se ele estivesse
+# lento ou fora, o registro se perdia. Agora o registro vai primeiro para um
+# arquivo local (uma linha JSON por entrada) e uma thread manda tudo em lote
+# (o POST /items aceita lista) quando junta LOG_LOTE entradas ou a cada
+# LOG_INTERVALO segundos. O que não foi gravado continua no arquivo e é
+# reenviado quando o worker sobe de novo (recuperar).
+
+COLECAO = "historico_envios"
+TAMANHO_LOTE = int(os.getenv("LOG_LOTE", "50"))
+INTERVALO_FLUSH = float(os.getenv("LOG_INTERVALO", "5"))
+ESPERA_MAXIMA_ERRO = 300
+
+
+def _agora():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class EscritorLog:
+    def __init__(self, caminho, colecao=COLECAO, tamanho_lote=TAMANHO_LOTE, intervalo=INTERVALO_FLUSH):
+        self.caminho = caminho
+        self.colecao = colecao
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        # Token usado no lugar do da entrada (ex.: token de serviço do worker)
+        self.token_padrao = None
+        # O token do usuário fica só em memória, presa à entrada que ele registrou;
+        # entradas lidas do arquivo só saem com o token_padrao (nunca com o de outro usuário)
+        self._fila = []               # entradas ainda não gravadas no Directus
+        self._lock = threading.Lock()
+        self._lock_envio = threading.Lock()   # um descarregamento por vez
+        self._acordar = threading.Event()
+        self._thread = None
+        self._falhas = 0
+
+    # --- Arquivo local (write-ahead) ---
+
+    def _bloquear_arquivo(self):
+        # Lock num arquivo à parte: o principal é substituído na compactação
+        arq = open(self.caminho + ".lock", "a")
+        fcntl.flock(arq, fcntl.LOCK_EX)
+        return arq
+
+    def _ler_arquivo(self):
+        entradas = []
+        if not os.path.exists(self.caminho):
+            return entradas
+        with open(self.caminho, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    entradas.append(json.loads(linha))
+                except ValueError:
+                    # Linha cortada por uma queda no meio da escrita
+                    continue
+        return entradas
+
+    def _compactar(self, gravados):
+        """Reescreve o arquivo sem as entradas já gravadas no Directus."""
+        lock_arq = self._bloquear_arquivo()
+        try:
+            restantes = [e for e in self._ler_arquivo() if e['id'] not in gravados]
+            temporario = self.caminho + ".tmp"
+            with open(temporario, "w", encoding="utf-8") as f:
+                for entrada in restantes:
+                    f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, self.caminho)
+        finally:
+            lock_arq.close()
+
+    # --- API ---
+
+    def registrar(self, token, payload):
+        entrada = {"id": uuid.uuid4().hex, "payload": payload}
+        with self._lock:
+            lock_arq = self._bloquear_arquivo()
+            try:
+                with open(self.caminho, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            finally:
+                lock_arq.close()
+            self._fila.append(dict(entrada, token=token))
+            cheio = len(self._fila) >= self.tamanho_lote
+        self._garantir_thread()
+        if cheio:
+            self._acordar.set()
+
+    def recuperar(self):
+        """Coloca na fila o que ficou no arquivo de uma execução anterior. Retorna quantas entradas."""
+        with self._lock:
+            lock_arq = self._bloquear_arquivo()
+            try:
+                no_arquivo = self._ler_arquivo()
+            finally:
+                lock_arq.close()
+            na_fila = {e['id'] for e in self._fila}
+            novas = [e for e in no_arquivo if e['id'] not in na_fila]
+            self._fila[:0] = novas
+        if novas:
+            self._garantir_thread()
+            self._acordar.set()
+        return len(novas)
+
+    def pendentes(self):
+        with self._lock:
+            return len(self._fila)
+
+    def descarregar(self):
+        """Grava no Directus tudo o que está na fila. Retorna True se não sobrou nada."""
+        with self._lock_envio:
+            return self._descarregar()
+
+    def _descarregar(self):
+        while True:
+            with self._lock:
+                lote = self._fila[:self.tamanho_lote]
+            if not lote:
+                return True
+            gravados = self._enviar_lote(lote)
+            if gravados:
+                with self._lock:
+                    self._fila = [e for e in self._fila if e['id'] not in gravados]
+                self._compactar(gravados)
+            if len(gravados) < len(lote):
+                return False
+
+    def fechar(self):
+        try:
+            self.descarregar()
+        except Exception:
+            pass
+
+    # --- Envio ---
+
+    def _enviar_lote(self, lote):
+        """Retorna o conjunto de ids gravados (ou descartados por serem inválidos)."""
+        por_token = {}
+        for entrada in lote:
+            por_token.setdefault(self.token_padrao or entrada.get('token'), []).append(entrada)
+
+        gravados = set()
+        for token, entradas in por_token.items():
+            if not token:
+                # Recuperadas do arquivo sem token de serviço: ficam lá até o worker subir com ele
+                continue
+            r = directus.criar_item(token, self.colecao, [e['payload'] for e in entradas])
+            if r.status_code in (200, 204):
+                gravados.update(e['id'] for e in entradas)
+            elif r.status_code == 400:
+                # Um item inválido derruba o lote inteiro: tenta um por um
+                for entrada in entradas:
+                    r_item = directus.criar_item(token, self.colecao, entrada['payload'])
+                    if r_item.status_code in (200, 204):
+                        gravados.add(entrada['id'])
+                    elif r_item.status_code == 400:
+                        print(f"[{_agora()}] Log de envio recusado pelo Directus, descartado: {r_item.text[:200]}", flush=True)
+                        gravados.add(entrada['id'])
+            # 401/403/5xx: fica no arquivo para a próxima tentativa
+        return gravados
+
+    def _garantir_thread(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._laco, daemon=True)
+            self._thread.start()
+
+    def _laco(self):
+        while True:
+            # Depois de falhas seguidas espera mais, para não martelar um Directus fora do ar
+            espera = min(self.intervalo * (2 ** self._falhas), ESPERA_MAXIMA_ERRO)
+            self._acordar.wait(espera)
+            self._acordar.clear()
+            try:
+                ok = self.descarregar()
+            except Exception:
+                ok = False
+            self._falhas = 0 if ok else min(self._falhas + 1, 10)
+
+
+escritor = EscritorLog(caminho_dados("historico_envios.wal"))
+atexit.register(escritor.fechar)
@@ -0,0 +1,94 @@
+import base64
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from email.mime.base import MIMEBase
+from email.mime.image import MIMEImage
+from email import encoders
+
+# =========================================================
+#  MENSAGEM DA CAMPANHA (MIME MONTADO UMA VEZ)
+# =========================================================
+# Numa campanha só o To e o texto ({cliente}, {nome}...) mudam de um
+# destinatário para outro. O anexo/imagem é codificado em base64 uma única
+# vez e a mensagem inteira é serializada como um esqueleto com marcadores;
+# para cada destinatário basta encaixar o To e o corpo HTML.
+
+MARCADOR_TO = "__ELOFLOW_PARA__"
+MARCADOR_CORPO = "__ELOFLOW_CORPO__"
+
+TAGS_HTML = ["<div", "<html", "<span", "<table", "<a href"]
+TAG_IMAGEM_INLINE = '<br><img src="cid:imagem_corpo" style="max-width:100%; height:auto;"><br>'
+
+
+class MensagemCampanha:
+    def __init__(self, assunto, corpo_modelo, conf_smtp, arquivo_anexo=None):
+        self.assinatura = conf_smtp.get('assinatura_html')
+
+        # Verifica se é para usar imagem INLINE (no corpo)
+        self.usar_imagem_inline = (
+            arquivo_anexo is not None
+            and "{{IMAGEM}}" in corpo_modelo
+            and "image" in (arquivo_anexo.type or "")
+        )
+
+        # Cria o Container Principal
+        if self.usar_imagem_inline:
+            msg = MIMEMultipart('related') # Related é necessário para imagens inline
+        else:
+            msg = MIMEMultipart() # Mixed (padrão)
+
+        msg['From'] = conf_smtp['smtp_user']
+        msg['To'] = MARCADOR_TO
+        msg['Subject'] = assunto
+
+        # Parte HTML com o payload cru: o base64 do corpo entra por destinatário
+        parte_html = MIMEText("", 'html', 'utf-8')
+        parte_html.set_payload(MARCADOR_CORPO)
+
+        if self.usar_imagem_inline:
+            # Parte Alternativa (Texto/HTML)
+            msg_alternative = MIMEMultipart('alternative')
+            msg.attach(msg_alternative)
+            msg_alternative.attach(parte_html)
+
+            # Anexa a Imagem com o Content-ID
+            image = MIMEImage(arquivo_anexo.getvalue())
+            image.add_header('Content-ID', '<imagem_corpo>')
+            image.add_header('Content-Disposition', 'inline', filename=arquivo_anexo.name)
+            msg.attach(image)
+        else:
+            msg.attach(parte_html)
+
+            # Se tiver arquivo e NÃO for inline (ex: PDF ou imagem sem tag), anexa normal
+            if arquivo_anexo is not None:
+                part = MIMEBase('application', 'octet-stream')
+                part.set_payload(arquivo_anexo.getvalue())
+                encoders.encode_base64(part)
+                part.add_header('Content-Disposition', f'attachment; filename="{arquivo_anexo.name}"')
+                msg.attach(part)
+
+        esqueleto = msg.as_string()
+        antes_to, resto = esqueleto.split(MARCADOR_TO, 1)
+        meio, depois_corpo = resto.split(MARCADOR_CORPO, 1)
+        self._partes = (antes_to, meio, depois_corpo)
+
+    def corpo_html(self, mensagem_html):
+        # Tratamento do Corpo HTML
+        if any(tag in mensagem_html for tag in TAGS_HTML):
+            corpo_completo = mensagem_html
+        else:
+            corpo_completo = mensagem_html.replace("\n", "<br>")
+
+        if self.assinatura and "</body>" not in corpo_completo:
+            corpo_completo += f"<br><br>{self.assinatura}"
+
+        # Se for imagem inline, substitui a tag pelo CID
+        if self.usar_imagem_inline:
+            corpo_completo = corpo_completo.replace("{{IMAGEM}}", TAG_IMAGEM_INLINE)
+        return corpo_completo
+
+    def montar(self, destinatarios, mensagem_html):
+        """Mensagem pronta (str) para o sendmail."""
+        antes_to, meio, depois_corpo = self._partes
+        corpo_b64 = base64.encodebytes(self.corpo_html(mensagem_html).encode('utf-8')).decode('ascii').rstrip("\n")
+        return "".join((antes_to, ", ".join(destinatarios), meio, corpo_b64, depois_corpo))
@@ -0,0 +1,214 @@
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from armazenamento import caminho_dados
+
+# =========================================================
+#  MÉTRICAS DAS DEPENDÊNCIAS EXTERNAS (DIRECTUS, GROQ, SMTP)
+# =========================================================
+# Cada chamada para fora registra a duração num histograma, o resultado
+# (ok ou o tipo de erro) e o tamanho do payload, por dependência e
+# operação. Tudo fica em memória no processo e sai em texto no formato do
+# Prometheus, de um jeito ou de outro:
+#   - METRICAS_PORTA (app) / METRICAS_PORTA_WORKER (worker): servidor HTTP
+#     local em /metrics;
+#   - sem porta: arquivo dados/metricas_<processo>.prom reescrito a cada
+#     METRICAS_INTERVALO segundos (textfile collector do node_exporter).
+# METRICAS_ARQUIVO=0 desliga o arquivo.
+
+PREFIXO = "eloflow_dependencia"
+LIMITES_DURACAO = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+LIMITES_BYTES = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2)
+INTERVALO_ARQUIVO = float(os.getenv("METRICAS_INTERVALO", "15"))
+GRAVAR_ARQUIVO = os.getenv("METRICAS_ARQUIVO", "1") != "0"
+# Só local por padrão; no Docker use METRICAS_HOST=0.0.0.0 para o Prometheus alcançar
+HOST = os.getenv("METRICAS_HOST", "127.0.0.1")
+
+# Ids no caminho viram ":id" para não criar uma série por item
+RE_ID_CAMINHO = re.compile(r"/(?:\d+|[0-9a-f]{8}-[0-9a-f-]{27,})(?=/|$)", re.IGNORECASE)
+
+
+class Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * len(limites)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        for i, limite in enumerate(self.limites):
+            if valor <= limite:
+                self.contagens[i] += 1
+        self.soma += valor
+        self.total += 1
+
+
+class Registro:
+    def __init__(self):
+        self._duracoes = {}    # (dependencia, operacao) -> Histograma
+        self._bytes = {}       # (dependencia, operacao) -> Histograma
+        self._resultados = {}  # (dependencia, operacao, resultado) -> contagem
+        self._lock = threading.Lock()
+
+    def registrar(self, dependencia, operacao, duracao, resultado="ok", tamanho=None):
+        """resultado: 'ok' ou o tipo do erro (ex.: 'http_5xx', 'timeout', 'SMTPAuthenticationError')."""
+        chave = (dependencia, operacao)
+        with self._lock:
+            if chave not in self._duracoes:
+                self._duracoes[chave] = Histograma(LIMITES_DURACAO)
+            self._duracoes[chave].observar(duracao)
+            if tamanho is not None:
+                if chave not in self._bytes:
+                    self._bytes[chave] = Histograma(LIMITES_BYTES)
+                self._bytes[chave].observar(tamanho)
+            chave_resultado = chave + (resultado,)
+            self._resultados[chave_resultado] = self._resultados.get(chave_resultado, 0) + 1
+
+    def texto_prometheus(self):
+        with self._lock:
+            linhas = []
+            linhas += _histograma_texto(f"{PREFIXO}_duracao_segundos", "Duração das chamadas externas.", self._duracoes)
+            linhas += _histograma_texto(f"{PREFIXO}_payload_bytes", "Tamanho do payload (resposta ou mensagem enviada).", self._bytes)
+            nome = f"{PREFIXO}_chamadas_total"
+            linhas.append(f"# HELP {nome} Chamadas externas por resultado (ok ou tipo de erro).")
+            linhas.append(f"# TYPE {nome} counter")
+            for (dependencia, operacao, resultado), n in sorted(self._resultados.items()):
+                linhas.append(f"{nome}{_rotulos(dependencia=dependencia, operacao=operacao, resultado=resultado)} {n}")
+        return "\n".join(linhas) + "\n"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos(**rotulos):
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in rotulos.items()) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _histograma_texto(nome, ajuda, histogramas):
+    linhas = [f"# HELP {nome} {ajuda}", f"# TYPE {nome} histogram"]
+    for (dependencia, operacao), h in sorted(histogramas.items()):
+        for limite, contagem in zip(h.limites, h.contagens):
+            linhas.append(f"{nome}_bucket{_rotulos(dependencia=dependencia, operacao=operacao, le=_numero(limite))} {contagem}")
+        linhas.append(f"{nome}_bucket{_rotulos(dependencia=dependencia, operacao=operacao, le='+Inf')} {h.total}")
+        linhas.append(f"{nome}_sum{_rotulos(dependencia=dependencia, operacao=operacao)} {_numero(h.soma)}")
+        linhas.append(f"{nome}_count{_rotulos(dependencia=dependencia, operacao=operacao)} {h.total}")
+    return linhas
+
+
+registro = Registro()
+
+
+class Medicao:
+    """Devolvida por medir(): quem chama pode informar o tamanho do payload."""
+    def __init__(self):
+        self.tamanho = None
+        self.resultado = "ok"
+
+
+@contextmanager
+def medir(dependencia, operacao):
+    """
+    with medir("groq", "gerar_email") as m:
+        ...
+        m.tamanho = len(texto)
+    Exceções são contadas pelo nome da classe e propagadas.
+    """
+    medicao = Medicao()
+    inicio = time.perf_counter()
+    try:
+        yield medicao
+    except Exception as e:
+        registro.registrar(dependencia, operacao, time.perf_counter() - inicio, type(e).__name__, medicao.tamanho)
+        raise
+    registro.registrar(dependencia, operacao, time.perf_counter() - inicio, medicao.resultado, medicao.tamanho)
+
+
+# --- Directus (gancho do DirectusClient) ---
+
+def operacao_directus(metodo, caminho):
+    return f"{metodo} {RE_ID_CAMINHO.sub('/:id', caminho.split('?', 1)[0])}"
+
+
+def gancho_directus(metodo, caminho, status, duracao, tamanho, erro):
+    if erro is not None:
+        resultado = "timeout" if "Timeout" in type(erro).__name__ else type(erro).__name__
+    elif status >= 500:
+        resultado = "http_5xx"
+    elif status >= 400:
+        resultado = "http_4xx"
+    else:
+        resultado = "ok"
+    registro.registrar("directus", operacao_directus(metodo, caminho), duracao, resultado, tamanho)
+
+
+# --- Exposição ---
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        corpo = registro.texto_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def gravar_arquivo(caminho):
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(registro.texto_prometheus())
+    os.replace(temporario, caminho)
+
+
+def _laco_arquivo(caminho):
+    while True:
+        time.sleep(INTERVALO_ARQUIVO)
+        try:
+            gravar_arquivo(caminho)
+        except OSError:
+            pass
+
+
+_iniciado = False
+_lock_inicio = threading.Lock()
+
+
+def iniciar(processo, porta=None):
+    """
+    Liga o gancho do Directus e a exposição (uma vez por processo; o app chama a
+    cada rerun). Se a porta já estiver em uso, cai para o arquivo.
+    """
+    global _iniciado
+    with _lock_inicio:
+        if _iniciado:
+            return
+        _iniciado = True
+
+    from directus import directus
+    directus.adicionar_gancho(gancho_directus)
+
+    if porta:
+        try:
+            servidor = ThreadingHTTPServer((HOST, int(porta)), _Handler)
+            threading.Thread(target=servidor.serve_forever, daemon=True).start()
+            return
+        except OSError as e:
+            print(f"Métricas: porta {porta} indisponível ({e}); gravando em arquivo.", flush=True)
+    if GRAVAR_ARQUIVO:
+        caminho = caminho_dados(f"metricas_{processo}.prom")
+        threading.Thread(target=_laco_arquivo, args=(caminho,), daemon=True).start()
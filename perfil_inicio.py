@@ -0,0 +1,81 @@
+"""
+Perfil de inicialização do app.py: tempo de import e de primeira renderização por etapa.
+
+Cada sessão grava uma linha em dados/perfil_inicio.jsonl na primeira execução
+do script (a que o usuário espera para ver a tela). Para comparar versões:
+    python perfil_inicio.py
+"""
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from armazenamento import caminho_dados
+
+ARQUIVO = caminho_dados("perfil_inicio.jsonl")
+VERSAO = os.getenv("ELOFLOW_VERSAO", "dev")
+
+# Primeira execução do script neste processo = cold start (imports de verdade)
+_processo_novo = True
+
+
+class PerfilExecucao:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self._ultimo = self.inicio
+        self.etapas = []   # [(nome, segundos)]
+
+    def etapa(self, nome):
+        agora = time.perf_counter()
+        self.etapas.append((nome, agora - self._ultimo))
+        self._ultimo = agora
+
+    def concluir(self, tela, primeira_da_sessao=True):
+        """Fecha a medição; só a primeira execução de cada sessão vai para o arquivo."""
+        global _processo_novo
+        frio = _processo_novo
+        _processo_novo = False
+        if not primeira_da_sessao:
+            return
+        registro = {
+            "quando": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "versao": VERSAO,
+            "tela": tela,
+            "frio": frio,
+            "total_ms": round((time.perf_counter() - self.inicio) * 1000, 1),
+            "etapas": {nome: round(segundos * 1000, 1) for nome, segundos in self.etapas},
+        }
+        try:
+            with open(ARQUIVO, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+
+def resumo(caminho=ARQUIVO):
+    """Mediana (ms) por versão, tela, frio/quente e etapa."""
+    grupos = {}
+    with open(caminho, encoding="utf-8") as f:
+        for linha in f:
+            try:
+                r = json.loads(linha)
+            except ValueError:
+                continue
+            grupo = grupos.setdefault((r['versao'], r['tela'], r['frio']), {})
+            grupo.setdefault("TOTAL", []).append(r['total_ms'])
+            for nome, ms in r['etapas'].items():
+                grupo.setdefault(nome, []).append(ms)
+    return {chave: {nome: (statistics.median(v), len(v)) for nome, v in etapas.items()} for chave, etapas in grupos.items()}
+
+
+if __name__ == "__main__":
+    caminho = sys.argv[1] if len(sys.argv) > 1 else ARQUIVO
+    if not os.path.exists(caminho):
+        print(f"Sem medições em {caminho}.")
+        sys.exit(0)
+    for (versao, tela, frio), etapas in sorted(resumo(caminho).items()):
+        print(f"\n== versão {versao} · tela {tela} · {'frio' if frio else 'quente'} ==")
+        for nome, (mediana, n) in etapas.items():
+            print(f"  {nome:<24} {mediana:>9.1f} ms  (n={n})")
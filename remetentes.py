@@ -0,0 +1,246 @@
+import os
+import random
+import re
+import threading
+import time
+
+import cota
+from directus import directus
+
+# =========================================================
+#  POOL DE CONTAS SMTP (RODÍZIO DA EQUIPE)
+# =========================================================
+# Uma campanha pode sair por várias contas SMTP da equipe ao mesmo tempo.
+# Cada conta tem a sua sessão, o seu intervalo anti-spam e o seu limite
+# diário; o worker distribui os destinatários para a conta que ficar livre
+# primeiro. Se o servidor de uma conta responder com estrangulamento (421,
+# 45x, "too many", limite diário...), a conta descansa (ritmo adaptativo,
+# abaixo) e o destinatário volta para a fila e vai pela próxima.
+#
+# Só entram no rodízio as contas cujo vendedor_email (config_smtp) está em
+# SMTP_POOL_EMAILS: quem administra decide quais caixas podem ser usadas.
+
+CONTAS_EQUIPE = [e.strip().lower() for e in os.getenv("SMTP_POOL_EMAILS", "").split(",") if e.strip()]
+COTA_DIARIA_CONTA = int(os.getenv("SMTP_COTA_CONTA", "150"))
+
+RE_LIMITE_DIARIO = re.compile(r"5\.4\.5|daily (user )?sending (quota|limit)|quota exceeded|limite di[aá]rio", re.IGNORECASE)
+# Só 421 (o servidor fecha a porta para a conta) ou texto explícito de limite
+# de taxa pausam a conta; a queda da conexão também é da conta
+RE_ESTRANGULAMENTO = re.compile(
+    r"^\(?421\b|rate limit|too many (messages|connections|recipients|requests)|sending rate|throttl"
+    r"|connection unexpectedly closed|timed out",
+    re.IGNORECASE,
+)
+# Demais 4xx (greylisting, caixa ocupada ou cheia...) dizem respeito ao destinatário:
+# só ele volta para a fila, mais tarde, e a conta segue no ritmo
+RE_TEMPORARIA_DESTINATARIO = re.compile(r"^\(?4\d\d\b")
+
+# Login recusado: a conta sai do rodízio desta campanha
+RE_CONTA_INDISPONIVEL = re.compile(r"^\(?(530|534|535)\b|authentication (failed|required)|username and password", re.IGNORECASE)
+
+LIMITE_DIARIO = 'limite_diario'
+ESTRANGULAMENTO = 'estrangulamento'
+CONTA_INDISPONIVEL = 'conta_indisponivel'
+DESTINATARIO_TEMPORARIA = 'destinatario_temporaria'
+FALHAS_DA_CONTA = (LIMITE_DIARIO, ESTRANGULAMENTO, CONTA_INDISPONIVEL)
+
+
+def classificar_falha(mensagem):
+    """
+    'limite_diario', 'estrangulamento', 'conta_indisponivel' (falhas da conta),
+    'destinatario_temporaria' (4xx de um endereço) ou None (erro definitivo do destinatário/conteúdo).
+    """
+    texto = str(mensagem or "")
+    if RE_LIMITE_DIARIO.search(texto):
+        return LIMITE_DIARIO
+    if RE_CONTA_INDISPONIVEL.search(texto):
+        return CONTA_INDISPONIVEL
+    if RE_ESTRANGULAMENTO.search(texto):
+        return ESTRANGULAMENTO
+    if RE_TEMPORARIA_DESTINATARIO.search(texto):
+        return DESTINATARIO_TEMPORARIA
+    return None
+
+
+def rodizio_habilitado():
+    return bool(CONTAS_EQUIPE)
+
+
+def contas_equipe(token):
+    """
+    Contas autorizadas para o rodízio, só vendedor_email e smtp_user: a sessão do app
+    nunca recebe a senha das outras caixas (quem resolve a config é o worker, em carregar_pool).
+    """
+    if not CONTAS_EQUIPE:
+        return []
+    params = {"filter[vendedor_email][_in]": ",".join(CONTAS_EQUIPE), "fields": "vendedor_email,smtp_user", "limit": -1}
+    data = directus.listar_itens(token, "config_smtp", params=params) or []
+    return [c for c in data if c.get('smtp_user') and c.get('vendedor_email')]
+
+
+def montar_pool(conf_propria, contas):
+    """A conta do vendedor primeiro, depois as da equipe, sem repetir caixa."""
+    pool = []
+    vistos = set()
+    for conf in [conf_propria] + list(contas):
+        if not conf:
+            continue
+        chave = str(conf['smtp_user']).strip().lower()
+        if chave in vistos:
+            continue
+        vistos.add(chave)
+        pool.append({k: conf.get(k) for k in ('vendedor_email', 'smtp_host', 'smtp_port', 'smtp_user', 'smtp_pass_app', 'assinatura_html')})
+    return pool
+
+
+def vendedores_do_pool(pool):
+    """O que a fila guarda de cada conta: só o vendedor_email, nunca a senha."""
+    return [conf['vendedor_email'] for conf in pool if conf.get('vendedor_email')]
+
+
+def carregar_pool(token, vendedores):
+    """config_smtp das contas da campanha, lidas do Directus na hora do envio, na ordem gravada."""
+    if not vendedores:
+        return []
+    params = {"filter[vendedor_email][_in]": ",".join(vendedores), "limit": -1}
+    data = directus.listar_itens(token, "config_smtp", params=params) or []
+    por_vendedor = {str(c.get('vendedor_email')).strip().lower(): c for c in data if c.get('smtp_pass_app') and c.get('smtp_user')}
+    return montar_pool(None, [por_vendedor[v.strip().lower()] for v in vendedores if v.strip().lower() in por_vendedor])
+
+
+# =========================================================
+#  RITMO ADAPTATIVO (INTERVALO ENTRE ENVIOS POR CONTA)
+# =========================================================
+# Em vez de sortear sempre entre o mínimo e o máximo da campanha, o intervalo
+# começa no meio da faixa e acompanha o servidor:
+#   - envio aceito e rápido: o intervalo cai ALIVIO por vez, até o piso
+#     (intervalo mínimo da campanha ou SMTP_RITMO_PISO);
+#   - resposta lenta (SMTP_RESPOSTA_LENTA_SEG): sobe um pouco, sem pausar;
+#   - falha temporária da conta (421, limite de taxa, queda da conexão): o intervalo dobra
+#     (até SMTP_RITMO_TETO) e a conta pausa com backoff exponencial
+#     (SMTP_PAUSA_BASE_SEG, dobrando até SMTP_PAUSA_SEG).
+# O ritmo é guardado por conta no processo do worker: campanhas seguidas (ou
+# simultâneas) pela mesma caixa partem do que já foi aprendido e dividem o
+# mesmo relógio. Cada envio pega a sua vez com reservar_vez(), que lê a espera
+# e empurra o relógio sob o mesmo lock: duas threads nunca saem juntas. Uma variação aleatória de ±VARIACAO evita intervalos robóticos,
+# aplicada antes do piso: o intervalo real nunca fica abaixo dele.
+
+PISO_RITMO = int(os.getenv("SMTP_RITMO_PISO", "0")) or None
+TETO_RITMO = int(os.getenv("SMTP_RITMO_TETO", "600"))
+PAUSA_BASE = int(os.getenv("SMTP_PAUSA_BASE_SEG", "60"))
+PAUSA_MAXIMA = int(os.getenv("SMTP_PAUSA_SEG", "900"))
+RESPOSTA_LENTA = float(os.getenv("SMTP_RESPOSTA_LENTA_SEG", "8"))
+ALIVIO = 0.85
+FREIO_LENTO = 1.25
+VARIACAO = 0.15
+
+
+def _intervalo(segundos, piso):
+    return max(segundos * random.uniform(1 - VARIACAO, 1 + VARIACAO), piso)
+
+
+class RitmoEnvio:
+    def __init__(self, atraso_inicial):
+        self.atraso = float(atraso_inicial)
+        self.falhas_seguidas = 0
+        self._livre_em = 0.0        # time.monotonic()
+        self._lock = threading.Lock()
+
+    def reservar_vez(self, segundos=None, piso=0):
+        """
+        Pega a próxima vez de envio da caixa. Retorna quanto esperar (s) até ela; o
+        relógio já avança `segundos` (padrão: o intervalo atual) a partir dessa vez.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            vez = max(self._livre_em, agora)
+            self._livre_em = vez + _intervalo(self.atraso if segundos is None else segundos, piso)
+            return vez - agora
+
+    def _adiar(self, segundos, piso):
+        # Só com o lock na mão: depois de um envio ou falha, a próxima vez conta a partir de agora
+        self._livre_em = max(self._livre_em, time.monotonic() + _intervalo(segundos, piso))
+
+    def aguardar_intervalo(self, piso):
+        """Próximo envio só depois do intervalo atual, sem mexer no ritmo."""
+        with self._lock:
+            self._adiar(self.atraso, piso)
+
+    def sucesso(self, duracao, piso):
+        with self._lock:
+            self.falhas_seguidas = 0
+            if duracao > RESPOSTA_LENTA:
+                self.atraso = min(self.atraso * FREIO_LENTO, TETO_RITMO)
+            else:
+                self.atraso = max(self.atraso * ALIVIO, piso)
+            self._adiar(self.atraso, piso)
+
+    def falha_temporaria(self, piso=0):
+        """Dobra o intervalo e pausa com backoff exponencial. Retorna a espera até o próximo envio (s)."""
+        with self._lock:
+            self.falhas_seguidas += 1
+            self.atraso = min(self.atraso * 2, TETO_RITMO)
+            pausa = max(min(PAUSA_BASE * 2 ** (self.falhas_seguidas - 1), PAUSA_MAXIMA), self.atraso)
+            self._adiar(pausa, piso)
+            return pausa
+
+
+_ritmos = {}
+_lock_ritmos = threading.Lock()
+
+
+def ritmo_da_conta(chave, atraso_inicial):
+    with _lock_ritmos:
+        if chave not in _ritmos:
+            _ritmos[chave] = RitmoEnvio(atraso_inicial)
+        return _ritmos[chave]
+
+
+class ContaEnvio:
+    """Uma conta do pool durante uma campanha: sessão, ritmo e estado próprios."""
+
+    def __init__(self, conf, intervalo, limite_diario=COTA_DIARIA_CONTA):
+        self.conf = conf
+        self.chave = str(conf['smtp_user']).strip().lower()
+        self.piso = PISO_RITMO or intervalo[0]
+        self.limite_diario = limite_diario
+        # Só o worker abre sessão: o app importa este módulo sem carregar smtplib/ssl
+        from sessao_smtp import SessaoSMTP
+        self.sessao = SessaoSMTP(conf)
+        self.ritmo = ritmo_da_conta(self.chave, (intervalo[0] + intervalo[1]) / 2)
+        self.modelo = None          # MensagemCampanha com o From desta conta
+        self.esgotada = False       # limite diário ou login recusado: sai do rodízio
+
+    def reservar_vez(self):
+        return self.ritmo.reservar_vez(piso=self.piso)
+
+    def agendar_proximo(self):
+        self.ritmo.aguardar_intervalo(self.piso)
+
+    def registrar_envio(self, duracao, aceito):
+        """aceito=False: recusa do destinatário (endereço/conteúdo), não do servidor; o ritmo não acelera."""
+        if aceito:
+            self.ritmo.sucesso(duracao, self.piso)
+        else:
+            self.ritmo.aguardar_intervalo(self.piso)
+
+    def reservar(self, n):
+        if cota.reservar_conta(self.chave, n, self.limite_diario):
+            return True
+        self.esgotada = True
+        return False
+
+    def liberar(self, n):
+        cota.liberar_conta(self.chave, n)
+
+    def registrar_falha(self, tipo):
+        """Falha da conta (não do destinatário). Retorna a pausa aplicada (s) ou None."""
+        if tipo in (LIMITE_DIARIO, CONTA_INDISPONIVEL):
+            self.esgotada = True
+            return None
+        # A conexão pode estar marcada pelo servidor: a próxima tentativa abre outra
+        self.sessao.fechar()
+        return self.ritmo.falha_temporaria(self.piso)
+
+    def fechar(self):
+        self.sessao.fechar()
@@ -0,0 +1,125 @@
+import smtplib
+import time
+
+from metricas import medir
+
+# =========================================================
+#  SESSÃO SMTP REAPROVEITÁVEL
+# =========================================================
+# Antes cada e-mail pagava connect + STARTTLS + login + quit. Uma sessão
+# fica aberta durante a campanha inteira; antes de cada envio um NOOP
+# confirma que o servidor não derrubou a conexão no intervalo anti-spam.
+# Se ela cair no meio da transação, só se tenta de novo quando a mensagem
+# ainda não tinha começado a ir (antes do DATA): depois disso o servidor
+# pode ter aceitado o e-mail sem conseguir responder, e reenviar duplicaria.
+
+TIMEOUT_SMTP = 30
+
+
+# Sem o texto original ("connection unexpectedly closed", "timed out"): o worker
+# trataria como falha da conta e poria o destinatário de volta na fila
+MENSAGEM_INCERTO = "Conexão perdida depois do DATA: o e-mail pode ter sido entregue, não foi reenviado"
+
+
+class EnvioIncerto(smtplib.SMTPException):
+    """A conexão caiu depois do DATA: o e-mail pode ter sido entregue. Não reenviar."""
+
+
+class _ConexaoSMTP(smtplib.SMTP):
+    # Marcado antes do DATA; zerado a cada envio em SessaoSMTP.enviar
+    dados_iniciados = False
+
+    def data(self, msg):
+        self.dados_iniciados = True
+        return super().data(msg)
+
+
+class SessaoSMTP:
+    def __init__(self, conf_smtp, timeout=TIMEOUT_SMTP):
+        self.conf = conf_smtp
+        self.timeout = timeout
+        self._server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def _conectar(self):
+        with medir("smtp", "conectar"):
+            server = _ConexaoSMTP(self.conf['smtp_host'], self.conf['smtp_port'], timeout=self.timeout)
+        try:
+            with medir("smtp", "starttls"):
+                server.starttls()
+            with medir("smtp", "login"):
+                server.login(self.conf['smtp_user'], self.conf['smtp_pass_app'])
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+
+    def _descartar(self):
+        if self._server is not None:
+            try:
+                self._server.close()
+            except Exception:
+                pass
+        self._server = None
+
+    def _garantir_conexao(self):
+        if self._server is not None:
+            try:
+                with medir("smtp", "noop"):
+                    codigo, _ = self._server.noop()
+                if codigo == 250:
+                    return
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._descartar()
+        self._conectar()
+
+    def enviar(self, remetente, destinatarios, mensagem):
+        """
+        Envia numa única transação (MAIL FROM / vários RCPT TO / DATA).
+        Retorna o dict de recusados do smtplib ({email: (codigo, resposta)}).
+        """
+        for tentativa in range(2):
+            self._garantir_conexao()
+            server = self._server
+            server.dados_iniciados = False
+            try:
+                with medir("smtp", "enviar") as medicao:
+                    medicao.tamanho = len(mensagem)
+                    return server.sendmail(remetente, destinatarios, mensagem)
+            except smtplib.SMTPServerDisconnected as e:
+                self._descartar()
+                if server.dados_iniciados:
+                    raise EnvioIncerto(MENSAGEM_INCERTO) from e
+                # Caiu antes do DATA (MAIL FROM / RCPT TO): nada foi entregue, reconecta e tenta uma vez mais
+                if tentativa == 1:
+                    raise
+                time.sleep(1)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+                # Servidor respondeu; a sessão continua válida (RSET para limpar a transação)
+                try:
+                    self._server.rset()
+                except Exception:
+                    self._descartar()
+                raise
+            except Exception as e:
+                self._descartar()
+                if server.dados_iniciados and not isinstance(e, smtplib.SMTPResponseException):
+                    # Timeout ou erro de socket sem resposta do servidor depois do DATA
+                    raise EnvioIncerto(MENSAGEM_INCERTO) from e
+                raise
+
+    def fechar(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+        self._server = None
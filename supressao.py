@@ -0,0 +1,258 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from datetime import datetime, timedelta
+
+from armazenamento import caminho_dados
+from directus import directus
+
+# =========================================================
+#  ÍNDICE DE SUPRESSÃO (QUEM NÃO DEVE RECEBER)
+# =========================================================
+# Conjunto de e-mails normalizados, guardados como hash, que a campanha
+# externa não deve atingir: descadastros (opt-out, permanentes) e envios
+# recentes (janela de SUPRESSAO_DIAS). Fica num SQLite compartilhado entre o
+# app e o worker; cada processo mantém uma cópia em memória e só lê as linhas
+# novas (rowid maior que o último lido), então cada consulta é O(1).
+# Os e-mails da carteira vêm do IndiceClientes já carregado na sessão.
+
+DB_PATH = caminho_dados("supressao.db")
+JANELA_ENVIOS = int(os.getenv("SUPRESSAO_DIAS", "30")) * 24 * 3600
+INTERVALO_ATUALIZACAO = 5
+INTERVALO_SINCRONIZACAO = int(os.getenv("SUPRESSAO_SINCRONIZACAO_SEG", "600"))
+
+OPTOUT = 'optout'
+ENVIO = 'envio'
+MOTIVOS = {
+    'duplicado': "repetidos na lista",
+    'carteira': "já são clientes da carteira",
+    ENVIO: "receberam e-mail recentemente",
+    OPTOUT: "pediram para não receber",
+}
+
+RE_EMAIL_LOG = re.compile(r"(?:Lead|Para):\s*(\S+@\S+)")
+
+_tabelas_ok = False
+
+
+def conectar():
+    global _tabelas_ok
+    con = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    con.execute("PRAGMA busy_timeout=30000")
+    if not _tabelas_ok:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript("""
+            CREATE TABLE IF NOT EXISTS supressao (
+                hash TEXT NOT NULL,
+                origem TEXT NOT NULL,
+                registrado_em REAL NOT NULL,
+                PRIMARY KEY (hash, origem)
+            );
+            CREATE TABLE IF NOT EXISTS sincronizacao (
+                chave TEXT PRIMARY KEY,
+                valor TEXT
+            );
+        """)
+        _tabelas_ok = True
+    return con
+
+
+def normalizar(email):
+    return str(email).strip().lower()
+
+
+def hash_email(email):
+    return hashlib.sha256(normalizar(email).encode("utf-8")).hexdigest()[:32]
+
+
+class IndiceSupressao:
+    def __init__(self):
+        self.versao = 0
+        self._optout = set()
+        self._envios = {}            # hash -> momento do último envio
+        self._ultimo_rowid = 0
+        self._atualizado_em = 0.0
+        self._lock = threading.Lock()
+
+    def atualizar(self, forcar=False):
+        """Lê só as linhas novas do SQLite (no máximo a cada INTERVALO_ATUALIZACAO)."""
+        with self._lock:
+            if not forcar and time.monotonic() - self._atualizado_em < INTERVALO_ATUALIZACAO:
+                return
+            self._atualizado_em = time.monotonic()
+            con = conectar()
+            try:
+                rows = con.execute(
+                    "SELECT rowid, hash, origem, registrado_em FROM supressao WHERE rowid > ? ORDER BY rowid",
+                    (self._ultimo_rowid,),
+                ).fetchall()
+            finally:
+                con.close()
+            for rowid, hash_, origem, registrado_em in rows:
+                if origem == OPTOUT:
+                    self._optout.add(hash_)
+                elif registrado_em > self._envios.get(hash_, 0):
+                    self._envios[hash_] = registrado_em
+                self._ultimo_rowid = rowid
+            if rows:
+                self.versao += 1
+
+    def motivo(self, email, incluir_envios=True, hash_=None):
+        """'optout', 'envio' (recente) ou None."""
+        hash_ = hash_ or hash_email(email)
+        if hash_ in self._optout:
+            return OPTOUT
+        if incluir_envios and time.time() - self._envios.get(hash_, 0) < JANELA_ENVIOS:
+            return ENVIO
+        return None
+
+    def total_optout(self):
+        return len(self._optout)
+
+
+indice = IndiceSupressao()
+
+
+def _registrar(emails, origem, momento=None):
+    agora = time.time()
+    linhas = [(hash_email(e), origem, momento.get(e, agora) if momento else agora) for e in emails if e and "@" in str(e)]
+    if not linhas:
+        return 0
+    con = conectar()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        # REPLACE gera rowid novo: os outros processos enxergam a atualização
+        con.executemany("INSERT OR REPLACE INTO supressao (hash, origem, registrado_em) VALUES (?, ?, ?)", linhas)
+        con.execute("DELETE FROM supressao WHERE origem = ? AND registrado_em < ?", (ENVIO, agora - JANELA_ENVIOS))
+        con.execute("COMMIT")
+    finally:
+        con.close()
+    indice.atualizar(forcar=True)
+    return len(linhas)
+
+
+def registrar_envios(emails):
+    return _registrar(emails, ENVIO)
+
+
+def adicionar_optout(emails):
+    return _registrar(emails, OPTOUT)
+
+
+# --- Histórico do Directus (envios feitos antes deste índice ou por outra instância) ---
+
+_ultima_sincronizacao = 0.0
+_lock_sincronizacao = threading.Lock()
+
+
+def sincronizar_historico(token):
+    """Traz do historico_envios os envios com sucesso desde a última sincronização."""
+    con = conectar()
+    try:
+        row = con.execute("SELECT valor FROM sincronizacao WHERE chave = 'historico_envios'").fetchone()
+    finally:
+        con.close()
+    desde = row[0] if row else (datetime.now() - timedelta(seconds=JANELA_ENVIOS)).strftime("%Y-%m-%d %H:%M:%S")
+
+    params = {
+        "filter[data_envio][_gt]": desde,
+        "filter[status_envio][_starts_with]": "Enviado",
+        "fields": "corpo_email,data_envio",
+        "sort": "data_envio",
+        "limit": -1,
+    }
+    data = directus.listar_itens(token, "historico_envios", params=params)
+    if data is None:
+        return
+
+    momentos = {}
+    ultimo = desde
+    for item in data:
+        achado = RE_EMAIL_LOG.search(item.get('corpo_email') or "")
+        data_envio = str(item.get('data_envio') or "")
+        if achado:
+            try:
+                momento = datetime.fromisoformat(data_envio.replace("T", " ")[:19]).timestamp()
+            except ValueError:
+                momento = time.time()
+            momentos[achado.group(1)] = max(momento, momentos.get(achado.group(1), 0))
+        if data_envio > ultimo:
+            ultimo = data_envio
+    if momentos:
+        _registrar(list(momentos), ENVIO, momento=momentos)
+
+    con = conectar()
+    try:
+        con.execute("INSERT OR REPLACE INTO sincronizacao (chave, valor) VALUES ('historico_envios', ?)", (ultimo,))
+    finally:
+        con.close()
+
+
+def sincronizar_em_fundo(token):
+    global _ultima_sincronizacao
+    with _lock_sincronizacao:
+        agora = time.monotonic()
+        if _ultima_sincronizacao and agora - _ultima_sincronizacao < INTERVALO_SINCRONIZACAO:
+            return
+        _ultima_sincronizacao = agora
+
+    def rodar():
+        try:
+            sincronizar_historico(token)
+        except Exception:
+            pass
+
+    threading.Thread(target=rodar, daemon=True).start()
+
+
+# --- Filtro da lista de leads ---
+
+_filtros = {}      # id(df) -> (weakref(df), chave, resultado)
+_lock_filtros = threading.Lock()
+
+
+def filtrar_leads(df, indice_clientes=None):
+    """
+    Tira da lista os e-mails repetidos, da carteira, com envio recente ou em opt-out.
+    Retorna (df_filtrado, {motivo: quantidade}). Memorizado por lista e versões dos índices.
+    """
+    indice.atualizar()
+    versao_carteira = indice_clientes.versao if indice_clientes is not None else None
+    chave = (indice.versao, versao_carteira, len(df))
+    with _lock_filtros:
+        memorizado = _filtros.get(id(df))
+        if memorizado is not None and memorizado[0]() is df and memorizado[1] == chave:
+            return memorizado[2]
+
+    contagem = {motivo: 0 for motivo in MOTIVOS}
+    manter = []
+    vistos = set()
+    for email in df['Email'].tolist():
+        normalizado = normalizar(email)
+        if normalizado in vistos:
+            contagem['duplicado'] += 1
+            manter.append(False)
+            continue
+        vistos.add(normalizado)
+        if indice_clientes is not None and indice_clientes.tem_email(normalizado):
+            contagem['carteira'] += 1
+            manter.append(False)
+            continue
+        motivo = indice.motivo(normalizado)
+        if motivo:
+            contagem[motivo] += 1
+            manter.append(False)
+            continue
+        manter.append(True)
+
+    resultado = (df[manter] if not all(manter) else df), contagem
+    with _lock_filtros:
+        # Listas que já foram coletadas pelo GC saem do memo
+        for chave_id in [k for k, v in _filtros.items() if v[0]() is None]:
+            del _filtros[chave_id]
+        _filtros[id(df)] = (weakref.ref(df), chave, resultado)
+    return resultado
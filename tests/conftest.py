@@ -0,0 +1,13 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+# Os módulos abrem os SQLite e arquivos em caminho_dados() já na importação:
+# os testes nunca tocam a pasta dados/ de verdade
+DADOS_TESTES = tempfile.mkdtemp(prefix="eloflow-testes-")
+os.environ["ELOFLOW_DADOS_DIR"] = DADOS_TESTES
+atexit.register(shutil.rmtree, DADOS_TESTES, True)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from cache import CacheTTL
+
+
+def esperar(condicao, limite=2.0):
+    fim = time.monotonic() + limite
+    while not condicao() and time.monotonic() < fim:
+        time.sleep(0.01)
+    return condicao()
+
+
+def test_primeira_carga_uma_vez_so_entre_sessoes():
+    cache = CacheTTL(ttl=60)
+    cargas = []
+
+    def carregar():
+        cargas.append(1)
+        time.sleep(0.05)
+        return "carteira"
+
+    resultados = []
+    threads = [threading.Thread(target=lambda: resultados.append(cache.obter("a", carregar))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert resultados == ["carteira"] * 8
+    assert len(cargas) == 1
+    # O lock da primeira carga não fica para trás
+    assert cache._locks_carga == {}
+
+
+def test_vencido_serve_o_antigo_e_recarrega_em_fundo():
+    cache = CacheTTL(ttl=0)
+    cache.obter("a", lambda: "v1")
+
+    assert cache.obter("a", lambda: "v1", recarregar=lambda: "v2") == "v1"
+    assert esperar(lambda: cache._dados["a"][0] == "v2")
+
+
+def test_versao_nova_recarrega_em_fundo():
+    cache = CacheTTL(ttl=60)
+    cache.obter("a", lambda: "v1", versao=1)
+    assert cache.obter("a", lambda: "v2", versao=1) == "v1"
+
+    assert cache.obter("a", lambda: "v2", versao=2) == "v1"
+    assert esperar(lambda: cache._dados["a"][0] == "v2")
+    assert cache.obter("a", lambda: "v3", versao=2) == "v2"
+
+
+def test_falha_de_carga_nao_fica_guardada():
+    cache = CacheTTL(ttl=60)
+    assert cache.obter("a", lambda: None) is None
+    assert cache.obter("a", lambda: "ok") == "ok"
+    assert cache._locks_carga == {}
+
+
+def test_invalidar_onde_so_derruba_as_chaves_afetadas():
+    cache = CacheTTL(ttl=60)
+    cache.obter("ana", lambda: {1, 2})
+    cache.obter("bia", lambda: {3})
+
+    cache.invalidar_onde(lambda ids: 2 in ids)
+
+    assert "ana" not in cache._dados
+    assert "bia" in cache._dados
+
+
+def test_invalidar_durante_a_carga_descarta_o_valor_antigo():
+    cache = CacheTTL(ttl=60)
+
+    def carregar():
+        # Alguém grava e invalida enquanto a carga ainda estava no ar
+        cache.invalidar("a")
+        return "antes da gravação"
+
+    assert cache.obter("a", carregar) == "antes da gravação"
+    assert "a" not in cache._dados
+    assert cache.obter("a", lambda: "depois") == "depois"
@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+import cota
+
+
+@pytest.fixture(autouse=True)
+def cota_nova(tmp_path, monkeypatch):
+    monkeypatch.setattr(cota, "DB_PATH", str(tmp_path / "cota.db"))
+    monkeypatch.setattr(cota, "_tabela_ok", False)
+    monkeypatch.setattr(cota, "COTA_DIARIA", 10)
+
+
+def test_reservar_ate_a_cota():
+    assert cota.reservar(6)
+    assert cota.reservar(4)
+    assert not cota.reservar(1)
+    assert cota.usados_hoje() == 10
+    assert cota.saldo_hoje() == 0
+
+
+def test_reserva_que_nao_cabe_nao_reserva_nada():
+    assert cota.reservar(8)
+    assert not cota.reservar(3)
+    assert cota.usados_hoje() == 8
+
+
+def test_reservas_simultaneas_nao_estouram_a_cota():
+    aceitas = []
+
+    def disparar():
+        for _ in range(5):
+            if cota.reservar(1):
+                aceitas.append(1)
+
+    threads = [threading.Thread(target=disparar) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(aceitas) == 10
+    assert cota.usados_hoje() == 10
+
+
+def test_liberar_devolve_fichas_sem_ficar_negativo():
+    cota.reservar(5)
+    cota.liberar(2)
+    assert cota.usados_hoje() == 3
+    cota.liberar(10)
+    assert cota.usados_hoje() == 0
+    cota.liberar(0)
+    assert cota.usados_hoje() == 0
+
+
+def test_cota_por_conta_independente():
+    assert cota.reservar_conta("ana@x.com", 3, limite=3)
+    assert not cota.reservar_conta("ana@x.com", 1, limite=3)
+    assert cota.reservar_conta("bia@x.com", 3, limite=3)
+
+    cota.liberar_conta("ana@x.com", 1)
+    assert cota.reservar_conta("ana@x.com", 1, limite=3)
+    assert not cota.reservar_conta("ana@x.com", 1, limite=3)
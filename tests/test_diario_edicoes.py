@@ -0,0 +1,36 @@
+from diario_edicoes import DiarioEdicoes, montar_lote
+
+
+def test_pendentes_junta_edicoes_do_mesmo_cliente():
+    diario = DiarioEdicoes("editor-1")
+    edicoes = [(1, "status_prospect", "Contato Feito"), (1, "tentativa_1", "10/05"), (2, "status_prospect", "Frio")]
+
+    assert diario.pendentes(edicoes) == {
+        1: {"status_prospect": "Contato Feito", "tentativa_1": "10/05"},
+        2: {"status_prospect": "Frio"},
+    }
+
+
+def test_edicao_ja_gravada_nao_volta_no_proximo_rerun():
+    diario = DiarioEdicoes("editor-1")
+    edicoes = [(1, "status_prospect", "Contato Feito")]
+    diario.marcar_gravados(diario.pendentes(edicoes))
+
+    # O data_editor devolve as mesmas edições a cada interação
+    assert diario.pendentes(edicoes) == {}
+    # Mudou de novo: passa
+    assert diario.pendentes([(1, "status_prospect", "Frio")]) == {1: {"status_prospect": "Frio"}}
+
+
+def test_montar_lote_mesmos_dados_usa_keys():
+    lote = montar_lote({1: {"status_prospect": "Frio"}, 2: {"status_prospect": "Frio"}})
+    assert lote == {"keys": [1, 2], "data": {"status_prospect": "Frio"}}
+
+
+def test_montar_lote_dados_diferentes_manda_itens_com_id():
+    lote = montar_lote({1: {"status_prospect": "Frio"}, 2: {"tentativa_1": "10/05"}})
+    assert lote == [{"status_prospect": "Frio", "id": 1}, {"tentativa_1": "10/05", "id": 2}]
+
+
+def test_montar_lote_um_cliente():
+    assert montar_lote({7: {"status_prospect": "Frio"}}) == {"keys": [7], "data": {"status_prospect": "Frio"}}
@@ -0,0 +1,53 @@
+import pandas as pd
+
+from emails import corrigir_dominio, enderecos_validos, normalizar_emails, tem_email_valido
+
+
+def test_limpa_divide_e_corrige():
+    valores = pd.Series(
+        [" Ana@Empresa.com.br ", "joao@gmial.com; maria@hotmail.con", "sem email", None, "x@y.com, X@Y.com"],
+        index=[10, 11, 12, 13, 14],
+    )
+
+    validos, relatorio = normalizar_emails(valores)
+
+    assert validos['email'].tolist() == ["ana@empresa.com.br", "joao@gmail.com", "maria@hotmail.com", "x@y.com"]
+    assert validos.index.tolist() == [10, 11, 11, 14]
+    assert validos['corrigido'].tolist() == [False, True, True, False]
+    assert relatorio == {'celulas': 4, 'validos': 4, 'corrigidos': 2, 'rejeitados': 1, 'divididos': 1}
+
+
+def test_valores_repetidos_dao_o_mesmo_resultado_em_cada_celula():
+    valores = pd.Series(["a@gmai.com", "", "a@gmai.com", "b@x.com", "a@gmai.com"])
+
+    validos, relatorio = normalizar_emails(valores)
+
+    assert validos['email'].tolist() == ["a@gmail.com", "a@gmail.com", "b@x.com", "a@gmail.com"]
+    assert validos.index.tolist() == [0, 2, 3, 4]
+    assert relatorio['celulas'] == 4
+    assert relatorio['corrigidos'] == 3
+
+
+def test_malformados_sao_rejeitados():
+    validos, relatorio = normalizar_emails(pd.Series(["a@b", "@x.com", "a b c", "nan", "-"]))
+    assert validos.empty
+    assert relatorio['rejeitados'] == 3
+
+
+def test_lista_vazia():
+    validos, relatorio = normalizar_emails(pd.Series([], dtype=object))
+    assert validos.empty
+    assert relatorio['celulas'] == 0
+
+
+def test_corrigir_dominio():
+    assert corrigir_dominio("gmial.com") == "gmail.com"
+    assert corrigir_dominio("empresa.con") == "empresa.com"
+    assert corrigir_dominio("empresa.combr") == "empresa.com.br"
+    assert corrigir_dominio("empresa.com.br") == "empresa.com.br"
+
+
+def test_atalhos_por_celula():
+    assert enderecos_validos("mailto:Ana@Gmail.com; ana@gmail.com") == ["ana@gmail.com"]
+    mascara = tem_email_valido(pd.Series(["a@x.com", "lixo"], index=["p", "q"]))
+    assert mascara.to_dict() == {"p": True, "q": False}
@@ -0,0 +1,59 @@
+import pandas as pd
+
+from clientes import IndiceClientes
+
+
+def carteira():
+    return pd.DataFrame({
+        'id': [1, 2, 3, 4],
+        'pj_id': ['10', '20', '30', '40'],
+        'label_select': ['Alfa', 'Beta', 'Gama', 'Delta'],
+        'Categoria_Cliente': ['Ativo', 'Inativo', 'Ativo', 'Frio'],
+        'area_atuacao': ['Saúde', 'Varejo', 'Varejo', None],
+        'emails_validos': [['a@alfa.com'], [], ['g@gama.com', 'compras@gama.com'], []],
+    })
+
+
+def test_filtrar_sem_filtro_devolve_a_carteira():
+    indice = IndiceClientes(carteira())
+    assert indice.filtrar() is indice.df
+    assert indice.filtrar([], []) is indice.df
+
+
+def test_filtrar_por_status_e_area():
+    indice = IndiceClientes(carteira())
+
+    assert indice.filtrar(status=['Ativo'])['id'].tolist() == [1, 3]
+    assert indice.filtrar(areas=['Varejo'])['id'].tolist() == [2, 3]
+    assert indice.filtrar(status=['Ativo'], areas=['Varejo'])['id'].tolist() == [3]
+    assert indice.filtrar(status=['Ativo', 'Frio'])['id'].tolist() == [1, 3, 4]
+    assert indice.opcoes_area == ['Saúde', 'Varejo']
+
+
+def test_filtrar_valor_desconhecido_nao_traz_nada():
+    indice = IndiceClientes(carteira())
+    assert indice.filtrar(status=['Não existe']).empty
+
+
+def test_filtrar_memoriza_sem_depender_da_ordem_da_selecao():
+    indice = IndiceClientes(carteira())
+    primeiro = indice.filtrar(status=['Ativo', 'Frio'])
+    assert indice.filtrar(status=['Frio', 'Ativo']) is primeiro
+
+
+def test_opcoes_e_buscas_por_id():
+    indice = IndiceClientes(carteira())
+
+    assert indice.opcoes_status == ['Ativo', 'Frio', 'Inativo']
+    assert indice.oportunidades == 2
+    assert 3 in indice and 9 not in indice
+    assert indice.linha(3)['label_select'] == 'Gama'
+    assert indice.por_pj(20) == [2]
+    assert indice.tem_email(' Compras@Gama.com ')
+    assert indice.por_email('a@alfa.com') == [1]
+
+
+def test_carteira_vazia():
+    indice = IndiceClientes(pd.DataFrame())
+    assert indice.filtrar(status=['Ativo']).empty
+    assert 1 not in indice
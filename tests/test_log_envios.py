@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+import log_envios
+from log_envios import EscritorLog
+
+
+class Resposta:
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+
+
+class DirectusGravador:
+    """Registra cada POST; `status` decide a resposta (lote ou item avulso)."""
+
+    def __init__(self, status=200):
+        self.status = status
+        self.chamadas = []
+
+    def criar_item(self, token, colecao, payload):
+        self.chamadas.append((token, payload))
+        status = self.status(payload) if callable(self.status) else self.status
+        return Resposta(status, "invalido" if status == 400 else "")
+
+
+@pytest.fixture
+def directus_falso(monkeypatch):
+    falso = DirectusGravador()
+    monkeypatch.setattr(log_envios, "directus", falso)
+    return falso
+
+
+def novo_escritor(tmp_path):
+    # Intervalo longo: quem descarrega é o teste, não a thread
+    return EscritorLog(str(tmp_path / "historico.wal"), tamanho_lote=100, intervalo=3600)
+
+
+def linhas_do_arquivo(escritor):
+    with open(escritor.caminho, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f]
+
+
+def test_registro_vai_para_o_arquivo_sem_o_token(tmp_path, directus_falso):
+    escritor = novo_escritor(tmp_path)
+    escritor.registrar("token-ana", {"assunto_gerado": "Oi"})
+
+    linhas = linhas_do_arquivo(escritor)
+    assert [l["payload"] for l in linhas] == [{"assunto_gerado": "Oi"}]
+    assert "token" not in linhas[0]
+
+
+def test_descarregar_grava_em_lote_e_compacta(tmp_path, directus_falso):
+    escritor = novo_escritor(tmp_path)
+    escritor.registrar("token-ana", {"n": 1})
+    escritor.registrar("token-ana", {"n": 2})
+
+    assert escritor.descarregar()
+    assert directus_falso.chamadas == [("token-ana", [{"n": 1}, {"n": 2}])]
+    assert linhas_do_arquivo(escritor) == []
+    assert escritor.pendentes() == 0
+
+
+def test_falha_do_directus_mantem_no_arquivo(tmp_path, directus_falso):
+    directus_falso.status = 503
+    escritor = novo_escritor(tmp_path)
+    escritor.registrar("token-ana", {"n": 1})
+
+    assert not escritor.descarregar()
+    assert len(linhas_do_arquivo(escritor)) == 1
+    assert escritor.pendentes() == 1
+
+
+def test_recuperadas_esperam_o_token_de_servico(tmp_path, directus_falso):
+    anterior = novo_escritor(tmp_path)
+    directus_falso.status = 503
+    anterior.registrar("token-ana", {"n": 1})
+
+    # Processo novo: o arquivo sobrou e o token da Ana não existe mais
+    directus_falso.status = 200
+    escritor = novo_escritor(tmp_path)
+    escritor.registrar("token-bia", {"n": 2})
+    assert escritor.recuperar() == 1
+
+    assert not escritor.descarregar()
+    # A entrada recuperada nunca sai com o token de outro usuário
+    assert directus_falso.chamadas == [("token-bia", [{"n": 2}])]
+    assert [l["payload"] for l in linhas_do_arquivo(escritor)] == [{"n": 1}]
+
+    escritor.token_padrao = "token-servico"
+    assert escritor.descarregar()
+    assert directus_falso.chamadas[-1] == ("token-servico", [{"n": 1}])
+    assert linhas_do_arquivo(escritor) == []
+
+
+def test_linha_cortada_por_queda_e_ignorada(tmp_path, directus_falso):
+    escritor = novo_escritor(tmp_path)
+    with open(escritor.caminho, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "a", "payload": {"n": 1}}) + "\n")
+        f.write('{"id": "b", "payl')
+
+    assert escritor.recuperar() == 1
+
+
+def test_item_invalido_nao_derruba_o_lote(tmp_path, directus_falso):
+    directus_falso.status = lambda payload: 400 if isinstance(payload, list) or payload.get("n") == 2 else 200
+    escritor = novo_escritor(tmp_path)
+    escritor.token_padrao = "token-servico"
+    for n in (1, 2, 3):
+        escritor.registrar(None, {"n": n})
+
+    assert escritor.descarregar()
+    gravados_um_a_um = [payload for _, payload in directus_falso.chamadas if not isinstance(payload, list)]
+    assert gravados_um_a_um == [{"n": 1}, {"n": 2}, {"n": 3}]
+    assert linhas_do_arquivo(escritor) == []
@@ -0,0 +1,52 @@
+import pytest
+
+import remetentes
+from remetentes import (
+    CONTA_INDISPONIVEL, DESTINATARIO_TEMPORARIA, ESTRANGULAMENTO, LIMITE_DIARIO,
+    classificar_falha, montar_pool, vendedores_do_pool,
+)
+
+
+@pytest.mark.parametrize("mensagem, tipo", [
+    ("(421, b'4.7.0 Try again later, closing connection')", ESTRANGULAMENTO),
+    ("421 Service not available", ESTRANGULAMENTO),
+    ("(451, b'4.7.1 Rate limit exceeded')", ESTRANGULAMENTO),
+    ("(452, b'Too many recipients')", ESTRANGULAMENTO),
+    ("Connection unexpectedly closed", ESTRANGULAMENTO),
+    ("timed out", ESTRANGULAMENTO),
+    ("(450, b'4.2.0 Greylisted, please try again')", DESTINATARIO_TEMPORARIA),
+    ("(452, b'4.2.2 Mailbox full')", DESTINATARIO_TEMPORARIA),
+    ("(550, b'5.4.5 Daily user sending quota exceeded')", LIMITE_DIARIO),
+    ("(535, b'5.7.8 Username and Password not accepted')", CONTA_INDISPONIVEL),
+    ("(550, b'5.1.1 The email account does not exist 10.4.21.3')", None),
+    ("(554, b'Message rejected')", None),
+    ("", None),
+    (None, None),
+])
+def test_classificar_falha(mensagem, tipo):
+    assert classificar_falha(mensagem) == tipo
+
+
+def test_montar_pool_conta_propria_primeiro_sem_repetir_caixa():
+    propria = {'vendedor_email': 'ana@x.com', 'smtp_user': 'Ana@X.com', 'smtp_pass_app': 's1'}
+    equipe = [
+        {'vendedor_email': 'ana@x.com', 'smtp_user': 'ana@x.com'},
+        {'vendedor_email': 'bia@x.com', 'smtp_user': 'bia@x.com'},
+    ]
+
+    pool = montar_pool(propria, equipe)
+
+    assert [c['smtp_user'] for c in pool] == ['Ana@X.com', 'bia@x.com']
+    assert pool[1]['smtp_pass_app'] is None
+    assert vendedores_do_pool(pool) == ['ana@x.com', 'bia@x.com']
+
+
+def test_reservar_vez_nao_deixa_duas_threads_sairem_juntas(monkeypatch):
+    monkeypatch.setattr(remetentes, "VARIACAO", 0)
+    ritmo = remetentes.RitmoEnvio(10)
+
+    esperas = [ritmo.reservar_vez() for _ in range(3)]
+
+    assert esperas[0] == pytest.approx(0, abs=0.05)
+    assert esperas[1] == pytest.approx(10, abs=0.05)
+    assert esperas[2] == pytest.approx(20, abs=0.05)
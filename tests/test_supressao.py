@@ -0,0 +1,71 @@
+import time
+
+import pandas as pd
+import pytest
+
+import supressao
+from clientes import IndiceClientes
+
+
+@pytest.fixture(autouse=True)
+def supressao_nova(tmp_path, monkeypatch):
+    monkeypatch.setattr(supressao, "DB_PATH", str(tmp_path / "supressao.db"))
+    monkeypatch.setattr(supressao, "_tabelas_ok", False)
+    monkeypatch.setattr(supressao, "indice", supressao.IndiceSupressao())
+    monkeypatch.setattr(supressao, "_filtros", {})
+
+
+def leads(*emails):
+    return pd.DataFrame({'Nome': ['x'] * len(emails), 'Email': list(emails), 'Empresa': [''] * len(emails)})
+
+
+def test_lista_limpa_passa_inteira():
+    df = leads('a@x.com', 'b@x.com')
+    filtrado, contagem = supressao.filtrar_leads(df)
+    assert filtrado is df
+    assert sum(contagem.values()) == 0
+
+
+def test_repetidos_ficam_so_uma_vez():
+    filtrado, contagem = supressao.filtrar_leads(leads('a@x.com', ' A@X.com', 'b@x.com'))
+    assert filtrado['Email'].tolist() == ['a@x.com', 'b@x.com']
+    assert contagem['duplicado'] == 1
+
+
+def test_optout_e_envio_recente_saem():
+    supressao.adicionar_optout(['Sair@x.com'])
+    supressao.registrar_envios(['recente@x.com'])
+
+    filtrado, contagem = supressao.filtrar_leads(leads('sair@x.com', 'recente@x.com', 'novo@x.com'))
+
+    assert filtrado['Email'].tolist() == ['novo@x.com']
+    assert contagem[supressao.OPTOUT] == 1
+    assert contagem[supressao.ENVIO] == 1
+
+
+def test_envio_fora_da_janela_nao_suprime():
+    antigo = time.time() - supressao.JANELA_ENVIOS - 60
+    supressao._registrar(['velho@x.com'], supressao.ENVIO, momento={'velho@x.com': antigo})
+
+    filtrado, contagem = supressao.filtrar_leads(leads('velho@x.com'))
+    assert filtrado['Email'].tolist() == ['velho@x.com']
+
+
+def test_clientes_da_carteira_saem():
+    carteira = IndiceClientes(pd.DataFrame({'id': [1], 'emails_validos': [['compras@cliente.com']]}))
+
+    filtrado, contagem = supressao.filtrar_leads(leads('compras@cliente.com', 'novo@x.com'), carteira)
+
+    assert filtrado['Email'].tolist() == ['novo@x.com']
+    assert contagem['carteira'] == 1
+
+
+def test_memorizado_ate_o_indice_mudar():
+    df = leads('a@x.com', 'b@x.com')
+    primeiro = supressao.filtrar_leads(df)
+    assert supressao.filtrar_leads(df) is primeiro
+
+    supressao.adicionar_optout(['b@x.com'])
+    filtrado, contagem = supressao.filtrar_leads(df)
+    assert filtrado['Email'].tolist() == ['a@x.com']
+    assert contagem[supressao.OPTOUT] == 1
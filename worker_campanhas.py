@@ -0,0 +1,402 @@
+"""
+Worker de campanhas: processa a fila de fila_campanhas.py fora do Streamlit.
+
+Uso: python worker_campanhas.py
+O app sobe este processo sozinho (fila_campanhas.garantir_worker); só um
+roda por vez, garantido pelo lock em dados/worker.lock.
+"""
+import fcntl
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import cota
+import fila_campanhas as fila
+import log_envios
+import metricas
+import remetentes
+import supressao
+from directus import directus
+from envio import Anexo, enviar_email_smtp_multiplo, registrar_log
+from ia import PersonalizadorIA
+from mensagens import MensagemCampanha
+
+MAX_PARALELAS = int(os.getenv("CAMPANHAS_PARALELAS", "4"))
+INTERVALO_FILA = 2
+# Quantas vezes um destinatário volta para a fila por recusa da conta (estrangulamento/limite)
+ADIAMENTOS_MAX = int(os.getenv("SMTP_ADIAMENTOS", "3"))
+# 4xx de um endereço (greylisting, caixa cheia): só ele espera antes de tentar de novo
+ESPERA_DESTINATARIO = int(os.getenv("SMTP_ESPERA_DESTINATARIO_SEG", "300"))
+
+# Token estático de serviço (DIRECTUS_SERVICE_TOKEN): o da sessão expira em
+# minutos. Campanhas enfileiradas por versões anteriores ainda trazem um token.
+TOKEN_SERVICO = fila.TOKEN_SERVICO
+
+
+def _token(campanha):
+    return TOKEN_SERVICO or campanha.get('token')
+
+
+def _aguardar(campanha_id, segundos, interromper=None):
+    """
+    Espera o delay anti-spam, mas sai antes se a campanha for cancelada (False)
+    ou se interromper() ficar verdadeiro.
+    """
+    fim = time.monotonic() + segundos
+    while time.monotonic() < fim:
+        if fila.status_campanha(campanha_id) == 'cancelada':
+            return False
+        if interromper is not None and interromper():
+            return True
+        time.sleep(min(1.0, fim - time.monotonic()))
+    return True
+
+
+def executar_campanha(campanha):
+    # A fila guarda o vendedor_email de cada conta; a config com a senha vem do Directus.
+    # Campanhas enfileiradas por versões anteriores ainda trazem a config inteira.
+    confs = json.loads(campanha['conf_smtp'])
+    if isinstance(confs, dict):
+        confs = [confs]
+    if confs and isinstance(confs[0], str):
+        confs = remetentes.carregar_pool(_token(campanha), confs)
+    if not confs:
+        raise RuntimeError("config SMTP das contas da campanha não encontrada no Directus")
+    intervalo = (campanha['intervalo_min'], campanha['intervalo_max'])
+    contas = [remetentes.ContaEnvio(conf, intervalo) for conf in confs]
+    personalizador = None
+    if campanha.get('personalizar_ia'):
+        personalizador = PersonalizadorIA(json.loads(campanha['contexto_ia'] or '{}'))
+    # Uma conexão SMTP autenticada por conta, para a campanha toda
+    try:
+        _executar_campanha(campanha, contas, personalizador)
+    finally:
+        for conta in contas:
+            conta.fechar()
+        if personalizador:
+            personalizador.fechar()
+
+
+def _agendar_ia(personalizador, destinatarios):
+    for dest in destinatarios:
+        if dest.get('dados_ia'):
+            personalizador.agendar(dest['id'], json.loads(dest['dados_ia']))
+
+
+class AgendaCampanha:
+    """Destinatários pendentes repartidos entre as contas (uma thread por conta)."""
+
+    def __init__(self, pendentes, personalizador=None):
+        self._fila = deque(pendentes)
+        self._em_envio = 0
+        self._lock = threading.Lock()
+        self.personalizador = personalizador
+        self.parada = None   # 'cancelada' ou 'cota_esgotada' (campanha vai para 'aguardando_cota')
+
+    def _indice_pronto(self):
+        agora = time.monotonic()
+        return next((i for i, dest in enumerate(self._fila) if dest.get('_tentar_apos', 0) <= agora), None)
+
+    def proximo(self):
+        """Primeiro destinatário que já pode sair (os adiados por 4xx esperam a vez deles)."""
+        with self._lock:
+            indice = None if self.parada else self._indice_pronto()
+            if indice is None:
+                return None
+            dest = self._fila[indice]
+            del self._fila[indice]
+            self._em_envio += 1
+            if self.personalizador:
+                # A IA trabalha N destinatários à frente, aproveitando o delay entre envios
+                _agendar_ia(self.personalizador, [dest] + list(itertools.islice(self._fila, self.personalizador.paralelas)))
+            return dest
+
+    def devolver(self, dest):
+        """Volta para o começo da fila (a próxima conta livre tenta de novo) ou, se ele tem espera, para o fim."""
+        with self._lock:
+            if dest.get('_tentar_apos', 0) > time.monotonic():
+                self._fila.append(dest)
+            else:
+                self._fila.appendleft(dest)
+            self._em_envio -= 1
+
+    def concluir(self):
+        with self._lock:
+            self._em_envio -= 1
+
+    def restantes(self):
+        with self._lock:
+            return len(self._fila)
+
+    def tem_pronto(self):
+        with self._lock:
+            return self._indice_pronto() is not None
+
+    def encerrada(self):
+        """Sem nada na fila nem em envio (nada pode voltar)."""
+        with self._lock:
+            return bool(self.parada) or (not self._fila and not self._em_envio)
+
+    def parar(self, motivo):
+        with self._lock:
+            self.parada = self.parada or motivo
+
+
+def _executar_campanha(campanha, contas, personalizador=None):
+    campanha_id = campanha['id']
+    anexo = None
+    if campanha.get('anexo_hash'):
+        anexo = Anexo(campanha['anexo_nome'], campanha['anexo_tipo'], hash_conteudo=campanha['anexo_hash'])
+    elif campanha.get('anexo') is not None:
+        # Campanha enfileirada antes do armazenamento por hash
+        anexo = Anexo(campanha['anexo_nome'], campanha['anexo_tipo'], campanha['anexo'])
+
+    # Anexo lido e codificado uma vez por conta (o From muda); por destinatário só entram o To e o texto
+    for conta in contas:
+        conta.modelo = MensagemCampanha(campanha['assunto'], campanha['corpo'], conta.conf, anexo)
+
+    # Retomada depois de restart também respeita o delay antes do próximo envio
+    if fila.ja_iniciada(campanha_id):
+        for conta in contas:
+            conta.agendar_proximo()
+    token = _token(campanha)
+    cota.reconciliar(token)
+
+    agenda = AgendaCampanha(fila.destinatarios_pendentes(campanha_id), personalizador)
+    if len(contas) == 1:
+        _laco_conta(campanha, contas[0], contas, agenda)
+    else:
+        threads = [threading.Thread(target=_laco_conta, args=(campanha, conta, contas, agenda), daemon=True) for conta in contas]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    if agenda.parada == 'cancelada':
+        return
+    if agenda.parada == 'cota_esgotada' or agenda.restantes():
+        # Cota da equipe ou de todas as contas acabou: o resto sai no próximo dia, pela mesma campanha
+        fila.aguardar_cota(campanha_id)
+        return
+    fila.finalizar_campanha(campanha_id, 'concluida')
+
+
+def _laco_conta(campanha, conta, contas, agenda):
+    """Envia pela `conta` enquanto houver destinatários e ela não sair do rodízio."""
+    campanha_id = campanha['id']
+    while not conta.esgotada and not agenda.encerrada():
+        if not agenda.tem_pronto():
+            # Nada pronto agora: outra conta pode devolver um adiado, ou um 4xx ainda espera a vez
+            time.sleep(1.0)
+            continue
+        # Vez na caixa (atômica): outra campanha/thread na mesma conta espera a seguinte
+        espera = conta.reservar_vez()
+        if espera and not _aguardar(campanha_id, espera, interromper=agenda.encerrada):
+            agenda.parar('cancelada')
+            return
+        if fila.status_campanha(campanha_id) == 'cancelada':
+            agenda.parar('cancelada')
+            return
+
+        dest = agenda.proximo()
+        if dest is None:
+            # Outra conta ainda pode devolver um destinatário adiado
+            time.sleep(1.0)
+            continue
+
+        outras_ativas = any(c is not conta and not c.esgotada for c in contas)
+        resultado = _processar_destinatario(campanha, conta, dest, agenda.personalizador, outras_ativas)
+        if resultado == 'cota_esgotada':
+            agenda.devolver(dest)
+            agenda.parar('cota_esgotada')
+            return
+        if resultado == 'adiado':
+            agenda.devolver(dest)
+        else:
+            agenda.concluir()
+
+
+def _processar_destinatario(campanha, conta, dest, personalizador, outras_ativas):
+    """
+    Envia para um destinatário pela conta. Retorna 'concluido', 'adiado' (volta
+    para a fila: a conta foi estrangulada ou esgotou) ou 'cota_esgotada' (equipe).
+    """
+    campanha_id = campanha['id']
+    token = _token(campanha)
+    externa = campanha['tipo'] == 'externa'
+
+    # O texto fica no destinatário: se ele for adiado, a nova tentativa usa o mesmo
+    msg_final = dest.get('_mensagem')
+    if msg_final is None and personalizador:
+        msg_final = personalizador.obter(dest['id'])
+        if msg_final and "{{IMAGEM}}" in campanha['corpo']:
+            msg_final += "\n\n{{IMAGEM}}"
+    if not msg_final:
+        # Texto padrão (também é o fallback quando a IA falha ou demora)
+        msg_final = campanha['corpo']
+        for chave, valor in json.loads(dest['variaveis']).items():
+            msg_final = msg_final.replace(chave, valor)
+    dest['_mensagem'] = msg_final
+
+    ja_enviados = json.loads(dest['emails_enviados'])
+    falhas = dest.setdefault('_falhas', {})   # email -> erro definitivo (não tenta de novo)
+    houve_envio = bool(ja_enviados)
+
+    # Os endereços do mesmo cliente recebem o mesmo conteúdo: uma transação só
+    pendentes = list(dict.fromkeys(
+        item['email'] for item in json.loads(dest['emails'])
+        if item['email'] not in ja_enviados and item['email'] not in falhas
+    ))
+
+    # Opt-out vale para qualquer campanha; envio recente só barra a externa
+    supressao.indice.atualizar()
+    suprimidos = {}
+    for email in pendentes:
+        motivo = supressao.indice.motivo(email, incluir_envios=externa)
+        if motivo:
+            suprimidos[email] = motivo
+    pendentes = [email for email in pendentes if email not in suprimidos]
+
+    resultados = {}
+    if pendentes and not conta.reservar(len(pendentes)):
+        # Limite diário desta conta: outra conta assume; sem outra, é como a cota acabar
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Campanha {campanha_id}: conta {conta.chave} atingiu o limite diário.", flush=True)
+        return 'adiado' if outras_ativas else 'cota_esgotada'
+    if pendentes and not cota.reservar(len(pendentes)):
+        # Cota da equipe acabou: o destinatário fica pendente para uma nova campanha/dia
+        conta.liberar(len(pendentes))
+        return 'cota_esgotada'
+    duracao = 0.0
+    if pendentes:
+        inicio = time.perf_counter()
+        resultados = enviar_email_smtp_multiplo(token, pendentes, campanha['assunto'], msg_final, conta.conf, sessao=conta.sessao, modelo=conta.modelo)
+        duracao = time.perf_counter() - inicio
+
+    # Falhas da conta (estrangulamento, limite, login) x falhas do endereço
+    tipos_falha = {email: remetentes.classificar_falha(resultados[email][1]) for email in pendentes if not resultados[email][0]}
+    tipo_conta = next((t for t in tipos_falha.values() if t in remetentes.FALHAS_DA_CONTA), None)
+    # Sem outra conta ativa, limite/login recusado contam como erro comum
+    if tipo_conta and not (outras_ativas or tipo_conta == remetentes.ESTRANGULAMENTO):
+        tipo_conta = None
+
+    # O ritmo da conta acompanha a resposta do servidor (remetentes.RitmoEnvio)
+    if tipo_conta:
+        pausa = conta.registrar_falha(tipo_conta)
+        espera = f", pausa de {pausa:.0f}s" if pausa else ""
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Campanha {campanha_id}: conta {conta.chave} recusada ({tipo_conta}{espera}).", flush=True)
+    elif pendentes:
+        conta.registrar_envio(duracao, aceito=not tipos_falha)
+
+    # Problema da conta: tenta de novo por outra conta (ou pela mesma depois da
+    # pausa). 4xx do endereço: só ele volta, depois de ESPERA_DESTINATARIO.
+    # Nos dois casos, até o limite de adiamentos
+    pode_adiar = dest.get('_adiamentos', 0) < ADIAMENTOS_MAX
+
+    def adiavel(email):
+        tipo = tipos_falha.get(email)
+        return tipo == remetentes.DESTINATARIO_TEMPORARIA or bool(tipo_conta and tipo)
+
+    adiados = 0
+    for email in pendentes:
+        sucesso, msg_log = resultados[email]
+
+        if not sucesso and pode_adiar and adiavel(email):
+            adiados += 1
+            continue
+
+        if externa:
+            status_log = "Enviado [EXTERNO]" if sucesso else f"Erro [EXTERNO]: {msg_log}"
+            registrar_log(token, "0", campanha['assunto'], f"Lead: {email}", status_log)
+        else:
+            status_log = "Enviado" if sucesso else f"Erro: {msg_log}"
+            registrar_log(token, dest['pj_id'], campanha['assunto'], f"Para: {email}", status_log)
+
+        fila.registrar_resultado_email(campanha_id, dest['id'], email, sucesso)
+        if sucesso:
+            houve_envio = True
+            ja_enviados.append(email)
+        else:
+            falhas[email] = msg_log
+
+    supressao.registrar_envios([email for email in pendentes if resultados[email][0]])
+    dest['emails_enviados'] = json.dumps(ja_enviados)
+
+    if adiados:
+        # O servidor recusou sem enviar: as fichas voltam e a nova tentativa reserva de novo
+        conta.liberar(adiados)
+        cota.liberar(adiados)
+        dest['_adiamentos'] = dest.get('_adiamentos', 0) + 1
+        if not tipo_conta:
+            dest['_tentar_apos'] = time.monotonic() + ESPERA_DESTINATARIO
+        return 'adiado'
+
+    if houve_envio and dest['cliente_id']:
+        dados_update = {"status_prospect": "Contato Feito"}
+        if dest['atualizar_tentativa']:
+            dados_update["tentativa_1"] = datetime.now().strftime("%d/%m - Email em Massa")
+        try:
+            r = directus.atualizar_item(token, "clientes", dest['cliente_id'], dados_update)
+            if r.status_code == 200:
+                # O app recarrega a carteira em cache quando a versão muda
+                fila.marcar_carteira_alterada()
+        except Exception:
+            pass
+
+    ultimo_erro = None
+    if falhas:
+        email, msg_log = list(falhas.items())[-1]
+        ultimo_erro = f"{email}: {msg_log}"
+    if not houve_envio and not ultimo_erro and suprimidos:
+        detalhe = ", ".join(f"{email}: {supressao.MOTIVOS[motivo]}" for email, motivo in suprimidos.items())
+        fila.concluir_destinatario(dest['id'], 'suprimido', detalhe)
+    else:
+        fila.concluir_destinatario(dest['id'], 'enviado' if houve_envio else 'erro', ultimo_erro)
+    return 'concluido'
+
+
+def _rodar(campanha, em_execucao, lock):
+    try:
+        executar_campanha(campanha)
+    except Exception as e:
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Campanha {campanha['id']} falhou: {e}", flush=True)
+        fila.finalizar_campanha(campanha['id'], 'erro')
+    finally:
+        with lock:
+            em_execucao.discard(campanha['id'])
+
+
+def main():
+    lock_arquivo = open(fila.LOCK_WORKER, "a")
+    try:
+        fcntl.flock(lock_arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        print("Outro worker de campanhas já está rodando.", flush=True)
+        return
+
+    metricas.iniciar("worker", os.getenv("METRICAS_PORTA_WORKER"))
+    fila.reiniciar_interrompidas()
+    log_envios.escritor.token_padrao = TOKEN_SERVICO or None
+    recuperados = log_envios.escritor.recuperar()
+    if recuperados:
+        print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] {recuperados} registros de envio pendentes serão regravados no Directus.", flush=True)
+    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] Worker de campanhas iniciado (pid {os.getpid()}).", flush=True)
+
+    em_execucao = set()
+    lock = threading.Lock()
+    while True:
+        with lock:
+            vagas = MAX_PARALELAS - len(em_execucao)
+            ignorar = tuple(em_execucao)
+        for campanha in fila.reservar_proximas(vagas, ignorar):
+            with lock:
+                em_execucao.add(campanha['id'])
+            threading.Thread(target=_rodar, args=(campanha, em_execucao, lock), daemon=True).start()
+        time.sleep(INTERVALO_FILA)
+
+
+if __name__ == "__main__":
+    main()